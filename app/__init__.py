@@ -1,7 +1,8 @@
+import os
 from flask import Flask
 from pathlib import Path
 from flask_login import LoginManager
-from .model import get_user_by_id
+from .model import get_user_by_id, set_repository
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = BASE_DIR / 'data'
@@ -16,11 +17,70 @@ def load_user(user_id: str):
     return get_user_by_id(user_id)
 
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
     app.config['SECRET_KEY'] = 'change-me'
     app.config['DATA_DIR'] = str(DATA_DIR)
-    
+    app.config['RANKINGS_TTL'] = 600             # seconds
+    app.config['RANKINGS_RETRY_INTERVAL'] = 60   # seconds after a failed fetch
+    app.config['RANKINGS_BACKGROUND_REFRESH'] = True
+
+    # Storage backend: 'memory' (default, lost on restart), 'journal'
+    # (memory + append-only journal and snapshots) or 'sqlite'
+    app.config['STORAGE'] = os.environ.get('POOLCLUB_STORAGE', 'memory')
+    app.config['SQLITE_PATH'] = os.environ.get(
+        'POOLCLUB_SQLITE_PATH', str(BASE_DIR / 'poolclub.sqlite3')
+    )
+    app.config['JOURNAL_DIR'] = os.environ.get(
+        'POOLCLUB_JOURNAL_DIR', str(BASE_DIR / 'journal')
+    )
+    app.config['JOURNAL_SNAPSHOT_INTERVAL'] = 300    # seconds between snapshot checks
+    app.config['JOURNAL_SNAPSHOT_MIN_RECORDS'] = 10_000
+
+    # Live updates over Server-Sent Events (/api/stream). Each open stream
+    # holds a worker thread/greenlet; above the limit clients fall back
+    # to polling.
+    app.config['SSE_MAX_STREAMS'] = 200
+    app.config['SSE_KEEPALIVE_SECONDS'] = 15
+    app.config['SSE_STREAM_SECONDS'] = 300       # then the browser reconnects
+    app.config['SSE_RETRY_MS'] = 5000
+
+    # Fingerprinted, precompressed copies of static css/js (see assets.py)
+    app.config['ASSETS_BUILD_DIR'] = os.environ.get(
+        'POOLCLUB_ASSETS_DIR', str(BASE_DIR / 'build' / 'assets')
+    )
+
+    # Bearer token for the accounting exports (/api/exports/...);
+    # exports are disabled while unset
+    app.config['EXPORT_TOKEN'] = os.environ.get('POOLCLUB_EXPORT_TOKEN')
+
+    # Password hashing runs in a process pool; more than
+    # PASSWORD_HASH_MAX_PENDING queued hashes → 503. Started before any
+    # background thread exists since the workers are forked.
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('POOLCLUB_HASH_WORKERS', 0)) or None
+    app.config['PASSWORD_HASH_MAX_PENDING'] = None   # default: 4 per worker
+
+    # Overrides (tests: TESTING hashes inline, no forked pool)
+    app.config.update(config or {})
+
+    if not app.config['TESTING']:
+        from .hashing import password_hasher
+        password_hasher.start(
+            app.config['PASSWORD_HASH_WORKERS'],
+            app.config['PASSWORD_HASH_MAX_PENDING'],
+        )
+
+    if app.config['STORAGE'] == 'sqlite':
+        from .sqlite_repository import SqliteRepository
+        set_repository(SqliteRepository(app.config['SQLITE_PATH']))
+    elif app.config['STORAGE'] == 'journal':
+        from .journal import JournaledRepository
+        set_repository(JournaledRepository(
+            app.config['JOURNAL_DIR'],
+            snapshot_interval=app.config['JOURNAL_SNAPSHOT_INTERVAL'],
+            snapshot_min_records=app.config['JOURNAL_SNAPSHOT_MIN_RECORDS'],
+        ))
+
     # init Flask-Login
     login_manager.init_app(app)
 
@@ -31,4 +91,18 @@ def create_app():
     from .auth import auth
     app.register_blueprint(auth)
 
+    from .assets import init_assets
+    init_assets(app)
+
+    # flask reconcile-rollups [--fix]
+    from .rollups import reconcile_command
+    app.cli.add_command(reconcile_command)
+
+    # Swimcloud rankings are refreshed off the request path
+    from .rankings_cache import rankings_cache
+    rankings_cache.ttl = app.config['RANKINGS_TTL']
+    rankings_cache.retry_interval = app.config['RANKINGS_RETRY_INTERVAL']
+    if app.config['RANKINGS_BACKGROUND_REFRESH']:
+        rankings_cache.start()
+
     return app
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import threading
+from contextlib import ExitStack
+from dataclasses import dataclass
+from typing import List, Optional, Set, Tuple
+from zlib import crc32
+
+from .ledger import ledger
+from .model import (
+    POOL_MAX_CAPACITY,
+    Booking,
+    BookingType,
+    assign_lane,
+    booking_interval,
+    create_booking,
+    get_repository,
+    get_user_by_id,
+    is_past_booking,
+    slot_usages,
+)
+
+
+@dataclass(slots=True)
+class SlotResult:
+    """Outcome of one slot of a bulk booking."""
+    date: str
+    time: str
+    duration: int
+    ok: bool = False
+    message: str = ""
+    lane: Optional[int] = None
+    booking: Optional[Booking] = None
+
+
+# ---------------------------
+# Booking Admission
+# ---------------------------
+
+class BookingAdmission:
+    """
+    Serialises the check-then-act of a booking: overlap check, capacity /
+    lane assignment, wallet charge and insert run as one step.
+
+    Locks are striped so unrelated slots never contend:
+      - time stripes: the day is cut into `bucket_minutes` buckets and each
+        bucket hashes to one of `slot_stripes` locks. Two overlapping
+        bookings always share a bucket, hence a lock.
+      - user stripes: protect the wallet against the same user booking two
+        different slots at once.
+    Locks are taken in a fixed order (time stripes sorted, then the user
+    stripe) so concurrent admissions cannot deadlock.
+
+    Across worker processes the in-process locks do not help; there the
+    repository transaction (BEGIN IMMEDIATE on SQLite) provides the
+    isolation, and the checks run inside it.
+    """
+
+    def __init__(self, slot_stripes: int = 64, user_stripes: int = 64, bucket_minutes: int = 30):
+        self.bucket_minutes = bucket_minutes
+        self._slot_locks = [threading.Lock() for _ in range(slot_stripes)]
+        self._user_locks = [threading.Lock() for _ in range(user_stripes)]
+
+    def _locks_for(self, user_id: str, intervals: List[Optional[Tuple[int, int]]]) -> List[threading.Lock]:
+        n = len(self._slot_locks)
+        stripes: Set[int] = set()
+        for interval in intervals:
+            if interval is None:
+                stripes.add(0)
+                continue
+            start, end = interval
+            first, last = start // self.bucket_minutes, (end - 1) // self.bucket_minutes
+            stripes.update(b % n for b in range(first, min(last, first + n - 1) + 1))
+            if len(stripes) == n:
+                break
+
+        locks = [self._slot_locks[i] for i in sorted(stripes)]
+        locks.append(self._user_locks[crc32(user_id.encode()) % len(self._user_locks)])
+        return locks
+
+    def admit(
+        self,
+        user_id: str,
+        date: str,
+        time: str,
+        duration: int,
+        booking_type: str,
+        price: int,
+        description: str,
+    ) -> Tuple[Optional[Booking], str, int]:
+        """
+        Returns (booking, "", 201) on success, or (None, message, http_status)
+        when the booking is rejected. Nothing is charged on rejection.
+        """
+        user_id = str(user_id)
+        interval = booking_interval(date, time, duration)
+
+        with ExitStack() as stack:
+            for lock in self._locks_for(user_id, [interval]):
+                stack.enter_context(lock)
+            with get_repository().transaction():
+                # One index query answers both the overlap and the capacity check
+                usage = slot_usages([interval])[0]
+                if usage is not None and user_id in usage.user_ids:
+                    return None, "شما در این بازه زمانی رزرو دیگری دارید.", 409
+
+                lane = None
+
+                # Free swim → pool capacity limit
+                if booking_type == BookingType.FREE_SWIM:
+                    if usage is not None and usage.swimmers >= POOL_MAX_CAPACITY:
+                        return None, "ظرفیت استخر برای این بازه زمانی تکمیل است.", 409
+
+                # Lane training → auto-assign lane
+                elif booking_type == BookingType.LANE_TRAINING:
+                    lane = assign_lane(date, time, duration, booking_type)
+                    if lane is None:
+                        return None, "تمام لاین‌های تمرینی در این بازه زمانی پر هستند.", 409
+
+                # Reload inside the transaction: the request's user object
+                # may be stale when another worker charged the wallet.
+                user = get_user_by_id(user_id)
+                with ledger.transaction():  # refund if the insert fails
+                    if user is None or not user.charge(price, description=description):
+                        return None, "موجودی کیف پول برای این رزرو کافی نیست.", 402
+
+                    booking = create_booking(
+                        user_id=user_id,
+                        date=date,
+                        time=time,
+                        duration=duration,
+                        booking_type=booking_type,
+                        lane=lane,
+                    )
+                return booking, "", 201
+
+    def admit_bulk(
+        self,
+        user_id: str,
+        slots: List[Tuple[str, str, int]],
+        booking_type: str,
+        price: int,
+        description: str,
+        all_or_nothing: bool = False,
+    ) -> Tuple[List[SlotResult], str, int]:
+        """
+        Validate and book many (date, time, duration) slots at once.
+
+        All slots are checked in one ordered pass over the booking index
+        (see slot_usages). Slots that fail are reported and skipped, unless
+        `all_or_nothing` is set, in which case nothing is booked. The
+        wallet is charged once for every accepted slot, or not at all.
+
+        Returns (results, "", 201) if anything was booked, otherwise
+        (results, message, http_status).
+        """
+        user_id = str(user_id)
+        results = [SlotResult(date, time, duration) for date, time, duration in slots]
+        intervals = [booking_interval(date, time, duration) for date, time, duration in slots]
+
+        with ExitStack() as stack:
+            for lock in self._locks_for(user_id, intervals):
+                stack.enter_context(lock)
+            with get_repository().transaction():
+                usages = slot_usages(intervals)
+                accepted: List[Tuple[int, int]] = []  # intervals booked by this batch
+
+                for result, interval, usage in zip(results, intervals, usages):
+                    if usage is None or is_past_booking(result.date, result.time):
+                        result.message = "امکان ثبت رزرو برای زمان گذشته وجود ندارد."
+                    elif user_id in usage.user_ids or any(
+                        s < interval[1] and e > interval[0] for s, e in accepted
+                    ):
+                        result.message = "شما در این بازه زمانی رزرو دیگری دارید."
+                    elif booking_type == BookingType.FREE_SWIM and usage.swimmers >= POOL_MAX_CAPACITY:
+                        result.message = "ظرفیت استخر برای این بازه زمانی تکمیل است."
+                    else:
+                        # Batch slots never overlap each other, so lanes can
+                        # be chosen before any of them is inserted.
+                        result.lane = assign_lane(result.date, result.time, result.duration, booking_type)
+                        if booking_type == BookingType.LANE_TRAINING and result.lane is None:
+                            result.message = "تمام لاین‌های تمرینی در این بازه زمانی پر هستند."
+                        else:
+                            result.ok = True
+                            accepted.append(interval)
+
+                ok = [r for r in results if r.ok]
+                if not ok:
+                    return results, "هیچ‌کدام از سانس‌های درخواستی قابل رزرو نیست.", 409
+                if all_or_nothing and len(ok) < len(results):
+                    for r in ok:
+                        r.ok, r.lane = False, None
+                    return results, "برخی از سانس‌ها قابل رزرو نیستند؛ هیچ رزروی ثبت نشد.", 409
+
+                user = get_user_by_id(user_id)
+                with ledger.transaction():  # one charge; refunded if an insert fails
+                    if user is None or not user.charge(price * len(ok), description=description):
+                        for r in ok:
+                            r.ok, r.lane = False, None
+                        return results, "موجودی کیف پول برای این رزروها کافی نیست.", 402
+
+                    for r in ok:
+                        r.booking = create_booking(
+                            user_id=user_id,
+                            date=r.date,
+                            time=r.time,
+                            duration=r.duration,
+                            booking_type=booking_type,
+                            lane=r.lane,
+                        )
+                return results, "", 201
+
+
+booking_admission = BookingAdmission()
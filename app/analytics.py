@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import datetime as dt
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional: the analytics endpoint reports itself unavailable
+    np = None
+
+from .model import (
+    AVAILABLE_LANES,
+    MINUTES_PER_DAY,
+    POOL_MAX_CAPACITY,
+    BookingType,
+    epoch_minutes,
+    get_repository,
+)
+
+
+TYPE_FREE_SWIM = 0
+TYPE_LANE_TRAINING = 1
+TYPE_OTHER = 2
+_TYPE_CODES = {
+    BookingType.FREE_SWIM.value: TYPE_FREE_SWIM,
+    BookingType.LANE_TRAINING.value: TYPE_LANE_TRAINING,
+}
+
+# Heatmap rows start on Saturday; 1970-01-01 (epoch day 0) was a Thursday.
+WEEKDAY_LABELS = ["شنبه", "یکشنبه", "دوشنبه", "سه‌شنبه", "چهارشنبه", "پنجشنبه", "جمعه"]
+_EPOCH_WEEKDAY = 5
+
+MAX_REPORT_DAYS = 731
+
+
+def available() -> bool:
+    return np is not None
+
+
+# ---------------------------
+# Columnar export
+# ---------------------------
+
+@dataclass(frozen=True)
+class BookingColumns:
+    start: "np.ndarray"      # int64, epoch minutes
+    duration: "np.ndarray"   # int32, minutes
+    type_code: "np.ndarray"  # int8, TYPE_*
+    lane: "np.ndarray"       # int16, 0 = no lane
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    @property
+    def end(self) -> "np.ndarray":
+        return self.start + self.duration
+
+
+def export_bookings(rows: Sequence[Tuple[int, int, str, Optional[int]]]) -> BookingColumns:
+    """Repository.booking_rows() output → one NumPy array per column."""
+    n = len(rows)
+    return BookingColumns(
+        start=np.fromiter((r[0] for r in rows), np.int64, n),
+        duration=np.fromiter((r[1] for r in rows), np.int32, n),
+        type_code=np.fromiter((_TYPE_CODES.get(r[2], TYPE_OTHER) for r in rows), np.int8, n),
+        lane=np.fromiter((r[3] or 0 for r in rows), np.int16, n),
+    )
+
+
+# ---------------------------
+# Vectorized computations
+# ---------------------------
+
+def concurrency(cols: BookingColumns, start: int, end: int, mask=None) -> "np.ndarray":
+    """
+    Number of bookings in progress at each minute of [start, end).
+    A difference array (+1 at each start, -1 at each end) and one cumsum,
+    so cost is O(bookings + minutes) whatever the durations are.
+    """
+    b_start, b_end = cols.start, cols.end
+    if mask is not None:
+        b_start, b_end = b_start[mask], b_end[mask]
+
+    inside = (b_end > start) & (b_start < end)
+    first = np.clip(b_start[inside], start, end) - start
+    last = np.clip(b_end[inside], start, end) - start
+
+    size = end - start
+    delta = np.bincount(first, minlength=size + 1) - np.bincount(last, minlength=size + 1)
+    return np.cumsum(delta[:size])
+
+
+def weekday_hour_totals(per_minute: "np.ndarray", start: int) -> "np.ndarray":
+    """Sum a per-minute series into a (7, 24) weekday × hour table. `start` is midnight."""
+    per_hour = per_minute.reshape(-1, 60).sum(axis=1)
+    hours = np.arange(len(per_hour))
+    day = start // MINUTES_PER_DAY + hours // 24
+    cell = ((day + _EPOCH_WEEKDAY) % 7) * 24 + hours % 24
+    return np.bincount(cell, weights=per_hour, minlength=7 * 24).reshape(7, 24)
+
+
+def weekday_counts(start: int, end: int) -> "np.ndarray":
+    """How many times each weekday occurs in [start, end) (midnight-aligned)."""
+    days = np.arange(start // MINUTES_PER_DAY, end // MINUTES_PER_DAY)
+    return np.bincount((days + _EPOCH_WEEKDAY) % 7, minlength=7)
+
+
+def peak_hours(table: "np.ndarray", top: int = 10) -> List[Dict]:
+    flat = table.ravel()
+    order = np.argsort(flat, kind="stable")[::-1][:top]
+    return [
+        {
+            "weekday": WEEKDAY_LABELS[i // 24],
+            "hour": int(i % 24),
+            "occupancy": round(float(flat[i]), 4),
+        }
+        for i in order
+        if flat[i] > 0
+    ]
+
+
+def lane_utilization(cols: BookingColumns, start: int, end: int) -> Dict[int, float]:
+    """Share of [start, end) each lane was booked."""
+    has_lane = cols.lane > 0
+    minutes = (
+        np.minimum(cols.end[has_lane], end) - np.maximum(cols.start[has_lane], start)
+    ).clip(min=0)
+    busy = np.bincount(cols.lane[has_lane], weights=minutes, minlength=max(AVAILABLE_LANES) + 1)
+    return {lane: round(float(busy[lane]) / (end - start), 4) for lane in AVAILABLE_LANES}
+
+
+# ---------------------------
+# Report
+# ---------------------------
+
+def utilization_report(date_from: dt.date, date_to: dt.date, top: int = 10) -> Dict:
+    """
+    Occupancy of the pool and the training lanes between two dates
+    (inclusive), by weekday and hour.
+
+      - pool_occupancy: average free-swim swimmers / POOL_MAX_CAPACITY
+      - lane_occupancy: average busy lanes / len(AVAILABLE_LANES)
+    """
+    start = int(epoch_minutes(dt.datetime.combine(date_from, dt.time())))
+    end = int(epoch_minutes(dt.datetime.combine(date_to + dt.timedelta(days=1), dt.time())))
+
+    # Bookings that started the day before may still run into the range
+    cols = export_bookings(get_repository().booking_rows(start - MINUTES_PER_DAY, end))
+
+    minutes_per_cell = weekday_counts(start, end)[:, None] * 60
+    minutes_per_cell = np.where(minutes_per_cell == 0, 1, minutes_per_cell)
+
+    swimmers = concurrency(cols, start, end, cols.type_code == TYPE_FREE_SWIM)
+    busy_lanes = concurrency(cols, start, end, cols.lane > 0)
+
+    pool = weekday_hour_totals(swimmers, start) / minutes_per_cell / POOL_MAX_CAPACITY
+    lanes = weekday_hour_totals(busy_lanes, start) / minutes_per_cell / len(AVAILABLE_LANES)
+
+    return {
+        "from": date_from.isoformat(),
+        "to": date_to.isoformat(),
+        "bookings": int(((cols.end > start) & (cols.start < end)).sum()),
+        "weekdays": WEEKDAY_LABELS,
+        "hours": list(range(24)),
+        "pool_occupancy": np.round(pool, 4).tolist(),
+        "lane_occupancy": np.round(lanes, 4).tolist(),
+        "peak_hours": peak_hours(pool, top),
+        "peak_lane_hours": peak_hours(lanes, top),
+        "lane_utilization": lane_utilization(cols, start, end),
+    }
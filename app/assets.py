@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from flask import Blueprint, abort, current_app, request, send_file, url_for
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip variants are built
+    brotli = None
+
+
+FINGERPRINT_EXTENSIONS = (".css", ".js", ".svg", ".json")
+COMPRESS_EXTENSIONS = (".css", ".js", ".svg", ".json")
+COMPRESS_MIN_SIZE = 1024          # bytes; smaller files are not worth it
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+# ---------------------------
+# Asset Manifest
+# ---------------------------
+
+@dataclass
+class Asset:
+    filename: str                   # logical name, e.g. "css/styles.min.css"
+    hashed: str                     # e.g. "css/styles.min.3f2a9c1b7d4e.css"
+    digest: str
+    path: Path                      # original file under static/
+    signature: Tuple[int, int]      # (mtime_ns, size) when fingerprinted
+    # encoding -> file in build_dir; "identity" is a copy of the bytes
+    # that were hashed, so later edits under static/ never change what
+    # an immutable URL serves
+    variants: Dict[str, Path] = field(default_factory=dict)
+
+
+class AssetManifest:
+    """
+    Content-hashed URLs for the files under static/.
+
+    build() hashes every css/js file once, and writes a copy of it plus
+    gzip (and brotli, when the module is installed) variants next to each
+    other in `build_dir`, named by digest so rebuilding unchanged files
+    is free.
+    The hashed URL changes whenever the content does, so responses can
+    be cached forever (Cache-Control: immutable).
+
+    With `auto_reload` (debug mode) a file is re-fingerprinted when its
+    (mtime, size) changes, like ConfigStore does for JSON files.
+    """
+
+    def __init__(self, static_dir: os.PathLike | str, build_dir: os.PathLike | str, auto_reload: bool = False):
+        self.static_dir = Path(static_dir)
+        self.build_dir = Path(build_dir)
+        self.auto_reload = auto_reload
+        self._assets: Dict[str, Asset] = {}     # logical name -> asset
+        self._by_hashed: Dict[str, Asset] = {}  # hashed name -> asset
+        self._lock = threading.Lock()
+
+    # ---- Building ----
+
+    def build(self) -> int:
+        """Fingerprint and precompress every asset. Returns how many."""
+        count = 0
+        for path in sorted(self.static_dir.rglob("*")):
+            if path.is_file() and path.suffix in FINGERPRINT_EXTENSIONS:
+                self._add(path.relative_to(self.static_dir).as_posix())
+                count += 1
+        return count
+
+    def _add(self, filename: str) -> Optional[Asset]:
+        path = self.static_dir / filename
+        try:
+            st = path.stat()
+            raw = path.read_bytes()
+        except OSError:
+            return None
+
+        digest = hashlib.sha256(raw).hexdigest()[:12]
+        stem, ext = os.path.splitext(filename)
+        asset = Asset(
+            filename=filename,
+            hashed=f"{stem}.{digest}{ext}",
+            digest=digest,
+            path=path,
+            signature=(st.st_mtime_ns, st.st_size),
+        )
+        self.build_dir.mkdir(parents=True, exist_ok=True)
+        copy = self.build_dir / (digest + ext)
+        if not copy.exists():
+            self._write(copy, raw)
+        asset.variants["identity"] = copy
+        if ext in COMPRESS_EXTENSIONS and len(raw) >= COMPRESS_MIN_SIZE:
+            self._precompress(asset, raw)
+
+        with self._lock:
+            old = self._assets.get(filename)
+            if old is not None:
+                self._by_hashed.pop(old.hashed, None)
+            self._assets[filename] = asset
+            self._by_hashed[asset.hashed] = asset
+        return asset
+
+    def _precompress(self, asset: Asset, raw: bytes):
+        compressors = [("gzip", ".gz", lambda b: gzip.compress(b, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            compressors.insert(0, ("br", ".br", lambda b: brotli.compress(b, quality=11)))
+
+        for encoding, suffix, compress in compressors:
+            target = self.build_dir / (asset.digest + Path(asset.filename).suffix + suffix)
+            if not target.exists():
+                data = compress(raw)
+                if len(data) >= len(raw):
+                    continue  # no gain; serve the original
+                self._write(target, data)
+            asset.variants[encoding] = target
+
+    @staticmethod
+    def _write(target: Path, data: bytes):
+        tmp = target.with_name(target.name + f".tmp{os.getpid()}")
+        tmp.write_bytes(data)
+        os.replace(tmp, target)
+
+    # ---- Lookups ----
+
+    def get(self, filename: str) -> Optional[Asset]:
+        asset = self._assets.get(filename)
+        if asset is not None and self.auto_reload:
+            try:
+                st = asset.path.stat()
+            except OSError:
+                return None
+            if (st.st_mtime_ns, st.st_size) != asset.signature:
+                asset = self._add(filename)
+        return asset
+
+    def by_hashed(self, hashed: str) -> Optional[Asset]:
+        return self._by_hashed.get(hashed)
+
+
+def asset_url(filename: str) -> str:
+    """
+    url_for('static', filename=...) for templates, but fingerprinted:
+    assets in the manifest get their content-hashed, cache-forever URL.
+    Anything else (images, ...) falls back to the plain static URL.
+    """
+    manifest: Optional[AssetManifest] = current_app.extensions.get("asset_manifest")
+    asset = manifest.get(filename) if manifest else None
+    if asset is None:
+        return url_for("static", filename=filename)
+    return url_for("assets.fingerprinted", filename=asset.hashed)
+
+
+def init_assets(app):
+    """Build the manifest once at startup and expose asset_url() to templates."""
+    manifest = AssetManifest(
+        app.static_folder,
+        app.config["ASSETS_BUILD_DIR"],
+        auto_reload=app.debug,
+    )
+    manifest.build()
+    app.extensions["asset_manifest"] = manifest
+    app.add_template_global(asset_url)
+    app.register_blueprint(assets)
+
+
+# ---------------------------
+# Serving
+# ---------------------------
+
+assets = Blueprint("assets", __name__)
+
+
+@assets.route("/assets/<path:filename>")
+def fingerprinted(filename):
+    asset = current_app.extensions["asset_manifest"].by_hashed(filename)
+    if asset is None:
+        abort(404)
+
+    # Best encoding the client accepts (br > gzip > identity)
+    path, encoding = asset.variants["identity"], None
+    for candidate in ("br", "gzip"):
+        if candidate in asset.variants and request.accept_encodings[candidate] > 0:
+            path, encoding = asset.variants[candidate], candidate
+            break
+
+    # send_file goes through wsgi.file_wrapper (sendfile on most servers)
+    # or X-Sendfile when USE_X_SENDFILE is set.
+    resp = send_file(
+        path,
+        mimetype=mimetypes.guess_type(asset.filename)[0] or "application/octet-stream",
+        conditional=True,
+        etag=f"{asset.digest}-{encoding or 'identity'}",
+        max_age=IMMUTABLE_MAX_AGE,
+    )
+    if encoding:
+        resp.headers["Content-Encoding"] = encoding
+    resp.vary.add("Accept-Encoding")
+    resp.cache_control.public = True
+    resp.cache_control.immutable = True
+    return resp
@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_user, logout_user, login_required, current_user
 
 from .model import get_user_by_email, create_user
+from .throttle import login_throttle
 
 auth = Blueprint("auth", __name__, url_prefix="/auth")
 
@@ -16,6 +17,12 @@ def login():
         email = request.form.get("email", "").strip()
         password = request.form.get("password", "")
 
+        # Throttle per account and per client before any hashing work
+        wait = login_throttle.attempt(email, request.remote_addr)
+        if wait:
+            flash("تعداد تلاش‌های ورود بیش از حد مجاز است. لطفاً کمی بعد دوباره تلاش کنید.", "danger")
+            return render_template("auth/login.html"), 429, {"Retry-After": str(int(wait) + 1)}
+
         user = get_user_by_email(email)
         if not user or not user.check_password(password):
             flash("ایمیل یا رمز عبور نادرست است.", "danger")
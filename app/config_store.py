@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Tuple
+
+
+# ---------------------------
+# Read-only containers
+# ---------------------------
+
+class FrozenDict(dict):
+    """
+    dict that refuses mutation.
+    Still a real dict, so jsonify / tojson / Jinja lookups work unchanged.
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("config data is read-only; copy it before modifying")
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    __ior__ = _readonly
+    clear = _readonly
+    pop = _readonly
+    popitem = _readonly
+    setdefault = _readonly
+    update = _readonly
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+
+def freeze(value: Any) -> Any:
+    """Recursively turn dicts into FrozenDict and lists into tuples."""
+    if isinstance(value, dict):
+        return FrozenDict((k, freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """Inverse of freeze(): a fully mutable deep copy."""
+    if isinstance(value, dict):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+
+# ---------------------------
+# Config Store
+# ---------------------------
+
+class ConfigStore:
+    """
+    Parse each JSON file once and keep it in memory.
+
+    A file is re-read only when its (mtime, size) signature changes, so
+    editing a file under DATA_DIR is still picked up without a restart.
+    Values are handed out frozen: callers that need to modify them must
+    copy first (see thaw()). Each cached copy also carries a hash of the
+    file's bytes, usable as a strong ETag (see digest()).
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[Tuple[int, int], Any, str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: os.PathLike | str) -> Any:
+        """
+        Return the parsed, frozen contents of `path`.
+        Raises FileNotFoundError / json.JSONDecodeError like json.load would.
+        """
+        key = str(path)
+        st = os.stat(key)
+        signature = (st.st_mtime_ns, st.st_size)
+
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                return entry[1]
+
+            with open(key, "rb") as f:
+                raw = f.read()
+            data = freeze(json.loads(raw.decode("utf-8-sig")))
+            digest = hashlib.blake2b(raw, digest_size=16).hexdigest()
+            self._entries[key] = (signature, data, digest)
+            return data
+
+    def version(self, path: os.PathLike | str) -> Tuple[int, int] | None:
+        """(mtime_ns, size) of the cached copy, or None if not loaded yet."""
+        entry = self._entries.get(str(path))
+        return entry[0] if entry else None
+
+    def digest(self, path: os.PathLike | str) -> str | None:
+        """Content hash of the cached copy, or None if not loaded yet."""
+        entry = self._entries.get(str(path))
+        return entry[2] if entry else None
+
+    def invalidate(self, path: os.PathLike | str | None = None):
+        """Drop one cached file (or all of them)."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(path), None)
+
+
+config_store = ConfigStore()
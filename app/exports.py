@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import csv
+import datetime as dt
+import io
+import json
+import zlib
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, Sequence, Tuple
+
+from .model import get_repository
+
+
+# ---------------------------
+# Datasets
+#   Each one turns a date range into a lazy stream of row tuples, read
+#   straight from the repository's iter_* methods.
+# ---------------------------
+
+@dataclass(frozen=True)
+class ExportDataset:
+    columns: Tuple[str, ...]
+    rows: Callable[[dt.date, dt.date], Iterator[tuple]]  # (from, to), inclusive
+
+
+def _day_bounds(date_from: dt.date, date_to: dt.date) -> Tuple[dt.datetime, dt.datetime]:
+    """[start, end) covering the days date_from..date_to."""
+    start = dt.datetime.combine(date_from, dt.time())
+    if date_to == dt.date.max:
+        return start, dt.datetime.max
+    return start, dt.datetime.combine(date_to + dt.timedelta(days=1), dt.time())
+
+
+def _wallet_rows(date_from: dt.date, date_to: dt.date) -> Iterator[tuple]:
+    for user_id, email, tx in get_repository().iter_wallet_transactions(*_day_bounds(date_from, date_to)):
+        yield user_id, email, tx.timestamp.isoformat(), tx.type, tx.amount, tx.description
+
+
+def _booking_rows(date_from: dt.date, date_to: dt.date) -> Iterator[tuple]:
+    for b in get_repository().iter_bookings(date_from.isoformat(), date_to.isoformat()):
+        yield b.id, b.user_id, b.date, b.time, b.duration, str(b.type), b.lane, str(b.status)
+
+
+def _registration_rows(date_from: dt.date, date_to: dt.date) -> Iterator[tuple]:
+    for r in get_repository().iter_event_registrations(*_day_bounds(date_from, date_to)):
+        yield (r.id, r.event_slug, r.title, r.user_id, r.name, r.email, r.price,
+               r.created_at.isoformat(), r.status)
+
+
+DATASETS = {
+    "wallet": ExportDataset(
+        ("user_id", "email", "timestamp", "type", "amount", "description"),
+        _wallet_rows,
+    ),
+    "bookings": ExportDataset(
+        ("id", "user_id", "date", "time", "duration", "type", "lane", "status"),
+        _booking_rows,
+    ),
+    "registrations": ExportDataset(
+        ("id", "event_slug", "title", "user_id", "name", "email", "price", "created_at", "status"),
+        _registration_rows,
+    ),
+}
+
+
+# ---------------------------
+# Encoders
+#   Rows are buffered into chunks of roughly CHUNK_SIZE characters, so the
+#   response is written in a few large pieces instead of one per row,
+#   while memory stays bounded by the chunk size.
+# ---------------------------
+
+CHUNK_SIZE = 64 * 1024
+
+
+# Text cells starting with these are read as formulas by spreadsheet apps
+_FORMULA_PREFIXES = frozenset("=+-@\t\r")
+
+
+def _csv_cell(value):
+    """Text that would start a formula gets a leading quote (CSV injection)."""
+    if value.__class__ is str and value and value[0] in _FORMULA_PREFIXES:
+        return "'" + value
+    return value
+
+
+def csv_chunks(columns: Sequence[str], rows: Iterable[tuple]) -> Iterator[str]:
+    """CSV with a BOM, so spreadsheet apps read the Persian text as UTF-8."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_csv_cell(value) for value in row])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def ndjson_chunks(columns: Sequence[str], rows: Iterable[tuple]) -> Iterator[str]:
+    """One JSON object per line."""
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    lines = []
+    size = 0
+    for row in rows:
+        line = encode(dict(zip(columns, row)))
+        lines.append(line)
+        size += len(line) + 1
+        if size >= CHUNK_SIZE:
+            lines.append("")
+            yield "\n".join(lines)
+            lines = []
+            size = 0
+    if lines:
+        lines.append("")
+        yield "\n".join(lines)
+
+
+ENCODERS = {
+    "csv": (csv_chunks, "text/csv"),
+    "ndjson": (ndjson_chunks, "application/x-ndjson"),
+}
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Compress a byte stream on the fly into one gzip member."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip header
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(dataset: str, fmt: str, date_from: dt.date, date_to: dt.date, gzip: bool = False) -> Iterator[bytes]:
+    """Encoded (and optionally gzipped) bytes of one export, produced lazily."""
+    spec = DATASETS[dataset]
+    encoder, _ = ENCODERS[fmt]
+    chunks = (text.encode("utf-8") for text in encoder(spec.columns, spec.rows(date_from, date_to)))
+    return gzip_chunks(chunks) if gzip else chunks
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Tuple
+
+from markupsafe import Markup
+
+
+# ---------------------------
+# Fragment Cache
+# ---------------------------
+
+class FragmentCache:
+    """
+    Rendered HTML of template sections, keyed by what they depend on.
+
+    Templates wrap a section in a call block:
+
+        {% call fragment("pools", fragment_keys.pools) %}
+          ... expensive markup ...
+        {% endcall %}
+
+    The block body is only rendered when (name, key) is not cached; Jinja
+    does not evaluate a call body until caller() is invoked. Keys are
+    built by the view from source versions (config_store.version(),
+    rankings snapshot version, ...), so a stale entry is never served,
+    just left to age out of the LRU.
+    """
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, Hashable], Markup]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, name: str, key: Hashable, caller: Callable[[], str]) -> Markup:
+        cache_key = (name, key)
+        with self._lock:
+            html = self._entries.get(cache_key)
+            if html is not None:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return html
+
+        # Render outside the lock; two concurrent misses just render twice
+        html = Markup(caller())
+        with self._lock:
+            self.misses += 1
+            self._entries[cache_key] = html
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return html
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+fragment_cache = FragmentCache()
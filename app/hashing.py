@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from werkzeug.exceptions import ServiceUnavailable
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashingBusy(ServiceUnavailable):
+    """Too many password hashes queued; rendered by Flask as a 503."""
+
+    description = "سرور در حال حاضر مشغول است. لطفاً چند لحظه دیگر دوباره تلاش کنید."
+
+
+# ---------------------------
+# Password Hasher
+# ---------------------------
+
+class PasswordHasher:
+    """
+    Runs werkzeug's password hashing (scrypt / pbkdf2, deliberately slow)
+    in a bounded process pool instead of on the request thread.
+
+      - at most `max_pending` hashes are in flight (running + queued);
+        beyond that HashingBusy is raised at once (503 + Retry-After),
+        so a login flood cannot queue up unbounded work.
+      - the request thread only waits on a future, so cheap requests in
+        the same worker keep being served while hashes run elsewhere.
+
+    Until start() is called hashing runs inline (e.g. the dev user
+    seeded at import time, or scripts that never create the app).
+    """
+
+    def __init__(self):
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[threading.BoundedSemaphore] = None
+        self._lock = threading.Lock()
+        self.workers = 0
+        self.max_pending = 0
+        self.timeout = 30.0
+
+    def start(self, workers: Optional[int] = None, max_pending: Optional[int] = None, timeout: float = 30.0):
+        """
+        Create the pool and start its processes right away. Call this
+        early, before background threads exist, because workers are forked.
+        """
+        with self._lock:
+            if self._pool is not None:
+                return
+            self.workers = workers or os.cpu_count() or 1
+            self.max_pending = max_pending or self.workers * 4
+            self.timeout = timeout
+            self._slots = threading.BoundedSemaphore(self.max_pending)
+            self._pool = self._new_pool()
+        # fork-based pools start every worker on the first submit
+        self._pool.submit(int).result()
+
+    def _new_pool(self, replacement: bool = False) -> ProcessPoolExecutor:
+        """
+        The first pool is forked: cheap, and start() runs before other
+        threads exist. A replacement is created while request, refresher
+        and journal threads are running, and a fork then could copy a lock
+        one of them holds into the child; it uses forkserver (spawn where
+        unavailable) so workers start from a clean single-threaded process.
+        """
+        methods = multiprocessing.get_all_start_methods()
+        if replacement:
+            method = "forkserver" if "forkserver" in methods else "spawn"
+        else:
+            method = "fork" if "fork" in methods else None
+        return ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context(method))
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, fn, *args):
+        pool = self._pool
+        if pool is None:
+            return fn(*args)
+
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy(retry_after=1)
+        try:
+            future = pool.submit(fn, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._replace_pool(pool)
+            raise HashingBusy(retry_after=1)
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            raise HashingBusy(retry_after=5)
+        except BrokenProcessPool:
+            self._replace_pool(pool)
+            raise HashingBusy(retry_after=1)
+
+    def _replace_pool(self, broken: ProcessPoolExecutor):
+        """A worker died (OOM killer, ...): start a fresh pool once."""
+        with self._lock:
+            if self._pool is broken:
+                self._pool = self._new_pool(replacement=True)
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    # ---- API ----
+
+    def generate(self, password: str) -> str:
+        return self._run(generate_password_hash, password)
+
+    def check(self, password_hash: str, password: str) -> bool:
+        return self._run(check_password_hash, password_hash, password)
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,447 @@
+from __future__ import annotations
+
+import datetime as dt
+import os
+import pickle
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from .model import (
+    Booking,
+    BookingStatus,
+    ClassEnrollment,
+    EventRegistration,
+    MembershipHistoryItem,
+    MemoryRepository,
+    User,
+    WalletTransaction,
+)
+from .rollups import compute_rollups
+
+
+# ---------------------------
+# Journal file format
+#   A directory of segments "journal-<first lsn>.log". Each record is
+#     <length:u32><lsn:u64><crc32:u32><pickled tuple>
+#   A torn record at the tail (crash mid-write) is detected by length/CRC
+#   and truncated away on open.
+# ---------------------------
+
+_HEADER = struct.Struct("<IQI")
+
+
+def _encode(lsn: int, record: tuple) -> bytes:
+    payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+    return _HEADER.pack(len(payload), lsn, zlib.crc32(payload)) + payload
+
+
+def _read_segment(path: Path) -> Iterator[Tuple[int, tuple, int]]:
+    """Yield (lsn, record, end_offset) for every intact record in a segment."""
+    with open(path, "rb") as f:
+        data = f.read()
+    pos = 0
+    while pos + _HEADER.size <= len(data):
+        length, lsn, crc = _HEADER.unpack_from(data, pos)
+        start = pos + _HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return
+        pos = start + length
+        yield lsn, pickle.loads(payload), pos
+
+
+def _segments(directory: Path) -> List[Tuple[int, Path]]:
+    found = []
+    for p in directory.glob("journal-*.log"):
+        try:
+            found.append((int(p.stem.split("-", 1)[1]), p))
+        except ValueError:
+            continue
+    return sorted(found)
+
+
+class Journal:
+    """
+    Append-only log with group commit.
+
+    append() only queues a record and returns its LSN; a flusher thread
+    writes everything queued so far and fsyncs once per batch. wait(lsn)
+    blocks until that record is on disk, so concurrent writers share
+    fsyncs instead of paying for one each.
+    """
+
+    def __init__(self, directory: Path, next_lsn: int, fsync: bool = True):
+        self.directory = directory
+        self.fsync = fsync
+
+        self._cond = threading.Condition()
+        self._pending: List[bytes] = []
+        self._next_lsn = next_lsn
+        self._durable_lsn = next_lsn - 1
+        self._error: Optional[BaseException] = None
+        self._closed = False
+
+        self._file = open(directory / f"journal-{next_lsn:020d}.log", "ab")
+        self._thread = threading.Thread(target=self._flush_loop, name="journal-flusher", daemon=True)
+        self._thread.start()
+
+    @property
+    def last_lsn(self) -> int:
+        return self._next_lsn - 1
+
+    def append(self, record: tuple) -> int:
+        with self._cond:
+            lsn = self._next_lsn
+            self._next_lsn += 1
+            self._pending.append(_encode(lsn, record))
+            self._cond.notify_all()
+        return lsn
+
+    def wait(self, lsn: int):
+        with self._cond:
+            while self._durable_lsn < lsn:
+                if self._error:
+                    raise RuntimeError("journal write failed") from self._error
+                self._cond.wait()
+
+    def rotate(self) -> int:
+        """
+        Start a new segment; returns the last LSN of the old ones.
+        Caller must ensure no append() runs concurrently.
+        """
+        with self._cond:
+            last = self.last_lsn
+            while self._durable_lsn < last:
+                self._cond.wait()
+            self._file.close()
+            self._file = open(self.directory / f"journal-{self._next_lsn:020d}.log", "ab")
+            return last
+
+    def drop_segments_through(self, lsn: int):
+        """Delete segments whose records are all <= lsn (covered by a snapshot)."""
+        segs = _segments(self.directory)
+        for (first, path), nxt in zip(segs, segs[1:] + [(None, None)]):
+            next_first = nxt[0]
+            if next_first is not None and next_first <= lsn + 1:
+                path.unlink(missing_ok=True)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._file.close()
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending and self._closed:
+                    return
+                batch, self._pending = self._pending, []
+                last = self._next_lsn - 1
+                f = self._file
+
+            try:
+                f.write(b"".join(batch))
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+            except BaseException as exc:
+                with self._cond:
+                    self._error = exc
+                    self._cond.notify_all()
+                return
+
+            with self._cond:
+                self._durable_lsn = last
+                self._cond.notify_all()
+
+
+# ---------------------------
+# Journaled in-memory repository
+# ---------------------------
+
+class JournaledRepository(MemoryRepository):
+    """
+    MemoryRepository that appends a compact record for every mutation and
+    periodically writes a binary snapshot, so a restart loads the snapshot
+    and replays only the journal tail.
+
+    Replay is idempotent: a record already reflected in the snapshot is a
+    no-op. That lets the snapshot be taken while request threads keep
+    updating user objects.
+    """
+
+    SNAPSHOT_NAME = "snapshot.bin"
+
+    def __init__(
+        self,
+        directory: str,
+        snapshot_interval: float = 300,
+        snapshot_min_records: int = 10_000,
+        fsync: bool = True,
+    ):
+        super().__init__()
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_min_records = snapshot_min_records
+
+        self._replaying = False
+        self._snapshot_lsn = 0
+
+        last_lsn = self._recover()
+        # Rollups are not journaled: rebuilt from the recovered records
+        self.replace_rollups(compute_rollups(self))
+        self.journal = Journal(self.directory, last_lsn + 1, fsync=fsync)
+
+        self._stop = threading.Event()
+        self._snapshotter = threading.Thread(
+            target=self._snapshot_loop, name="journal-snapshotter", daemon=True
+        )
+        self._snapshotter.start()
+
+    # ---- Recovery ----
+
+    def _recover(self) -> int:
+        snapshot = self.directory / self.SNAPSHOT_NAME
+        last_lsn = 0
+        self._replaying = True
+        try:
+            if snapshot.exists():
+                with open(snapshot, "rb") as f:
+                    last_lsn, state = pickle.load(f)
+                self.load_state(state)
+            self._snapshot_lsn = last_lsn
+
+            for _, path in _segments(self.directory):
+                good_end = 0
+                for lsn, record, end in _read_segment(path):
+                    good_end = end
+                    if lsn > last_lsn:
+                        self._apply(record)
+                        last_lsn = lsn
+                if good_end < path.stat().st_size:
+                    with open(path, "r+b") as f:
+                        f.truncate(good_end)
+        finally:
+            self._replaying = False
+        return last_lsn
+
+    def _apply(self, record: tuple):
+        op, *args = record
+        getattr(self, f"_replay_{op}")(*args)
+
+    def _replay_user(self, user_id, email, password_hash, first_name, last_name):
+        if user_id not in self.users_by_id:
+            self._store_user(User(
+                id=user_id, email=email, password_hash=password_hash,
+                first_name=first_name, last_name=last_name,
+            ))
+
+    def _replay_email(self, user_id, email):
+        user = self.users_by_id[user_id]
+        if user.email != email:
+            MemoryRepository.change_user_email(self, user, email)
+
+    def _replay_profile(self, user_id, first_name, last_name, phone, birthdate,
+                        emergency_contact, password_hash):
+        user = self.users_by_id[user_id]
+        user.first_name = first_name
+        user.last_name = last_name
+        user.phone = phone
+        user.birthdate = birthdate
+        user.emergency_contact = emergency_contact
+        user.password_hash = password_hash
+
+    def _replay_wallet(self, user_id, index, amount, tx_type, timestamp, description,
+                       balance, version):
+        user = self.users_by_id[user_id]
+        if len(user.wallet_transactions) <= index:
+            user.wallet_transactions.append(WalletTransaction(
+                amount=amount, type=tx_type, timestamp=timestamp, description=description,
+            ))
+        if version > user.wallet_version:
+            user.wallet_balance = balance
+            user.wallet_version = version
+
+    def _replay_membership(self, user_id, slug, name, expires_at, item_fields):
+        user = self.users_by_id[user_id]
+        user.membership_slug = slug
+        user.membership_name = name
+        user.membership_expires_at = expires_at
+        item = MembershipHistoryItem(*item_fields)
+        for existing in user.membership_history:
+            if existing.id == item.id:
+                existing.status = item.status
+                return
+        user.membership_history.append(item)
+        MemoryRepository.save_membership(self, user, item)
+
+    def _replay_expire_memberships(self, today):
+        MemoryRepository.expire_memberships(self, today)
+
+    def _replay_enroll(self, user_id, fields):
+        user = self.users_by_id[user_id]
+        enrollment = ClassEnrollment(*fields)
+        if all(e.id != enrollment.id for e in user.class_enrollments):
+            user.class_enrollments.append(enrollment)
+
+    def _replay_booking(self, fields):
+        booking = Booking(*fields)
+        if booking.id not in self.bookings:
+            self._store_booking(booking, int(booking.id))
+
+    def _replay_booking_status(self, booking_id, status):
+        MemoryRepository.set_booking_status(self, self.bookings[booking_id], BookingStatus(status))
+
+    def _replay_event_reg(self, fields):
+        reg = EventRegistration(*fields)
+        if reg.id not in self.event_registrations_by_id:
+            MemoryRepository.add_event_registration(self, reg)
+
+    # ---- Journaling ----
+
+    def _log(self, record: tuple):
+        """Append while holding self._lock; wait for durability after releasing it."""
+        return self.journal.append(record)
+
+    def add_user(self, user: User) -> User:
+        with self._lock:
+            super().add_user(user)
+            lsn = self._log(("user", user.id, user.email, user.password_hash,
+                             user.first_name, user.last_name))
+        self.journal.wait(lsn)
+        return user
+
+    def change_user_email(self, user: User, email: str) -> bool:
+        with self._lock:
+            if not super().change_user_email(user, email):
+                return False
+            lsn = self._log(("email", user.id, email))
+        self.journal.wait(lsn)
+        return True
+
+    def save_user_profile(self, user: User):
+        with self._lock:
+            lsn = self._log(("profile", user.id, user.first_name, user.last_name, user.phone,
+                             user.birthdate, user.emergency_contact, user.password_hash))
+        self.journal.wait(lsn)
+
+    def compare_and_set_wallet(self, user: User, expected_version: int, tx: WalletTransaction) -> bool:
+        with self._lock:
+            if not super().compare_and_set_wallet(user, expected_version, tx):
+                return False
+            stored = self.users_by_id[user.id]
+            lsn = self._log(("wallet", user.id, len(stored.wallet_transactions) - 1, tx.amount,
+                             tx.type, tx.timestamp, tx.description, stored.wallet_balance,
+                             stored.wallet_version))
+        self.journal.wait(lsn)
+        return True
+
+    def save_membership(self, user: User, item: MembershipHistoryItem):
+        with self._lock:
+            super().save_membership(user, item)
+            lsn = self._log((
+                "membership", user.id, user.membership_slug, user.membership_name,
+                user.membership_expires_at,
+                (item.id, item.plan_slug, item.plan_name, item.purchased_at,
+                 item.expires_at, item.amount, item.status),
+            ))
+        self.journal.wait(lsn)
+
+    def expire_memberships(self, today: dt.date) -> int:
+        with self._lock:
+            expired = super().expire_memberships(today)
+            if not expired:
+                return 0
+            lsn = self._log(("expire_memberships", today))
+        self.journal.wait(lsn)
+        return expired
+
+    def add_class_enrollment(self, user: User, enrollment: ClassEnrollment):
+        with self._lock:
+            lsn = self._log(("enroll", user.id, (
+                enrollment.id, enrollment.class_slug, enrollment.class_name, enrollment.coach,
+                enrollment.time, enrollment.price, enrollment.enrolled_at, enrollment.status,
+            )))
+        self.journal.wait(lsn)
+
+    def add_booking(self, booking: Booking) -> Booking:
+        with self._lock:
+            super().add_booking(booking)
+            lsn = self._log(("booking", (
+                booking.id, booking.user_id, booking.date, booking.time, booking.duration,
+                str(booking.type), booking.lane, str(booking.status),
+            )))
+        self.journal.wait(lsn)
+        return booking
+
+    def set_booking_status(self, booking: Booking, status: BookingStatus) -> bool:
+        with self._lock:
+            if not super().set_booking_status(booking, status):
+                return False
+            lsn = self._log(("booking_status", booking.id, str(status)))
+        self.journal.wait(lsn)
+        return True
+
+    def expire_bookings(self, now: float):
+        # One record per expired booking, but a single wait for all of
+        # them, after the lock is released
+        lsn = None
+        with self._lock:
+            for booking in self.booking_expiry.pop_due(now):
+                if booking.status is BookingStatus.ACTIVE:
+                    MemoryRepository.set_booking_status(self, booking, BookingStatus.EXPIRED)
+                    lsn = self._log(("booking_status", booking.id, str(BookingStatus.EXPIRED)))
+        if lsn is not None:
+            self.journal.wait(lsn)
+
+    def add_event_registration(self, reg: EventRegistration):
+        with self._lock:
+            super().add_event_registration(reg)
+            if self._replaying:
+                return
+            lsn = self._log(("event_reg", (
+                reg.id, reg.event_slug, reg.title, reg.user_id, reg.name, reg.email,
+                reg.price, reg.created_at, reg.status,
+            )))
+        self.journal.wait(lsn)
+
+    # ---- Snapshots ----
+
+    def snapshot(self):
+        """
+        Write snapshot.bin atomically, then drop journal segments it covers.
+        Mutations are paused only while the state is serialised in memory.
+        """
+        with self._lock:
+            lsn = self.journal.rotate()
+            data = pickle.dumps((lsn, self.dump_state()), protocol=pickle.HIGHEST_PROTOCOL)
+
+        tmp = self.directory / (self.SNAPSHOT_NAME + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.directory / self.SNAPSHOT_NAME)
+        self._snapshot_lsn = lsn
+        self.journal.drop_segments_through(lsn)
+
+    def _snapshot_loop(self):
+        while not self._stop.wait(self.snapshot_interval):
+            if self.journal.last_lsn - self._snapshot_lsn >= self.snapshot_min_records:
+                try:
+                    self.snapshot()
+                except Exception as exc:
+                    print("Journal snapshot failed:", exc)
+
+    def close(self):
+        self._stop.set()
+        self._snapshotter.join()
+        self.journal.close()
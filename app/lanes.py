@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+MINUTES_PER_DAY = 24 * 60
+
+
+# ---------------------------
+# Lane Allocator
+# ---------------------------
+
+class LaneAllocator:
+    """
+    Busy time of each lane as per-day bitsets.
+
+    Bit i of bits[day][lane] is minute i of that day (1-minute buckets, so
+    bookings at any HH:MM are represented exactly). A whole day of one lane
+    is a single Python int, so "is lane free for [start, end)" is one AND,
+    and the free run around an interval is found with bit_length tricks
+    instead of scanning bookings.
+
+    Times are epoch minutes, as produced by booking_interval().
+    """
+
+    def __init__(self, lanes: Iterable[int]):
+        self.lanes = list(lanes)
+        self.bits: Dict[int, Dict[int, int]] = {}  # day -> lane -> bitset
+
+    @staticmethod
+    def _pieces(start: int, end: int) -> Iterable[Tuple[int, int]]:
+        """Split [start, end) at midnight: yields (day, mask)."""
+        while start < end:
+            day = start // MINUTES_PER_DAY
+            offset = start - day * MINUTES_PER_DAY
+            length = min(end - start, MINUTES_PER_DAY - offset)
+            yield day, ((1 << length) - 1) << offset
+            start += length
+
+    # ---- Updates ----
+
+    def occupy(self, lane: int, start: int, end: int):
+        for day, mask in self._pieces(start, end):
+            lanes = self.bits.setdefault(day, {})
+            lanes[lane] = lanes.get(lane, 0) | mask
+
+    def release(self, lane: int, start: int, end: int):
+        for day, mask in self._pieces(start, end):
+            lanes = self.bits.get(day)
+            if not lanes:
+                continue
+            remaining = lanes.get(lane, 0) & ~mask
+            if remaining:
+                lanes[lane] = remaining
+            else:
+                lanes.pop(lane, None)
+                if not lanes:
+                    del self.bits[day]
+
+    # ---- Queries ----
+
+    def is_free(self, lane: int, start: int, end: int) -> bool:
+        return not any(
+            self.bits.get(day, {}).get(lane, 0) & mask for day, mask in self._pieces(start, end)
+        )
+
+    def free_lanes(self, start: int, end: int) -> List[int]:
+        return [lane for lane in self.lanes if self.is_free(lane, start, end)]
+
+    def leftover(self, lane: int, start: int, end: int) -> Tuple[int, int]:
+        """
+        Free minutes left before and after [start, end) inside the free run
+        that contains it (the day boundary counts as the run's edge).
+        """
+        first_day = start // MINUTES_PER_DAY
+        offset = start - first_day * MINUTES_PER_DAY
+        below = self.bits.get(first_day, {}).get(lane, 0) & ((1 << offset) - 1)
+        before = offset - below.bit_length()
+
+        last_day = (end - 1) // MINUTES_PER_DAY
+        offset = end - last_day * MINUTES_PER_DAY
+        above = self.bits.get(last_day, {}).get(lane, 0) >> offset
+        after = (above & -above).bit_length() - 1 if above else MINUTES_PER_DAY - offset
+
+        return before, after
+
+    def first_fit(self, start: int, end: int) -> Optional[int]:
+        for lane in self.lanes:
+            if self.is_free(lane, start, end):
+                return lane
+        return None
+
+    def best_fit(self, start: int, end: int) -> Optional[int]:
+        """
+        The free lane whose free run around [start, end) is tightest, so
+        long empty stretches stay available for long bookings. Ties prefer
+        the lane where the booking sits flush against a neighbour, then the
+        lowest lane number.
+        """
+        best = None
+        best_key = None
+        for lane in self.lanes:
+            if not self.is_free(lane, start, end):
+                continue
+            before, after = self.leftover(lane, start, end)
+            key = (before + after, min(before, after), lane)
+            if best_key is None or key < best_key:
+                best, best_key = lane, key
+        return best
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple
+
+from .model import User, WalletTransaction, get_repository
+from .rollups import wallet_increments
+
+
+class LedgerConflict(RuntimeError):
+    """The account kept changing under us; the update was not applied."""
+
+
+# ---------------------------
+# Ledger Transaction
+# ---------------------------
+
+class LedgerTransaction:
+    """
+    Wallet entries posted inside `with ledger.transaction():`.
+
+    If the block raises, every entry is reversed with a compensating
+    "refund" entry (newest first). The ledger stays append-only, so the
+    sum of an account's entries always equals its balance.
+    """
+
+    def __init__(self, ledger: Ledger):
+        self.ledger = ledger
+        self.entries: List[Tuple[User, WalletTransaction]] = []
+
+    def rollback(self):
+        entries, self.entries = self.entries, []
+        for user, tx in reversed(entries):
+            self.ledger.post(
+                user, -tx.amount, "refund", f"برگشت تراکنش: {tx.description}",
+                allow_negative=True,
+            )
+
+
+# ---------------------------
+# Ledger
+# ---------------------------
+
+class Ledger:
+    """
+    Wallet updates with optimistic concurrency.
+
+    Each account carries a version. post() reads (balance, version),
+    checks the balance, then asks the repository to apply the entry only
+    if the version is unchanged (compare-and-set), retrying on conflict.
+    Concurrent charges by the same user therefore can never overdraw the
+    wallet, and no update is lost.
+    """
+
+    def __init__(self, max_retries: int = 50):
+        self.max_retries = max_retries
+        self._local = threading.local()
+
+    def post(
+        self,
+        user: User,
+        amount: int,
+        tx_type: str,
+        description: str = "",
+        allow_negative: bool = False,
+    ) -> Optional[WalletTransaction]:
+        """
+        Add `amount` (negative for charges) to the user's wallet.
+        Returns the stored transaction, or None if the balance would drop
+        below zero. `user` is updated in place.
+        """
+        repo = get_repository()
+        for _ in range(self.max_retries):
+            state = repo.get_wallet(user.id)
+            if state is None:
+                return None
+            balance, version = state
+            if balance + amount < 0 and not allow_negative:
+                return None
+
+            tx = WalletTransaction(amount=amount, type=tx_type, description=description)
+            with repo.transaction():
+                applied = repo.compare_and_set_wallet(user, version, tx)
+                if applied:
+                    repo.add_rollups(wallet_increments(tx))
+            if applied:
+                active = getattr(self._local, "stack", None)
+                if active:
+                    active[-1].entries.append((user, tx))
+                return tx
+
+        raise LedgerConflict(f"wallet of user {user.id} is too contended")
+
+    @contextmanager
+    def transaction(self) -> Iterator[LedgerTransaction]:
+        """
+        Group several wallet entries with the steps that depend on them:
+
+            with ledger.transaction():
+                if user.charge(price):
+                    create_booking(...)   # raises → charge is refunded
+
+        When nested inside repository.transaction(), the compensating
+        entries are rolled back together with everything else.
+        """
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+
+        txn = LedgerTransaction(self)
+        stack.append(txn)
+        try:
+            yield txn
+        except BaseException:
+            stack.pop()
+            txn.rollback()
+            raise
+        else:
+            stack.pop()
+            if stack:  # inner success still rolls back with the outer block
+                stack[-1].entries.extend(txn.entries)
+
+
+ledger = Ledger()
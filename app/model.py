@@ -1,29 +1,36 @@
+from bisect import bisect_left, insort
+from contextlib import nullcontext
 from dataclasses import dataclass, field
-from typing import Optional, Dict, List, Tuple
+from enum import Enum
+from functools import lru_cache
+from heapq import heappop, heappush
+from itertools import count
+from typing import Any, Optional, Dict, Iterable, Iterator, List, Set, Tuple
 import datetime as dt
+import sys
+import threading
 import uuid
+from time import monotonic
 
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 
-
-# ---------------------------
-# Wallet Transaction Model
-# ---------------------------
-
-@dataclass
-class WalletTransaction:
-    amount: int
-    type: str  # deposit, purchase, refund
-    timestamp: dt.datetime = field(default_factory=dt.datetime.utcnow)
-    description: str = ""
+from .hashing import password_hasher
+from .lanes import MINUTES_PER_DAY, LaneAllocator
+from .pubsub import event_hub
+from .rollups import (
+    booking_increments,
+    class_increments,
+    event_increments,
+    membership_increments,
+)
+from .wallet_history import WalletHistory, WalletTransaction
 
 
 # ---------------------------
 # Membership Model
 # ---------------------------
 
-@dataclass
+@dataclass(slots=True)
 class MembershipHistoryItem:
     id: str
     plan_slug: str
@@ -38,7 +45,7 @@ class MembershipHistoryItem:
 # Class Enrollment Model
 # ---------------------------
 
-@dataclass
+@dataclass(slots=True)
 class ClassEnrollment:
     id: str
     class_slug: str
@@ -55,7 +62,7 @@ class ClassEnrollment:
 #   (used for both wallet & public registrations)
 # ---------------------------
 
-@dataclass
+@dataclass(slots=True)
 class EventRegistration:
     id: str
     event_slug: str
@@ -72,6 +79,7 @@ class EventRegistration:
 # User Model
 # ---------------------------
 
+# No slots: UserMixin has none, so instances keep a __dict__ anyway
 @dataclass
 class User(UserMixin):
     id: str
@@ -82,7 +90,8 @@ class User(UserMixin):
 
     # Wallet
     wallet_balance: int = 0
-    wallet_transactions: List[WalletTransaction] = field(default_factory=list)
+    wallet_version: int = 0      # bumped by every ledger update (see ledger.py)
+    wallet_transactions: WalletHistory = field(default_factory=WalletHistory)
 
     # Membership
     membership_slug: Optional[str] = None
@@ -101,26 +110,16 @@ class User(UserMixin):
     # ---- Methods ----
 
     def check_password(self, password: str) -> bool:
-        return check_password_hash(self.password_hash, password)
+        """Runs in the hashing pool; may raise HashingBusy (503)."""
+        return password_hasher.check(self.password_hash, password)
 
     def deposit(self, amount: int, description: str = "شارژ کیف پول"):
-        self.wallet_balance += amount
-        self.wallet_transactions.append(
-            WalletTransaction(amount=amount, type="deposit", description=description)
-        )
+        from .ledger import ledger
+        ledger.post(self, amount, "deposit", description)
 
     def charge(self, amount: int, description: str = "خرید یا رزرو") -> bool:
-        if self.wallet_balance >= amount:
-            self.wallet_balance -= amount
-            self.wallet_transactions.append(
-                WalletTransaction(
-                    amount=-amount,
-                    type="purchase",
-                    description=description,
-                )
-            )
-            return True
-        return False
+        from .ledger import ledger
+        return ledger.post(self, -amount, "purchase", description) is not None
 
     def has_active_membership(self) -> bool:
         today = dt.date.today()
@@ -145,31 +144,666 @@ class User(UserMixin):
 # Booking Model
 # ---------------------------
 
-@dataclass
+class BookingType(str, Enum):
+    FREE_SWIM = "شنای آزاد"
+    LANE_TRAINING = "لاین تمرین"
+
+    def __str__(self):
+        return self.value
+
+
+class BookingStatus(str, Enum):
+    ACTIVE = "active"
+    CANCELLED = "cancelled"
+    EXPIRED = "expired"
+
+    def __str__(self):
+        return self.value
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def _code(enum_cls, value: str):
+    """Map a string onto its enum member; unknown values are interned as-is."""
+    try:
+        return enum_cls(value)
+    except ValueError:
+        return _intern(value)
+
+
+_EPOCH_ORDINAL = dt.date(1970, 1, 1).toordinal()
+
+
+def epoch_minutes(moment: dt.datetime) -> float:
+    """Minutes since 1970-01-01 00:00 (naive, local time) as a float."""
+    return (
+        (moment.toordinal() - _EPOCH_ORDINAL) * MINUTES_PER_DAY
+        + moment.hour * 60
+        + moment.minute
+        + (moment.second + moment.microsecond / 1e6) / 60
+    )
+
+
+@lru_cache(maxsize=65536)
+def _start_minute(date: str, time: str) -> Optional[int]:
+    # Few distinct (date, time) pairs: journal replay and snapshot loads
+    # would otherwise strptime every booking
+    start_dt = parse_datetime(date, time)
+    if not start_dt:
+        return None
+    return (
+        (start_dt.toordinal() - _EPOCH_ORDINAL) * MINUTES_PER_DAY
+        + start_dt.hour * 60
+        + start_dt.minute
+    )
+
+
+def booking_interval(date: str, time: str, duration: int) -> Optional[Tuple[int, int]]:
+    """(start, end) of a booking in epoch minutes, or None if unparsable."""
+    start = _start_minute(date, time)
+    if start is None:
+        return None
+    return start, start + duration
+
+
+@dataclass(slots=True)
 class Booking:
     id: str
     user_id: str
     date: str          # "YYYY-MM-DD"
     time: str          # "HH:MM"
     duration: int      # minutes
-    type: str          # e.g. "شنای آزاد", "لاین تمرین"
+    type: str          # BookingType, or the raw label for unknown types
     lane: Optional[int] = None
-    status: str = "active"  # active, cancelled, expired
+    status: str = BookingStatus.ACTIVE
+
+    # Epoch minutes, computed once from date/time (None if unparsable)
+    start: Optional[int] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        # Dates, times, types and statuses repeat across bookings: share them
+        self.date = _intern(self.date)
+        self.time = _intern(self.time)
+        self.type = _code(BookingType, self.type)
+        self.status = _code(BookingStatus, self.status)
+        interval = booking_interval(self.date, self.time, self.duration)
+        if interval:
+            self.start = interval[0]
+
+    @property
+    def end(self) -> Optional[int]:
+        return None if self.start is None else self.start + self.duration
+
+    def is_past(self, now: Optional[float] = None) -> bool:
+        """`now` is in epoch minutes; defaults to the current time."""
+        if self.start is None:
+            return True
+        if now is None:
+            now = epoch_minutes(dt.datetime.now())
+        return self.start < now
 
 
 # ---------------------------
-# In-Memory Storage
+# Storage
+#   Module helpers below never touch state directly; they go through a
+#   Repository. MemoryRepository (default) keeps everything in process;
+#   sqlite_repository.SqliteRepository persists it. Use set_repository()
+#   to switch.
 # ---------------------------
 
-_USERS_BY_ID: Dict[str, User] = {}
-_USERS_BY_EMAIL: Dict[str, User] = {}
+POOL_MAX_CAPACITY = 40
 
-_BOOKINGS: Dict[str, Booking] = {}
-_BOOKING_COUNTER = 1
+AVAILABLE_LANES = [1, 2, 3, 4, 5, 6]
 
-POOL_MAX_CAPACITY = 40
 
-_EVENT_REGISTRATIONS: List[EventRegistration] = []
+class Repository:
+    """
+    Storage interface behind the model helpers.
+
+    Objects handed in are already updated by the caller; the repository's
+    job is to store them and to answer the hot queries efficiently.
+    """
+
+    def transaction(self):
+        """
+        Context manager grouping several calls into one atomic unit.
+        In-process stores rely on the caller's locks (see admission.py).
+        """
+        return nullcontext()
+
+    def lane_allocator(self, start: int, end: int) -> LaneAllocator:
+        """
+        Lane occupancy of the days covering [start, end).
+        Built from one overlapping_bookings() query; stores that keep an
+        allocator up to date return it directly.
+        """
+        first = start // MINUTES_PER_DAY * MINUTES_PER_DAY
+        last = ((end - 1) // MINUTES_PER_DAY + 1) * MINUTES_PER_DAY
+        allocator = LaneAllocator(AVAILABLE_LANES)
+        for b in self.overlapping_bookings(first, last):
+            if b.lane is not None:
+                allocator.occupy(b.lane, b.start, b.end)
+        return allocator
+
+    # ---- Users ----
+
+    def add_user(self, user: User) -> User:
+        """Store a new user, assigning user.id."""
+        raise NotImplementedError
+
+    def get_user(self, user_id: str) -> Optional[User]:
+        raise NotImplementedError
+
+    def get_user_by_email(self, email: str) -> Optional[User]:
+        raise NotImplementedError
+
+    def change_user_email(self, user: User, email: str) -> bool:
+        """Set user.email if nobody else uses it. Returns False if taken."""
+        raise NotImplementedError
+
+    def save_user_profile(self, user: User):
+        """Persist names, contact fields and password hash."""
+        raise NotImplementedError
+
+    def get_wallet(self, user_id: str) -> Optional[Tuple[int, int]]:
+        """Current (wallet_balance, wallet_version), or None for unknown users."""
+        raise NotImplementedError
+
+    def compare_and_set_wallet(self, user: User, expected_version: int, tx: WalletTransaction) -> bool:
+        """
+        Apply tx.amount and store tx only if the account is still at
+        `expected_version`. On success the stored account and `user` both
+        reflect the new balance and version.
+        """
+        raise NotImplementedError
+
+    def save_membership(self, user: User, item: MembershipHistoryItem):
+        """Persist the user's current membership fields and `item`."""
+        raise NotImplementedError
+
+    def expire_memberships(self, today: dt.date):
+        """Mark active history items that expired before `today`."""
+        raise NotImplementedError
+
+    def add_class_enrollment(self, user: User, enrollment: ClassEnrollment):
+        raise NotImplementedError
+
+    # ---- Bookings ----
+
+    def add_booking(self, booking: Booking) -> Booking:
+        """Store a new booking, assigning booking.id."""
+        raise NotImplementedError
+
+    def get_booking(self, booking_id: str) -> Optional[Booking]:
+        raise NotImplementedError
+
+    def set_booking_status(self, booking: Booking, status: BookingStatus) -> bool:
+        """Returns False if the stored booking already had that status."""
+        raise NotImplementedError
+
+    def overlapping_bookings(self, start: int, end: int) -> Iterator[Booking]:
+        """Active bookings whose [start, end) intersects the interval (epoch minutes)."""
+        raise NotImplementedError
+
+    def user_bookings(self, user_id: str) -> List[Booking]:
+        """All bookings of a user, oldest first (unparsable dates last)."""
+        raise NotImplementedError
+
+    def next_user_booking(self, user_id: str, now: float) -> Optional[Booking]:
+        """Earliest active booking of the user starting after `now`."""
+        raise NotImplementedError
+
+    def expire_bookings(self, now: float):
+        """Mark active bookings that started before `now` as expired."""
+        raise NotImplementedError
+
+    def booking_rows(self, start: int, end: int) -> List[Tuple[int, int, str, Optional[int]]]:
+        """
+        (start, duration, type, lane) of every non-cancelled booking
+        (active or expired) starting in [start, end), for analytics.
+        """
+        raise NotImplementedError
+
+    # ---- Event registrations ----
+
+    def add_event_registration(self, reg: EventRegistration):
+        raise NotImplementedError
+
+    def count_event_registrations(self, event_slug: str) -> int:
+        raise NotImplementedError
+
+    def user_is_registered_for_event(self, user_id: str, event_slug: str) -> bool:
+        raise NotImplementedError
+
+    def user_event_registrations(self, user_id: str) -> List[EventRegistration]:
+        raise NotImplementedError
+
+    # ---- Exports ----
+    #   Lazy iterators: exports stream rows out instead of building lists.
+
+    def iter_wallet_transactions(
+        self, start: dt.datetime, end: dt.datetime
+    ) -> Iterator[Tuple[str, str, WalletTransaction]]:
+        """
+        (user_id, email, transaction) of every wallet entry made in
+        [start, end) (UTC), grouped by user, oldest first.
+        """
+        raise NotImplementedError
+
+    def iter_bookings(self, date_from: str, date_to: str) -> Iterator[Booking]:
+        """Bookings of any status dated date_from..date_to (inclusive), by id."""
+        raise NotImplementedError
+
+    def iter_event_registrations(self, start: dt.datetime, end: dt.datetime) -> Iterator[EventRegistration]:
+        """Event registrations (any status) created in [start, end), oldest first."""
+        raise NotImplementedError
+
+    def iter_users(self) -> Iterator[User]:
+        raise NotImplementedError
+
+    # ---- Rollups (see rollups.py) ----
+
+    def add_rollups(self, increments: Iterable[Tuple[str, str, int]]):
+        """Add each (period, metric, amount) to the stored aggregates."""
+        raise NotImplementedError
+
+    def get_rollups(self, first: str, last: str) -> Dict[str, Dict[str, int]]:
+        """
+        period -> metric -> value for periods first..last (inclusive).
+        Periods are "YYYY-MM-DD" or "YYYY-MM"; the length of `first` picks which.
+        """
+        raise NotImplementedError
+
+    def replace_rollups(self, rollups: Dict[str, Dict[str, int]]):
+        """Swap every stored aggregate for `rollups` at once."""
+        raise NotImplementedError
+
+
+class _DayIndex:
+    """Active bookings starting on one day: (start, end, id) sorted by start."""
+
+    __slots__ = ("entries", "max_duration")
+
+    def __init__(self):
+        self.entries: List[Tuple[int, int, str]] = []
+        self.max_duration = 0
+
+
+class _ExpiryQueue:
+    """
+    Min-heap of items keyed by the moment they become past, so a refresh
+    pops only what is now due instead of scanning everything.
+    """
+
+    __slots__ = ("_heap", "_seq")
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, Any]] = []
+        self._seq = count()
+
+    def push(self, due: float, item: Any):
+        heappush(self._heap, (due, next(self._seq), item))
+
+    def pop_due(self, now: float) -> Iterator[Any]:
+        """Pop and yield every item whose `due` is strictly before `now`."""
+        heap = self._heap
+        while heap and heap[0][0] < now:
+            yield heappop(heap)[2]
+
+    def __len__(self):
+        return len(self._heap)
+
+
+class MemoryRepository(Repository):
+    """
+    Everything lives in this process. Objects are shared, so the
+    persistence hooks (save_*, add_class_enrollment, ...) are no-ops.
+    Request threads share one instance; an RLock guards the indexes.
+
+    Indexes:
+      - bookings_by_day: active bookings grouped by start day (epoch minutes)
+      - booking_ids_by_user: every booking of a user as (start, seq, id),
+        sorted chronologically
+      - upcoming_by_user: min-heap of (start, seq, id) of active bookings;
+        cancelled/expired/past entries are dropped lazily at the top
+      - booking_expiry / membership_expiry: see _ExpiryQueue
+      - lanes: LaneAllocator bitsets of active bookings that hold a lane
+      - per-slug registered counters and (user_id, slug) pairs
+      - rollups: daily / monthly aggregates (see rollups.py)
+    """
+
+    def __init__(self):
+        self.users_by_id: Dict[str, User] = {}
+        self.users_by_email: Dict[str, User] = {}
+        self._lock = threading.RLock()  # request threads share the indexes
+
+        self.bookings: Dict[str, Booking] = {}
+        self.booking_counter = 1
+        self.bookings_by_day: Dict[int, _DayIndex] = {}
+        self.max_booking_duration = 0
+        self.lanes = LaneAllocator(AVAILABLE_LANES)  # active bookings with a lane
+        self.booking_ids_by_user: Dict[str, List[Tuple[float, int, str]]] = {}
+        self.upcoming_by_user: Dict[str, List[Tuple[int, int, str]]] = {}
+        self.booking_expiry = _ExpiryQueue()       # due = booking start
+        self.membership_expiry = _ExpiryQueue()    # due = expires_at ordinal
+
+        self.event_registrations: List[EventRegistration] = []
+        self.event_registrations_by_id: Dict[str, EventRegistration] = {}
+        self.event_registrations_by_user: Dict[str, List[EventRegistration]] = {}
+        self.event_registered_count: Dict[str, int] = {}
+        self.event_registered_pairs: Set[Tuple[str, str]] = set()
+
+        self.rollups: Dict[str, Dict[str, int]] = {}  # period -> metric -> value
+
+    # ---- Users ----
+
+    def add_user(self, user: User) -> User:
+        with self._lock:
+            user.id = str(len(self.users_by_id) + 1)
+            self._store_user(user)
+            return user
+
+    def _store_user(self, user: User):
+        self.users_by_id[user.id] = user
+        self.users_by_email[user.email] = user
+        for item in user.membership_history:
+            if item.status == "active":
+                self.membership_expiry.push(item.expires_at.toordinal(), item)
+
+    def get_user(self, user_id: str) -> Optional[User]:
+        return self.users_by_id.get(user_id)
+
+    def get_user_by_email(self, email: str) -> Optional[User]:
+        return self.users_by_email.get(email)
+
+    def change_user_email(self, user: User, email: str) -> bool:
+        with self._lock:
+            if email in self.users_by_email:
+                return False
+            self.users_by_email.pop(user.email, None)
+            user.email = email
+            self.users_by_email[email] = user
+            return True
+
+    def save_user_profile(self, user: User):
+        pass
+
+    def get_wallet(self, user_id: str) -> Optional[Tuple[int, int]]:
+        user = self.users_by_id.get(user_id)
+        if user is None:
+            return None
+        with self._lock:
+            return user.wallet_balance, user.wallet_version
+
+    def compare_and_set_wallet(self, user: User, expected_version: int, tx: WalletTransaction) -> bool:
+        stored = self.users_by_id[user.id]
+        with self._lock:
+            if stored.wallet_version != expected_version:
+                return False
+            for account in (stored,) if user is stored else (stored, user):
+                account.wallet_balance += tx.amount
+                account.wallet_version = expected_version + 1
+                account.wallet_transactions.append(tx)
+        return True
+
+    def save_membership(self, user: User, item: MembershipHistoryItem):
+        with self._lock:
+            if item.status == "active":
+                self.membership_expiry.push(item.expires_at.toordinal(), item)
+
+    def expire_memberships(self, today: dt.date) -> int:
+        with self._lock:
+            expired = 0
+            for item in self.membership_expiry.pop_due(today.toordinal()):
+                if item.status == "active":
+                    item.status = "expired"
+                    expired += 1
+            return expired
+
+    def add_class_enrollment(self, user: User, enrollment: ClassEnrollment):
+        pass
+
+    # ---- Bookings ----
+
+    def add_booking(self, booking: Booking) -> Booking:
+        with self._lock:
+            seq = self.booking_counter
+            booking.id = str(seq)
+            self._store_booking(booking, seq)
+            return booking
+
+    def _store_booking(self, booking: Booking, seq: int):
+        self.booking_counter = max(self.booking_counter, seq + 1)
+        self.bookings[booking.id] = booking
+
+        start = booking.start
+        if start is not None and booking.status is BookingStatus.ACTIVE:
+            self._index_active(booking)
+            heappush(
+                self.upcoming_by_user.setdefault(booking.user_id, []),
+                (start, seq, booking.id),
+            )
+        insort(
+            self.booking_ids_by_user.setdefault(booking.user_id, []),
+            (start if start is not None else float("inf"), seq, booking.id),
+        )
+        # Unparsable dates count as past, like is_past_booking()
+        self.booking_expiry.push(start if start is not None else float("-inf"), booking)
+
+    def get_booking(self, booking_id: str) -> Optional[Booking]:
+        return self.bookings.get(booking_id)
+
+    def set_booking_status(self, booking: Booking, status: BookingStatus) -> bool:
+        with self._lock:
+            if booking.status is status:
+                return False
+            if booking.status is BookingStatus.ACTIVE:
+                self._unindex_active(booking)
+            booking.status = status
+            return True
+
+    def _index_active(self, booking: Booking):
+        start, end = booking.start, booking.end
+        day = self.bookings_by_day.setdefault(start // MINUTES_PER_DAY, _DayIndex())
+        insort(day.entries, (start, end, booking.id))
+        day.max_duration = max(day.max_duration, end - start)
+        self.max_booking_duration = max(self.max_booking_duration, end - start)
+        if booking.lane is not None:
+            self.lanes.occupy(booking.lane, start, end)
+
+    def _unindex_active(self, booking: Booking):
+        if booking.start is None:
+            return
+        day_key = booking.start // MINUTES_PER_DAY
+        day = self.bookings_by_day.get(day_key)
+        if not day:
+            return
+        entry = (booking.start, booking.end, booking.id)
+        i = bisect_left(day.entries, entry)
+        if i < len(day.entries) and day.entries[i] == entry:
+            del day.entries[i]
+            if booking.lane is not None:
+                self.lanes.release(booking.lane, booking.start, booking.end)
+        if not day.entries:
+            del self.bookings_by_day[day_key]
+
+    def lane_allocator(self, start: int, end: int) -> LaneAllocator:
+        return self.lanes
+
+    def overlapping_bookings(self, start: int, end: int) -> Iterator[Booking]:
+        found = []
+        with self._lock:
+            first_day = (start - self.max_booking_duration) // MINUTES_PER_DAY
+            last_day = (end - 1) // MINUTES_PER_DAY
+
+            for day_key in range(first_day, last_day + 1):
+                day = self.bookings_by_day.get(day_key)
+                if not day:
+                    continue
+                entries = day.entries
+                # entries[:i+1] all start before `end`; walk back while they can still reach `start`
+                i = bisect_left(entries, (end,)) - 1
+                while i >= 0 and entries[i][0] + day.max_duration > start:
+                    b_start, b_end, booking_id = entries[i]
+                    if b_end > start:
+                        found.append(self.bookings[booking_id])
+                    i -= 1
+        return iter(found)
+
+    def user_bookings(self, user_id: str) -> List[Booking]:
+        with self._lock:
+            return [self.bookings[e[2]] for e in self.booking_ids_by_user.get(user_id, ())]
+
+    def next_user_booking(self, user_id: str, now: float) -> Optional[Booking]:
+        with self._lock:
+            heap = self.upcoming_by_user.get(user_id)
+            while heap:
+                start, _, booking_id = heap[0]
+                booking = self.bookings[booking_id]
+                if start > now and booking.status is BookingStatus.ACTIVE:
+                    return booking
+                heappop(heap)  # cancelled, expired or already started
+            return None
+
+    def expire_bookings(self, now: float):
+        with self._lock:
+            for booking in self.booking_expiry.pop_due(now):
+                if booking.status is BookingStatus.ACTIVE:
+                    self.set_booking_status(booking, BookingStatus.EXPIRED)
+
+    def booking_rows(self, start: int, end: int) -> List[Tuple[int, int, str, Optional[int]]]:
+        with self._lock:
+            return [
+                (b.start, b.duration, str(b.type), b.lane)
+                for b in self.bookings.values()
+                if b.start is not None
+                and start <= b.start < end
+                and b.status is not BookingStatus.CANCELLED
+            ]
+
+    # ---- Event registrations ----
+
+    def add_event_registration(self, reg: EventRegistration):
+        with self._lock:
+            self.event_registrations.append(reg)
+            self.event_registrations_by_id[reg.id] = reg
+            if reg.user_id is not None:
+                self.event_registrations_by_user.setdefault(reg.user_id, []).append(reg)
+            if reg.status == "registered":
+                self.event_registered_count[reg.event_slug] = (
+                    self.event_registered_count.get(reg.event_slug, 0) + 1
+                )
+                if reg.user_id is not None:
+                    self.event_registered_pairs.add((reg.user_id, reg.event_slug))
+
+    def count_event_registrations(self, event_slug: str) -> int:
+        return self.event_registered_count.get(event_slug, 0)
+
+    def user_is_registered_for_event(self, user_id: str, event_slug: str) -> bool:
+        return (user_id, event_slug) in self.event_registered_pairs
+
+    def user_event_registrations(self, user_id: str) -> List[EventRegistration]:
+        return list(self.event_registrations_by_user.get(user_id, ()))
+
+    # ---- Exports ----
+    #   Bookings have sequential ids and registrations are only appended,
+    #   so both are walked by position: no copy, and rows added meanwhile
+    #   don't break the iteration.
+
+    def iter_wallet_transactions(
+        self, start: dt.datetime, end: dt.datetime
+    ) -> Iterator[Tuple[str, str, WalletTransaction]]:
+        for user in self.iter_users():
+            history = user.wallet_transactions
+            for i in history.between(start, end):
+                yield user.id, user.email, history[i]
+
+    def iter_bookings(self, date_from: str, date_to: str) -> Iterator[Booking]:
+        for seq in range(1, self.booking_counter):
+            booking = self.bookings.get(str(seq))
+            if booking is not None and date_from <= booking.date <= date_to:
+                yield booking
+
+    def iter_event_registrations(self, start: dt.datetime, end: dt.datetime) -> Iterator[EventRegistration]:
+        registrations = self.event_registrations
+        for i in range(len(registrations)):
+            reg = registrations[i]
+            if start <= reg.created_at < end:
+                yield reg
+
+    def iter_users(self) -> Iterator[User]:
+        for user_id in list(self.users_by_id):
+            yield self.users_by_id[user_id]
+
+    # ---- Rollups ----
+
+    def add_rollups(self, increments: Iterable[Tuple[str, str, int]]):
+        with self._lock:
+            for period, metric, amount in increments:
+                bucket = self.rollups.setdefault(period, {})
+                bucket[metric] = bucket.get(metric, 0) + amount
+
+    def get_rollups(self, first: str, last: str) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {
+                period: dict(metrics)
+                for period, metrics in self.rollups.items()
+                if len(period) == len(first) and first <= period <= last
+            }
+
+    def replace_rollups(self, rollups: Dict[str, Dict[str, int]]):
+        with self._lock:
+            self.rollups = {period: dict(metrics) for period, metrics in rollups.items()}
+
+    # ---- Snapshots ----
+
+    def dump_state(self) -> dict:
+        """
+        Primary data only, as plain tuples where there are many rows;
+        indexes are rebuilt by load_state().
+        """
+        return {
+            "users": list(self.users_by_id.values()),
+            "bookings": [
+                (b.id, b.user_id, b.date, b.time, b.duration, str(b.type), b.lane, str(b.status))
+                for b in self.bookings.values()
+            ],
+            "booking_counter": self.booking_counter,
+            "event_registrations": [
+                (r.id, r.event_slug, r.title, r.user_id, r.name, r.email,
+                 r.price, r.created_at, r.status)
+                for r in self.event_registrations
+            ],
+        }
+
+    def load_state(self, state: dict):
+        """Fill an empty repository from dump_state() output."""
+        for user in state["users"]:
+            if isinstance(user.wallet_transactions, list):  # snapshots before WalletHistory
+                user.wallet_transactions = WalletHistory(user.wallet_transactions)
+            self._store_user(user)
+        for row in state["bookings"]:
+            booking = Booking(*row)
+            self._store_booking(booking, int(booking.id))
+        self.booking_counter = max(self.booking_counter, state["booking_counter"])
+        for row in state["event_registrations"]:
+            self.add_event_registration(EventRegistration(*row))
+
+
+_repo: Repository = MemoryRepository()
+
+
+def get_repository() -> Repository:
+    return _repo
+
+
+def set_repository(repo: Repository):
+    """Swap the storage backend (call before serving requests)."""
+    global _repo
+    _repo = repo
+    _seed_dev_user()
 
 
 # ---------------------------
@@ -182,43 +816,40 @@ def create_user(
     first_name: str = "",
     last_name: str = "",
 ) -> User:
-    email_norm = email.lower().strip()
-    new_id = str(len(_USERS_BY_ID) + 1)
-
     user = User(
-        id=new_id,
-        email=email_norm,
-        password_hash=generate_password_hash(password),
+        id="",
+        email=email.lower().strip(),
+        password_hash=password_hasher.generate(password),
         first_name=first_name,
         last_name=last_name,
     )
-    _USERS_BY_ID[user.id] = user
-    _USERS_BY_EMAIL[user.email] = user
-    return user
+    return _repo.add_user(user)
 
 
 def get_user_by_email(email: str) -> Optional[User]:
     if not email:
         return None
-    return _USERS_BY_EMAIL.get(email.lower().strip())
+    return _repo.get_user_by_email(email.lower().strip())
 
 
 def get_user_by_id(user_id: str) -> Optional[User]:
-    return _USERS_BY_ID.get(str(user_id))
+    return _repo.get_user(str(user_id))
 
 
-# Seed a test user (dev only)
-if not _USERS_BY_EMAIL:
-    create_user("test", "123456", first_name="کاربر", last_name="آزمایشی")
+def _seed_dev_user():
+    """Seed a test user (dev only)."""
+    if not get_user_by_email("test"):
+        create_user("test", "123456", first_name="کاربر", last_name="آزمایشی")
+
+
+_seed_dev_user()
 
 
 def update_user_email(user: User, new_email: str) -> bool:
     """
-    Try to update the user's email and keep the _USERS_BY_EMAIL index in sync.
+    Try to update the user's email, keeping the email lookup in sync.
     Returns True on success, False if email is invalid or already taken.
     """
-    global _USERS_BY_EMAIL
-
     email_norm = new_email.lower().strip()
     if not email_norm:
         return False
@@ -226,16 +857,12 @@ def update_user_email(user: User, new_email: str) -> bool:
     if email_norm == user.email:
         return True
 
-    if email_norm in _USERS_BY_EMAIL:
-        return False
+    return _repo.change_user_email(user, email_norm)
 
-    old_email = user.email
-    if old_email in _USERS_BY_EMAIL:
-        del _USERS_BY_EMAIL[old_email]
 
-    user.email = email_norm
-    _USERS_BY_EMAIL[email_norm] = user
-    return True
+def save_user_profile(user: User):
+    """Persist profile fields (names, contact info, password hash) after editing."""
+    _repo.save_user_profile(user)
 
 
 # ---------------------------
@@ -250,13 +877,8 @@ def create_booking(
     booking_type: str,
     lane: Optional[int] = None,
 ) -> Booking:
-    global _BOOKING_COUNTER
-
-    booking_id = str(_BOOKING_COUNTER)
-    _BOOKING_COUNTER += 1
-
     booking = Booking(
-        id=booking_id,
+        id="",
         user_id=str(user_id),
         date=date,
         time=time,
@@ -264,21 +886,56 @@ def create_booking(
         type=booking_type,
         lane=lane,
     )
-    _BOOKINGS[booking_id] = booking
+    with _repo.transaction():
+        _repo.add_booking(booking)
+        _repo.add_rollups(booking_increments(booking))
+    invalidate_availability(booking.start, booking.end)
+    publish_capacity_change(booking)
     return booking
 
 
 def get_user_bookings(user_id: str) -> List[Booking]:
-    return [b for b in _BOOKINGS.values() if b.user_id == str(user_id)]
+    """All bookings of a user, oldest first."""
+    return _repo.user_bookings(str(user_id))
 
 
 def cancel_booking(booking_id: str) -> bool:
-    if booking_id in _BOOKINGS:
-        _BOOKINGS[booking_id].status = "cancelled"
+    booking = _repo.get_booking(booking_id)
+    if booking:
+        with _repo.transaction():
+            # Only the cancel that actually changes the status takes the
+            # booking out of the rollups (concurrent cancels race here)
+            cancelled = _repo.set_booking_status(booking, BookingStatus.CANCELLED)
+            if cancelled:
+                _repo.add_rollups(booking_increments(booking, sign=-1))
+        if cancelled:
+            invalidate_availability(booking.start, booking.end)
+            publish_capacity_change(booking)
         return True
     return False
 
 
+def publish_capacity_change(booking: Booking):
+    """
+    Tell live streams that pool capacity around `booking` changed. Only
+    the affected days are sent (the day before too: its windows may run
+    past midnight); clients refetch /api/availability for them.
+    """
+    if booking.start is None:
+        return
+    days = range(booking.start // MINUTES_PER_DAY - 1, (booking.end - 1) // MINUTES_PER_DAY + 1)
+    event_hub.publish(
+        "capacity",
+        {
+            "dates": [dt.date.fromordinal(_EPOCH_ORDINAL + d).isoformat() for d in days],
+            "date": booking.date,
+            "time": booking.time,
+            "duration": booking.duration,
+            "type": booking.type,
+        },
+    )
+
+
 def parse_datetime(date: str, time: str) -> Optional[dt.datetime]:
     """Convert date + time string into a Python datetime."""
     try:
@@ -294,108 +951,201 @@ def is_past_booking(date: str, time: str) -> bool:
     return booking_dt < dt.datetime.now()
 
 
-def user_has_overlap(user_id: str, date: str, time: str, duration: int) -> bool:
-    """Check if user already has a booking overlapping this one."""
-    new_start = parse_datetime(date, time)
-    if not new_start:
-        return False
-    new_end = new_start + dt.timedelta(minutes=duration)
+@dataclass(slots=True)
+class SlotUsage:
+    """What is already booked (active) in one interval."""
+    user_ids: Set[str] = field(default_factory=set)
+    swimmers: int = 0                 # free-swim bookings
+    lanes: Set[int] = field(default_factory=set)
 
-    for b in _BOOKINGS.values():
-        if b.user_id != str(user_id) or b.status != "active":
-            continue
+    def add(self, booking: Booking):
+        self.user_ids.add(booking.user_id)
+        if booking.type is BookingType.FREE_SWIM:
+            self.swimmers += 1
+        if booking.lane is not None:
+            self.lanes.add(booking.lane)
 
-        existing_start = parse_datetime(b.date, b.time)
-        if not existing_start:
-            continue
-        existing_end = existing_start + dt.timedelta(minutes=b.duration)
 
-        if (new_start < existing_end) and (existing_start < new_end):
-            return True
+def slot_usages(intervals: List[Optional[Tuple[int, int]]]) -> List[Optional[SlotUsage]]:
+    """
+    SlotUsage for many intervals in one ordered pass over the booking index.
+    Intervals that overlap each other share a single index query.
+    None entries (unparsable slots) map to None.
+    """
+    result: List[Optional[SlotUsage]] = [None] * len(intervals)
+    order = sorted((iv[0], iv[1], i) for i, iv in enumerate(intervals) if iv)
 
-    return False
+    k = 0
+    while k < len(order):
+        # Cluster of mutually reachable intervals → one query
+        cluster_end = order[k][1]
+        j = k + 1
+        while j < len(order) and order[j][0] < cluster_end:
+            cluster_end = max(cluster_end, order[j][1])
+            j += 1
+        cluster = order[k:j]
+        bookings = list(_repo.overlapping_bookings(cluster[0][0], cluster_end))
 
+        for start, end, i in cluster:
+            usage = SlotUsage()
+            for b in bookings:
+                if b.start < end and b.end > start:
+                    usage.add(b)
+            result[i] = usage
+        k = j
+
+    return result
 
-AVAILABLE_LANES = [1, 2, 3, 4, 5, 6]
+
+def slot_usage(date: str, time: str, duration: int) -> Optional[SlotUsage]:
+    return slot_usages([booking_interval(date, time, duration)])[0]
+
+
+def user_has_overlap(user_id: str, date: str, time: str, duration: int) -> bool:
+    """Check if user already has a booking overlapping this one."""
+    usage = slot_usage(date, time, duration)
+    return usage is not None and str(user_id) in usage.user_ids
 
 
 def assign_lane(date: str, time: str, duration: int, booking_type: str) -> Optional[int]:
-    if booking_type != "لاین تمرین":
+    """Best-fit lane for the interval (see LaneAllocator.best_fit), or None if all are taken."""
+    if booking_type != BookingType.LANE_TRAINING:
         return None
 
-    new_start = parse_datetime(date, time)
-    if not new_start:
+    interval = booking_interval(date, time, duration)
+    if not interval:
         return None
-    new_end = new_start + dt.timedelta(minutes=duration)
 
-    for lane in AVAILABLE_LANES:
-        lane_is_free = True
+    return _repo.lane_allocator(*interval).best_fit(*interval)
 
-        for b in _BOOKINGS.values():
-            if b.status != "active" or b.lane != lane:
-                continue
 
-            existing_start = parse_datetime(b.date, b.time)
-            if not existing_start:
-                continue
-            existing_end = existing_start + dt.timedelta(minutes=b.duration)
-
-            if (new_start < existing_end) and (existing_start < new_end):
-                lane_is_free = False
-                break
-
-        if lane_is_free:
-            return lane
+def get_next_reservation(user_id: str) -> Optional[Booking]:
+    return _repo.next_user_booking(str(user_id), epoch_minutes(dt.datetime.now()))
 
-    return None
 
+def count_pool_swimmers(date: str, time: str, duration: int) -> int:
+    """Count users with free-swim booking overlapping this interval."""
+    usage = slot_usage(date, time, duration)
+    return usage.swimmers if usage else 0
 
-def get_next_reservation(user_id: str) -> Optional[Booking]:
-    future: List[Tuple[dt.datetime, Booking]] = []
-    now = dt.datetime.now()
 
-    for b in _BOOKINGS.values():
-        if b.user_id != str(user_id) or b.status != "active":
-            continue
-        start_dt = parse_datetime(b.date, b.time)
-        if start_dt and start_dt > now:
-            future.append((start_dt, b))
+def refresh_booking_statuses():
+    """
+    Mark bookings that have started since the last call as expired.
+    Cost is proportional to the number of newly-past bookings.
+    """
+    now = epoch_minutes(dt.datetime.now())
+    _repo.expire_bookings(now)
+    invalidate_availability(int(now) - MINUTES_PER_DAY, int(now) + 1)
 
-    if not future:
-        return None
 
-    future.sort(key=lambda x: x[0])
-    return future[0][1]
+# ---------------------------
+# Availability
+# ---------------------------
 
+AVAILABILITY_SLOT_MINUTES = 30
+AVAILABILITY_CACHE_TTL = 15  # seconds; bounds staleness from other worker processes
 
-def count_pool_swimmers(date: str, time: str, duration: int) -> int:
-    """Count users with free-swim booking overlapping this interval."""
-    new_start = parse_datetime(date, time)
-    if not new_start:
-        return 0
-    new_end = new_start + dt.timedelta(minutes=duration)
+# (day, duration) -> (computed_at, result)
+_availability_cache: Dict[Tuple[int, int], Tuple[float, dict]] = {}
+_availability_generation = 0  # bumped by every invalidation
+# Guards the generation check-and-store against concurrent invalidations;
+# the sweep itself runs outside it
+_availability_lock = threading.Lock()
 
-    count = 0
-    for b in _BOOKINGS.values():
-        if b.type != "شنای آزاد" or b.status != "active":
-            continue
 
-        existing_start = parse_datetime(b.date, b.time)
-        if not existing_start:
-            continue
-        existing_end = existing_start + dt.timedelta(minutes=b.duration)
+def invalidate_availability(start: Optional[int] = None, end: Optional[int] = None):
+    """
+    Drop cached availability of every day a booking [start, end) can affect.
+    Windows of a day may run past midnight, so the previous day is included.
+    Without arguments (or for unparsable bookings) the whole cache is cleared.
+    """
+    global _availability_generation
+    with _availability_lock:
+        _availability_generation += 1
+        if start is None or end is None:
+            _availability_cache.clear()
+            return
+        days = range(start // MINUTES_PER_DAY - 1, (end - 1) // MINUTES_PER_DAY + 1)
+        for key in list(_availability_cache):
+            if key[0] in days:
+                del _availability_cache[key]
+
+
+def _busy_counts(intervals: List[Tuple[int, int]], windows: List[int], duration: int) -> List[int]:
+    """
+    For each window [w, w + duration) (windows ascending), the number of
+    intervals overlapping it: one sweep over sorted starts and ends.
+    """
+    starts = sorted(s for s, _ in intervals)
+    ends = sorted(e for _, e in intervals)
+    counts = []
+    i = j = 0
+    for w in windows:
+        while i < len(starts) and starts[i] < w + duration:
+            i += 1  # started before the window ends
+        while j < len(ends) and ends[j] <= w:
+            j += 1  # finished before the window starts
+        counts.append(i - j)
+    return counts
+
+
+def day_availability(date: str, duration: int = 60) -> Optional[dict]:
+    """
+    Remaining free-swim capacity and free lanes for a booking of `duration`
+    minutes starting at every AVAILABILITY_SLOT_MINUTES slot of `date`.
+    Matches the admission rules: a booking counts against a slot if it
+    overlaps any part of it. None if the date is invalid.
+    """
+    interval = booking_interval(date, "00:00", duration)
+    if not interval or duration <= 0:
+        return None
+    day_start = interval[0]
+    key = (day_start // MINUTES_PER_DAY, duration)
 
-        if (new_start < existing_end) and (existing_start < new_end):
-            count += 1
+    cached = _availability_cache.get(key)
+    if cached and monotonic() - cached[0] < AVAILABILITY_CACHE_TTL:
+        return cached[1]
 
-    return count
+    generation = _availability_generation
+    windows = list(range(day_start, day_start + MINUTES_PER_DAY, AVAILABILITY_SLOT_MINUTES))
+    bookings = list(_repo.overlapping_bookings(day_start, windows[-1] + duration))
 
+    swimmers = _busy_counts(
+        [(b.start, b.end) for b in bookings if b.type is BookingType.FREE_SWIM],
+        windows,
+        duration,
+    )
+    lane_busy = {
+        lane: _busy_counts(
+            [(b.start, b.end) for b in bookings if b.lane == lane], windows, duration
+        )
+        for lane in AVAILABLE_LANES
+    }
+
+    slots = []
+    for k, w in enumerate(windows):
+        minute = w - day_start
+        slots.append(
+            {
+                "time": f"{minute // 60:02d}:{minute % 60:02d}",
+                "free_swim_remaining": max(POOL_MAX_CAPACITY - swimmers[k], 0),
+                "free_lanes": [lane for lane in AVAILABLE_LANES if not lane_busy[lane][k]],
+            }
+        )
 
-def refresh_booking_statuses():
-    """Update booking.status based on current time."""
-    for booking in _BOOKINGS.values():
-        if booking.status == "active" and is_past_booking(booking.date, booking.time):
-            booking.status = "expired"
+    result = {
+        "date": date,
+        "duration": duration,
+        "slot_minutes": AVAILABILITY_SLOT_MINUTES,
+        "capacity": POOL_MAX_CAPACITY,
+        "lanes": list(AVAILABLE_LANES),
+        "slots": slots,
+    }
+    with _availability_lock:
+        if generation == _availability_generation:  # no booking write raced us
+            _availability_cache[key] = (monotonic(), result)
+    return result
 
 
 # ---------------------------
@@ -433,9 +1183,7 @@ def activate_membership(
     user.membership_expires_at = expires_at
 
     # Auto mark old active items as expired
-    for item in user.membership_history:
-        if item.status == "active" and item.expires_at < today:
-            item.status = "expired"
+    _repo.expire_memberships(today)
 
     history_item = MembershipHistoryItem(
         id=str(uuid.uuid4()),
@@ -446,10 +1194,19 @@ def activate_membership(
         amount=price,
         status="active",
     )
+    new_member = not user.membership_history
     user.membership_history.append(history_item)
+    with _repo.transaction():
+        _repo.save_membership(user, history_item)
+        _repo.add_rollups(membership_increments(history_item, new_member))
     return history_item
 
 
+def refresh_membership_statuses():
+    """Mark membership history items whose expiry date has passed as expired."""
+    _repo.expire_memberships(dt.date.today())
+
+
 def cancel_membership(
     user: User,
     history_id: str,
@@ -477,6 +1234,9 @@ def cancel_membership(
             ):
                 user.clear_membership()
 
+            with _repo.transaction():
+                _repo.save_membership(user, item)
+                _repo.add_rollups(membership_increments(item, sign=-1))
             return True, "", item
 
     return False, "اشتراک مورد نظر یافت نشد.", None
@@ -506,6 +1266,9 @@ def enroll_in_class(
         status="active",
     )
     user.class_enrollments.append(enrollment)
+    with _repo.transaction():
+        _repo.add_class_enrollment(user, enrollment)
+        _repo.add_rollups(class_increments(enrollment))
     return enrollment
 
 
@@ -543,7 +1306,10 @@ def register_for_event(
         price=0,
         status="registered",
     )
-    _EVENT_REGISTRATIONS.append(reg)
+    with _repo.transaction():
+        _repo.add_event_registration(reg)
+        _repo.add_rollups(event_increments(reg))
+    publish_registered_count(event_slug)
     return reg
 
 
@@ -575,30 +1341,27 @@ def create_event_registration(
         price=price,
         status="registered",
     )
-    _EVENT_REGISTRATIONS.append(reg)
+    with _repo.transaction():
+        _repo.add_event_registration(reg)
+        _repo.add_rollups(event_increments(reg))
+    publish_registered_count(event_slug)
     return reg
 
 
-def count_event_registrations(event_slug: str) -> int:
-    return sum(
-        1
-        for r in _EVENT_REGISTRATIONS
-        if r.event_slug == event_slug and r.status == "registered"
+def publish_registered_count(event_slug: str):
+    event_hub.publish(
+        "registered_count",
+        {"slug": event_slug, "registered_count": _repo.count_event_registrations(event_slug)},
     )
 
 
+def count_event_registrations(event_slug: str) -> int:
+    return _repo.count_event_registrations(event_slug)
+
+
 def get_user_event_registrations(user_id: str) -> List[EventRegistration]:
-    return [
-        r
-        for r in _EVENT_REGISTRATIONS
-        if r.user_id == str(user_id)
-    ]
+    return _repo.user_event_registrations(str(user_id))
 
 
 def user_is_registered_for_event(user_id: str, event_slug: str) -> bool:
-    return any(
-        r.user_id == str(user_id)
-        and r.event_slug == event_slug
-        and r.status == "registered"
-        for r in _EVENT_REGISTRATIONS
-    )
+    return _repo.user_is_registered_for_event(str(user_id), event_slug)
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+
+@dataclass(frozen=True, slots=True)
+class HubEvent:
+    id: int
+    name: str
+    data: str  # JSON, serialized once for every subscriber
+
+    def to_sse(self) -> str:
+        return f"id: {self.id}\nevent: {self.name}\ndata: {self.data}\n\n"
+
+
+# ---------------------------
+# Event Hub
+# ---------------------------
+
+class EventHub:
+    """
+    In-process broadcast channel for Server-Sent Events.
+
+    Events go into one shared ring buffer with increasing ids; there is no
+    queue or thread per subscriber. A subscriber only remembers the last
+    id it has sent and waits on a shared Condition, so publishing costs
+    the same whatever the number of open streams, and the payload is
+    serialized once.
+
+    A subscriber that falls more than `backlog` events behind, or
+    reconnects with a Last-Event-ID that has been dropped or that this
+    hub never issued (after a restart, or from another worker's stream),
+    is told to resync instead of silently missing updates.
+
+    Only streams of the same process see an event: with several worker
+    processes each one publishes its own writes.
+    """
+
+    def __init__(self, backlog: int = 256):
+        self._events: deque[HubEvent] = deque(maxlen=backlog)
+        self._last_id = 0
+        self._cond = threading.Condition()
+        self.subscribers = 0
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    def publish(self, name: str, payload: Any) -> int:
+        data = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        with self._cond:
+            self._last_id += 1
+            self._events.append(HubEvent(self._last_id, name, data))
+            self._cond.notify_all()
+            return self._last_id
+
+    def events_after(self, last_id: int) -> Optional[List[HubEvent]]:
+        """Events newer than `last_id`; None if some may have been missed."""
+        with self._cond:
+            return self._after(last_id)
+
+    def wait(self, last_id: int, timeout: float) -> Optional[List[HubEvent]]:
+        """
+        Like events_after(), but blocks up to `timeout` seconds until
+        there is something newer than `last_id`. [] on timeout.
+        """
+        with self._cond:
+            if self._last_id <= last_id:
+                self._cond.wait(timeout)
+            return self._after(last_id)
+
+    def _after(self, last_id: int) -> Optional[List[HubEvent]]:
+        if last_id > self._last_id:
+            return None  # an id from another process: the cursor means nothing here
+        if last_id == self._last_id:
+            return []
+        if not self._events or self._events[0].id > last_id + 1:
+            return None
+        # ids are contiguous, so the position of last_id + 1 is known
+        start = last_id + 1 - self._events[0].id
+        return [self._events[i] for i in range(start, len(self._events))]
+
+    # ---- Subscriber accounting ----
+
+    def try_subscribe(self, limit: int) -> bool:
+        with self._cond:
+            if self.subscribers >= limit:
+                return False
+            self.subscribers += 1
+            return True
+
+    def unsubscribe(self):
+        with self._cond:
+            self.subscribers -= 1
+
+
+event_hub = EventHub()
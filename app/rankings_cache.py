@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+
+from .pubsub import event_hub
+from .swimcloud_scraper import SWIMCLOUD_REGION_URL, fetch_swimcloud_rankings
+
+
+# ---------------------------
+# Rankings Snapshot
+# ---------------------------
+
+@dataclass(frozen=True)
+class RankingsSnapshot:
+    men: Tuple[dict, ...] = ()
+    women: Tuple[dict, ...] = ()
+    updated_at: Optional[str] = None   # ISO time reported by the scraper
+    fetched_at: float = 0.0            # time.monotonic() of the last good fetch
+    fetched_wall: float = 0.0          # time.time() of the same fetch (Last-Modified)
+    version: int = 0                   # bumped whenever the content changes
+
+    @property
+    def items(self) -> list:
+        return list(self.men) + list(self.women)
+
+
+# ---------------------------
+# Rankings Cache
+# ---------------------------
+
+class RankingsCache:
+    """
+    Keeps the last good Swimcloud snapshot in memory and refreshes it from a
+    background thread, so request handlers never wait on swimcloud.com.
+
+      - snapshot() is O(1) and never blocks on HTTP.
+      - A snapshot older than `ttl` is still served (stale-while-revalidate);
+        reading it wakes the refresher.
+      - Upstream failures keep the previous snapshot and flip `healthy` off
+        until the next successful fetch.
+    """
+
+    def __init__(
+        self,
+        fetcher: Callable[..., tuple] = fetch_swimcloud_rankings,
+        url: str = SWIMCLOUD_REGION_URL,
+        ttl: float = 600,
+        retry_interval: float = 60,
+    ):
+        self.fetcher = fetcher
+        self.url = url
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+
+        self._snapshot = RankingsSnapshot()
+        self.healthy = False
+        self.last_error: Optional[str] = None
+        self.last_attempt_at: float = 0.0
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._refresh_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---- Reading ----
+
+    def snapshot(self) -> RankingsSnapshot:
+        snap = self._snapshot
+        if self.is_stale(snap):
+            self._wake.set()
+        return snap
+
+    def is_stale(self, snap: Optional[RankingsSnapshot] = None) -> bool:
+        snap = snap or self._snapshot
+        return not snap.fetched_at or time.monotonic() - snap.fetched_at > self.ttl
+
+    def payload(self, snap: RankingsSnapshot) -> dict:
+        """What /api/live-rankings and the live stream send for `snap`."""
+        return {
+            "updated_at": snap.updated_at,
+            "items": snap.items,
+            "men": snap.men,
+            "women": snap.women,
+            "healthy": self.healthy,
+            "stale": self.is_stale(snap),
+        }
+
+    # ---- Refreshing ----
+
+    def refresh(self) -> bool:
+        """Fetch once, synchronously. Returns True if the snapshot is fresh."""
+        if not self._refresh_lock.acquire(blocking=False):
+            return False  # another refresh is already in flight
+        try:
+            self.last_attempt_at = time.monotonic()
+            try:
+                men, women, updated_at = self.fetcher(url=self.url)
+            except Exception as exc:
+                self.healthy = False
+                self.last_error = str(exc)
+                print("Error fetching Swimcloud rankings:", exc)
+                return False
+
+            old = self._snapshot
+            men, women = tuple(men), tuple(women)
+            changed = men != old.men or women != old.women
+            self._snapshot = RankingsSnapshot(
+                men=men,
+                women=women,
+                updated_at=updated_at,
+                fetched_at=time.monotonic(),
+                fetched_wall=time.time(),
+                version=old.version + 1 if changed else old.version,
+            )
+            self.healthy = True
+            self.last_error = None
+            if changed:
+                event_hub.publish("rankings", self.payload(self._snapshot))
+            return True
+        finally:
+            self._refresh_lock.release()
+
+    def start(self):
+        """Start the background refresher (idempotent)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="rankings-refresher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            ok = self.refresh()
+            self._wake.clear()
+            self._wake.wait(self.ttl if ok else self.retry_interval)
+            # A stale read may wake us early; don't hammer upstream after
+            # a failure though.
+            if not self.healthy:
+                since = time.monotonic() - self.last_attempt_at
+                if since < self.retry_interval:
+                    self._stop.wait(self.retry_interval - since)
+
+
+rankings_cache = RankingsCache()
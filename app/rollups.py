@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import datetime as dt
+from typing import TYPE_CHECKING, Dict, Iterable, List, Tuple, Union
+
+import click
+from flask.cli import with_appcontext
+
+if TYPE_CHECKING:
+    from .model import Booking, ClassEnrollment, EventRegistration, MembershipHistoryItem, Repository
+    from .wallet_history import WalletTransaction
+
+
+# ---------------------------
+# Increments
+#   Aggregates are stored per period ("YYYY-MM-DD" and "YYYY-MM") and
+#   metric. The functions below map one record to the increments it
+#   contributes; model helpers apply them at write time and
+#   compute_rollups() replays them over the raw data, so both always
+#   agree on what a record counts for.
+#
+#   Metrics:
+#     wallet.<type>          sum of wallet amounts (deposit, purchase, refund)
+#     revenue.membership     price of non-cancelled memberships
+#     revenue.class / .event price of class enrollments / event registrations
+#     memberships.sold, members.new (first membership of a user),
+#     classes.enrolled, events.registered, bookings.<type> (non-cancelled,
+#     by session day)
+#
+#   Each record is dated by its own timestamp (wallet entries and
+#   registrations are UTC, memberships and enrollments local time).
+# ---------------------------
+
+Increment = Tuple[str, str, int]  # (period, metric, amount)
+Rollups = Dict[str, Dict[str, int]]  # period -> metric -> value
+
+
+def _dated(day: Union[dt.date, str], *metrics: Tuple[str, int]) -> List[Increment]:
+    key = day if isinstance(day, str) else day.isoformat()
+    return [(period, metric, amount) for period in (key, key[:7]) for metric, amount in metrics]
+
+
+def wallet_increments(tx: WalletTransaction) -> List[Increment]:
+    return _dated(tx.timestamp.date(), (f"wallet.{tx.type}", tx.amount))
+
+
+def membership_increments(item: MembershipHistoryItem, new_member: bool = False, sign: int = 1) -> List[Increment]:
+    """sign=-1 takes a cancelled membership back out of its purchase day."""
+    metrics = [("revenue.membership", sign * item.amount), ("memberships.sold", sign)]
+    if new_member:
+        metrics.append(("members.new", 1))
+    return _dated(item.purchased_at.date(), *metrics)
+
+
+def class_increments(enrollment: ClassEnrollment) -> List[Increment]:
+    return _dated(enrollment.enrolled_at.date(), ("revenue.class", enrollment.price), ("classes.enrolled", 1))
+
+
+def event_increments(reg: EventRegistration) -> List[Increment]:
+    return _dated(reg.created_at.date(), ("revenue.event", reg.price), ("events.registered", 1))
+
+
+def booking_increments(booking: Booking, sign: int = 1) -> List[Increment]:
+    if booking.start is None:  # unparsable date: no session day to count it on
+        return []
+    return _dated(booking.date, (f"bookings.{booking.type}", sign))
+
+
+# ---------------------------
+# Rebuild / reconcile
+# ---------------------------
+
+def compute_rollups(repo: Repository) -> Rollups:
+    """Aggregates rebuilt from the raw records (walks everything)."""
+    rollups: Rollups = {}
+
+    def add(increments: Iterable[Increment]):
+        for period, metric, amount in increments:
+            bucket = rollups.setdefault(period, {})
+            bucket[metric] = bucket.get(metric, 0) + amount
+
+    for _, _, tx in repo.iter_wallet_transactions(dt.datetime.min, dt.datetime.max):
+        add(wallet_increments(tx))
+    for booking in repo.iter_bookings("0000-00-00", "9999-99-99"):
+        if str(booking.status) != "cancelled":
+            add(booking_increments(booking))
+    for reg in repo.iter_event_registrations(dt.datetime.min, dt.datetime.max):
+        add(event_increments(reg))
+    for user in repo.iter_users():
+        for i, item in enumerate(user.membership_history):
+            if item.status != "cancelled":
+                add(membership_increments(item))
+            if i == 0:
+                add(_dated(item.purchased_at.date(), ("members.new", 1)))
+        for enrollment in user.class_enrollments:
+            add(class_increments(enrollment))
+
+    # Stored aggregates never keep zero counters around either
+    return {
+        period: {m: v for m, v in metrics.items() if v}
+        for period, metrics in rollups.items()
+        if any(metrics.values())
+    }
+
+
+def diff_rollups(expected: Rollups, actual: Rollups) -> List[Tuple[str, str, int, int]]:
+    """(period, metric, expected, actual) for every value that differs."""
+    mismatches = []
+    for period in sorted(expected.keys() | actual.keys()):
+        want, have = expected.get(period, {}), actual.get(period, {})
+        for metric in sorted(want.keys() | have.keys()):
+            if want.get(metric, 0) != have.get(metric, 0):
+                mismatches.append((period, metric, want.get(metric, 0), have.get(metric, 0)))
+    return mismatches
+
+
+def stored_rollups(repo: Repository) -> Rollups:
+    stored = repo.get_rollups("0000-00", "9999-99")
+    stored.update(repo.get_rollups("0000-00-00", "9999-99-99"))
+    return stored
+
+
+def reconcile(repo: Repository, fix: bool = False) -> List[Tuple[str, str, int, int]]:
+    """
+    Compare the stored aggregates with a rebuild from raw data; with
+    fix=True replace them by the rebuild. Returns the mismatches found.
+    Writes that land while the rebuild runs may be counted twice or not
+    at all, so run it when the site is quiet.
+    """
+    expected = compute_rollups(repo)
+    mismatches = diff_rollups(expected, stored_rollups(repo))
+    if fix and mismatches:
+        repo.replace_rollups(expected)
+    return mismatches
+
+
+# ---------------------------
+# Reports
+# ---------------------------
+
+def report(repo: Repository, date_from: dt.date, date_to: dt.date, by: str = "day") -> dict:
+    """Per-period aggregates and their totals; cost grows with the number of periods."""
+    if by == "month":
+        first, last = date_from.isoformat()[:7], date_to.isoformat()[:7]
+    else:
+        first, last = date_from.isoformat(), date_to.isoformat()
+    periods = repo.get_rollups(first, last)
+
+    totals: Dict[str, int] = {}
+    for metrics in periods.values():
+        for metric, value in metrics.items():
+            totals[metric] = totals.get(metric, 0) + value
+    return {
+        "from": first,
+        "to": last,
+        "by": by,
+        "periods": dict(sorted(periods.items())),
+        "totals": dict(sorted(totals.items())),
+    }
+
+
+@click.command("reconcile-rollups")
+@click.option("--fix", is_flag=True, help="Replace the stored aggregates with the rebuild.")
+@with_appcontext
+def reconcile_command(fix: bool):
+    """Rebuild revenue/activity rollups from raw data and verify them."""
+    from .model import get_repository
+
+    mismatches = reconcile(get_repository(), fix=fix)
+    for period, metric, expected, actual in mismatches:
+        click.echo(f"{period}  {metric}: expected {expected}, stored {actual}")
+    if not mismatches:
+        click.echo("rollups match the raw data")
+    elif fix:
+        click.echo(f"fixed {len(mismatches)} mismatched values")
+    else:
+        raise SystemExit(1)
@@ -1,12 +1,16 @@
 from __future__ import annotations
 
 import datetime as dt
+import hashlib
+import hmac
 import json
 import re
+from time import monotonic
 from pathlib import Path
 
 from flask import (
     Blueprint,
+    Response,
     abort,
     current_app,
     flash,
@@ -17,31 +21,38 @@ from flask import (
     url_for,
 )
 from flask_login import current_user, login_required
-from werkzeug.security import generate_password_hash
 
+from . import analytics, exports, rollups
+from .admission import booking_admission
+from .config_store import config_store
+from .fragments import fragment_cache
+from .hashing import password_hasher
+from .ledger import ledger
 from .model import (
-    POOL_MAX_CAPACITY,
+    MINUTES_PER_DAY,
     activate_membership,
-    assign_lane,
     cancel_booking,
     cancel_membership,
     count_event_registrations,
-    count_pool_swimmers,
-    create_booking,
     create_event_registration,
+    day_availability,
     enroll_in_class,
+    epoch_minutes,
     get_next_reservation,
+    get_repository,
     get_user_bookings,
+    get_user_by_id,
     get_user_event_registrations,
     is_past_booking,
-    parse_datetime,
     refresh_booking_statuses,
+    refresh_membership_statuses,
     register_for_event,
+    save_user_profile,
     update_user_email,
-    user_has_overlap,
     user_is_registered_for_event,
 )
-from .swimcloud_scraper import fetch_swimcloud_rankings
+from .pubsub import event_hub
+from .rankings_cache import rankings_cache
 
 main = Blueprint("main", __name__)
 
@@ -52,14 +63,14 @@ main = Blueprint("main", __name__)
 
 def load_json(name: str):
     """
-    Load a JSON file from DATA_DIR.
+    Load a JSON file from DATA_DIR through the shared config store.
+    The result is cached and read-only; copy it before modifying.
     Aborts with 500 if the file is missing or invalid.
     """
     data_dir = Path(current_app.config["DATA_DIR"])
     fp = data_dir / name
     try:
-        with open(fp, "r", encoding="utf-8-sig") as f:
-            return json.load(f)
+        return config_store.get(fp)
     except FileNotFoundError:
         abort(500, description=f"JSON file not found: {fp}")
     except json.JSONDecodeError as e:
@@ -69,6 +80,15 @@ def load_json(name: str):
         )
 
 
+def data_versions(*names: str) -> tuple:
+    """
+    config_store versions of already loaded DATA_DIR files, for use in
+    cache keys. Call load_json() first so the versions are current.
+    """
+    data_dir = Path(current_app.config["DATA_DIR"])
+    return tuple(config_store.version(data_dir / name) for name in names)
+
+
 def parse_date(e: dict) -> dt.datetime:
     """
     Parse ISO date field from events JSON; fallback to max datetime on error.
@@ -112,7 +132,7 @@ def get_events_for_user(user_id: int | None) -> list[dict]:
       - registered_count
       - user_registered (bool)
     """
-    events = sorted(load_published_events(), key=parse_date)
+    events = [dict(e) for e in sorted(load_published_events(), key=parse_date)]
     for e in events:
         slug = e.get("slug")
         if not slug:
@@ -129,6 +149,37 @@ def api_error(message: str, status_code: int = 400):
     return jsonify({"status": "error", "message": message}), status_code
 
 
+def conditional_json(etag: str, last_modified: float | None, build):
+    """
+    JSON response with ETag / Last-Modified validators.
+
+    If the request's If-None-Match (or, without it, If-Modified-Since)
+    still matches, answer 304 without calling `build`, so the payload is
+    neither assembled nor serialized. Otherwise jsonify(build()).
+    """
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and last_modified:
+        not_modified = int(last_modified) <= request.if_modified_since.timestamp()
+    else:
+        not_modified = False
+
+    resp = Response(status=304) if not_modified else jsonify(build())
+    resp.set_etag(etag)
+    if last_modified:
+        resp.last_modified = dt.datetime.fromtimestamp(int(last_modified), dt.timezone.utc)
+    resp.cache_control.no_cache = True  # may be stored, but revalidate every time
+    return resp
+
+
+def json_file_response(name: str):
+    """Serve a DATA_DIR JSON file, keyed by the config store's content hash."""
+    data = load_json(name)
+    fp = Path(current_app.config["DATA_DIR"]) / name
+    mtime_ns, _ = config_store.version(fp)
+    return conditional_json(config_store.digest(fp), mtime_ns / 1e9, lambda: data)
+
+
 def _parse_price_to_int(price_str: str | None) -> int:
     """
     Very simple parser: keeps digits only, e.g. '150,000 تومان' -> 150000.
@@ -175,16 +226,26 @@ def index():
     )
     ratings = load_json("ratings.json")
     prices = load_json("prices.json")
-
-    try:
-        live_rankings_men, live_rankings_women, live_rankings_updated_at = (
-            fetch_swimcloud_rankings()
-        )
-    except Exception as exc:
-        live_rankings_men = []
-        live_rankings_women = []
-        live_rankings_updated_at = None
-        print("Error fetching Swimcloud rankings:", exc)
+    load_json("site.json")
+
+    rankings = rankings_cache.snapshot()
+
+    # Sections are identical for every visitor apart from the logged-in
+    # variant of a few buttons; cache them per source version.
+    authenticated = current_user.is_authenticated
+    fragment_keys = {
+        "about": data_versions("site.json", "hours.json"),
+        "pools": data_versions("pools.json"),
+        "programmes": (data_versions("programmes.json"), authenticated),
+        "classes": data_versions("classes.json"),
+        "events": (
+            data_versions("site.json", "events.json"),
+            authenticated,
+            tuple(e.get("registered_count") for e in events),
+        ),
+        "rankings": (rankings.version, rankings.updated_at),
+        "contact": data_versions("site.json"),
+    }
 
     return render_template(
         "index.html",
@@ -195,9 +256,11 @@ def index():
         events=events,
         ratings=ratings,
         prices=prices,
-        live_rankings_men=live_rankings_men,
-        live_rankings_women=live_rankings_women,
-        live_rankings_updated_at=live_rankings_updated_at,
+        live_rankings_men=rankings.men,
+        live_rankings_women=rankings.women,
+        live_rankings_updated_at=rankings.updated_at,
+        fragment=fragment_cache.render,
+        fragment_keys=fragment_keys,
     )
 
 
@@ -216,10 +279,11 @@ def user_dashboard():
     user_bookings = get_user_bookings(user.id)
     next_reservation = get_next_reservation(user.id)
 
+    now = epoch_minutes(dt.datetime.now())
     upcoming_count = 0
     past_count = 0
     for b in user_bookings:
-        if is_past_booking(b.date, b.time):
+        if b.is_past(now):
             past_count += 1
         else:
             upcoming_count += 1
@@ -236,15 +300,23 @@ def user_dashboard():
     )
 
 
+WALLET_PAGE_SIZE = 20
+WALLET_API_MAX_LIMIT = 100
+
+
 @main.route("/dashboard/wallet")
 @login_required
 def wallet():
     user = current_user
-    transactions = user.wallet_transactions[::-1]  # newest first
+    # Keyset pagination: ?before=<entry id> shows the entries older than it
+    before = request.args.get("before", type=int)
+    transactions, next_before = user.wallet_transactions.page(before, WALLET_PAGE_SIZE)
     return render_template(
         "user/wallet.html",
         user=user,
         transactions=transactions,
+        next_before=next_before,
+        is_first_page=before is None,
     )
 
 
@@ -258,9 +330,7 @@ def membership():
 
     # Update expired memberships on the fly
     today = dt.date.today()
-    for item in user.membership_history:
-        if item.status == "active" and item.expires_at < today:
-            item.status = "expired"
+    refresh_membership_statuses()
 
     membership_history = sorted(
         user.membership_history,
@@ -301,20 +371,21 @@ def membership_buy():
         flash("طرح اشتراک نامعتبر است.", "danger")
         return redirect(url_for("main.membership"))
 
-    # Charge wallet
-    description = f"خرید اشتراک {plan.get('name', '')}"
-    if not current_user.charge(price, description=description):
-        flash("موجودی کیف پول برای خرید این اشتراک کافی نیست.", "danger")
-        return redirect(url_for("main.membership"))
-
-    # Activate / extend membership
-    history_item = activate_membership(
-        current_user,
-        plan_slug=plan["slug"],
-        plan_name=plan.get("name", ""),
-        duration_days=duration_days,
-        price=price,
-    )
+    with ledger.transaction():  # refund if activation fails
+        # Charge wallet
+        description = f"خرید اشتراک {plan.get('name', '')}"
+        if not current_user.charge(price, description=description):
+            flash("موجودی کیف پول برای خرید این اشتراک کافی نیست.", "danger")
+            return redirect(url_for("main.membership"))
+
+        # Activate / extend membership
+        history_item = activate_membership(
+            current_user,
+            plan_slug=plan["slug"],
+            plan_name=plan.get("name", ""),
+            duration_days=duration_days,
+            price=price,
+        )
 
     flash(
         f"اشتراک «{plan.get('name', '')}» با موفقیت فعال شد. "
@@ -422,7 +493,9 @@ def profile_settings():
 
         # Update password if requested
         if new_password:
-            user.password_hash = generate_password_hash(new_password)
+            user.password_hash = password_hasher.generate(new_password)
+
+        save_user_profile(user)
 
         flash("تنظیمات پروفایل با موفقیت ذخیره شد.", "success")
         return redirect(url_for("main.profile_settings"))
@@ -438,19 +511,14 @@ def bookings():
 
     refresh_booking_statuses()
 
+    # get_user_bookings is chronological; show newest first
     user_bookings = get_user_bookings(current_user.id)
 
-    # Sort by date/time descending
-    sorted_bookings = sorted(
-        user_bookings,
-        key=lambda b: parse_datetime(b.date, b.time) or dt.datetime.max,
-        reverse=True,
-    )
-
+    now = epoch_minutes(dt.datetime.now())
     upcoming: list = []
     past: list = []
-    for b in sorted_bookings:
-        if is_past_booking(b.date, b.time):
+    for b in reversed(user_bookings):
+        if b.is_past(now):
             past.append(b)
         else:
             upcoming.append(b)
@@ -505,10 +573,107 @@ def api_wallet_deposit():
     )
 
 
+def _wallet_entry_json(entry) -> dict:
+    return {
+        "id": entry.id,
+        "amount": entry.amount,
+        "type": entry.type,
+        "timestamp": entry.timestamp.isoformat(),
+        "description": entry.description,
+        "balance": entry.balance,
+    }
+
+
+@main.route("/api/wallet/transactions")
+@login_required
+def api_wallet_transactions():
+    """
+    Wallet history, newest first, each entry with its running balance.
+    Query: before (the next_before of the previous page), limit (1-100).
+    """
+    try:
+        before = int(request.args["before"]) if request.args.get("before") else None
+        limit = int(request.args.get("limit") or WALLET_PAGE_SIZE)
+    except ValueError:
+        return api_error("پارامتر نامعتبر است.", 400)
+    if (before is not None and before < 1) or not 1 <= limit <= WALLET_API_MAX_LIMIT:
+        return api_error("پارامتر نامعتبر است.", 400)
+
+    entries, next_before = current_user.wallet_transactions.page(before, limit)
+    return jsonify(
+        {
+            "status": "success",
+            "balance": current_user.wallet_balance,
+            "transactions": [_wallet_entry_json(e) for e in entries],
+            "next_before": next_before,
+        }
+    )
+
+
+@main.route("/api/wallet/balance")
+@login_required
+def api_wallet_balance():
+    """Wallet balance at a past moment. Query: at (ISO datetime, UTC if naive)."""
+    at = request.args.get("at")
+    if not at:
+        return jsonify({"status": "success", "balance": current_user.wallet_balance})
+    try:
+        when = dt.datetime.fromisoformat(at)
+    except ValueError:
+        return api_error("تاریخ نامعتبر است.", 400)
+    if when.tzinfo is not None:
+        when = when.astimezone(dt.timezone.utc).replace(tzinfo=None)
+
+    return jsonify(
+        {
+            "status": "success",
+            "at": when.isoformat(),
+            "balance": current_user.wallet_transactions.balance_as_of(when),
+        }
+    )
+
+
 # ---------------------------------------------------------------------------
 # Bookings API
 # ---------------------------------------------------------------------------
 
+def _booking_price(booking_type: str) -> int:
+    """Price of one session from prices.json, with safe defaults."""
+    try:
+        prices_cfg = load_json("prices.json")
+    except Exception:
+        prices_cfg = {}
+
+    default_free_swim = 40000
+    default_lane_training = 80000
+
+    if booking_type == "شنای آزاد":
+        return int(prices_cfg.get("free_swim", default_free_swim))
+    elif booking_type == "لاین تمرین":
+        return int(prices_cfg.get("lane_training", default_lane_training))
+    else:
+        return int(prices_cfg.get("free_swim", default_free_swim))
+
+
+@main.route("/api/availability")
+def api_availability():
+    """Free-swim capacity and free lanes per slot of a day."""
+    date = (request.args.get("date") or "").strip()
+    try:
+        duration = int(request.args.get("duration") or 60)
+    except (TypeError, ValueError):
+        return api_error("مدت سانس نامعتبر است.", 400)
+
+    if duration <= 0 or duration > MINUTES_PER_DAY:
+        return api_error("مدت سانس نامعتبر است.", 400)
+
+    availability = day_availability(date, duration)
+    if availability is None:
+        return api_error("تاریخ نامعتبر است.", 400)
+
+    return jsonify(availability)
+
+
 @main.route("/api/bookings/create", methods=["POST"])
 @login_required
 def api_create_booking():
@@ -538,63 +703,140 @@ def api_create_booking():
     if is_past_booking(date, time):
         return api_error("امکان ثبت رزرو برای زمان گذشته وجود ندارد.", 400)
 
-    if user_has_overlap(current_user.id, date, time, duration):
-        return api_error("شما در این بازه زمانی رزرو دیگری دارید.", 409)
-
-    lane = None
-
-    # Free swim → pool capacity limit
-    if booking_type == "شنای آزاد":
-        swimmers_count = count_pool_swimmers(date, time, duration)
-        if swimmers_count >= POOL_MAX_CAPACITY:
-            return api_error("ظرفیت استخر برای این بازه زمانی تکمیل است.", 409)
-
-    # Lane training → auto-assign lane
-    elif booking_type == "لاین تمرین":
-        lane = assign_lane(date, time, duration, booking_type)
-        if lane is None:
-            return api_error("تمام لاین‌های تمرینی در این بازه زمانی پر هستند.", 409)
-
-    # Prices from prices.json with safe defaults
-    try:
-        prices_cfg = load_json("prices.json")
-    except Exception:
-        prices_cfg = {}
-
-    default_free_swim = 40000
-    default_lane_training = 80000
-
-    if booking_type == "شنای آزاد":
-        price = int(prices_cfg.get("free_swim", default_free_swim))
-    elif booking_type == "لاین تمرین":
-        price = int(prices_cfg.get("lane_training", default_lane_training))
-    else:
-        price = int(prices_cfg.get("free_swim", default_free_swim))
-
-    description = f"رزرو سانس ({booking_type})"
-    if not current_user.charge(price, description=description):
-        return api_error("موجودی کیف پول برای این رزرو کافی نیست.", 402)
-
-    booking = create_booking(
+    # Overlap, capacity/lane, charge and insert happen atomically
+    booking, error, status_code = booking_admission.admit(
         user_id=current_user.id,
         date=date,
         time=time,
         duration=duration,
         booking_type=booking_type,
-        lane=lane,
+        price=_booking_price(booking_type),
+        description=f"رزرو سانس ({booking_type})",
     )
+    if booking is None:
+        return api_error(error, status_code)
 
     return jsonify(
         {
             "status": "success",
             "message": "رزرو با موفقیت ثبت شد.",
             "booking_id": booking.id,
-            "lane": lane,
-            "new_balance": current_user.wallet_balance,
+            "lane": booking.lane,
+            "new_balance": get_user_by_id(current_user.id).wallet_balance,
         }
     ), 201
 
 
+MAX_BULK_SLOTS = 60
+
+
+def _parse_bulk_slots(data: dict, default_duration: int):
+    """
+    Slots of a bulk request as [(date, time, duration)], or None if invalid.
+
+    Either an explicit list:
+        "slots": [{"date": "2025-01-06", "time": "18:00", "duration": 60}, ...]
+    or a recurrence rule (weekly by default):
+        "recurrence": {"start_date": "2025-01-06", "time": "18:00",
+                       "every_days": 7, "count": 8}
+    """
+    slots = []
+
+    if data.get("slots") is not None:
+        raw = data.get("slots")
+        if not isinstance(raw, list):
+            return None
+        for item in raw:
+            if not isinstance(item, dict) or not item.get("date") or not item.get("time"):
+                return None
+            try:
+                duration = int(item.get("duration") or default_duration)
+            except (TypeError, ValueError):
+                return None
+            if duration <= 0:
+                return None
+            slots.append((str(item["date"]), str(item["time"]), duration))
+
+    elif isinstance(data.get("recurrence"), dict):
+        rule = data["recurrence"]
+        try:
+            start = dt.date.fromisoformat(str(rule.get("start_date")))
+            every_days = int(rule.get("every_days") or 7)
+            count = int(rule.get("count") or 0)
+        except (TypeError, ValueError):
+            return None
+        time = str(rule.get("time") or "")
+        if every_days <= 0 or count <= 0 or not time or default_duration <= 0:
+            return None
+        slots = [
+            ((start + dt.timedelta(days=every_days * i)).isoformat(), time, default_duration)
+            for i in range(min(count, MAX_BULK_SLOTS + 1))
+        ]
+
+    return slots
+
+
+@main.route("/api/bookings/bulk", methods=["POST"])
+@login_required
+def api_bulk_booking():
+    """
+    Book a list of slots or a recurring slot in one request.
+    Each slot is reported as booked or rejected; the wallet is charged once
+    for all booked slots. With "all_or_nothing": true any rejected slot
+    cancels the whole request.
+    """
+    data = request.get_json(silent=True) or {}
+
+    booking_type = (data.get("type") or "").strip()
+    if booking_type == "رزرو لاین تمرین":
+        booking_type = "لاین تمرین"
+    if not booking_type:
+        return api_error("نوع رزرو مشخص نشده است.", 400)
+
+    try:
+        duration = int(data.get("duration") or 0)
+    except (TypeError, ValueError):
+        return api_error("مدت سانس نامعتبر است.", 400)
+
+    slots = _parse_bulk_slots(data, duration)
+    if not slots:
+        return api_error("فهرست سانس‌ها یا قاعده تکرار نامعتبر است.", 400)
+    if len(slots) > MAX_BULK_SLOTS:
+        return api_error(f"حداکثر {MAX_BULK_SLOTS} سانس در هر درخواست مجاز است.", 400)
+
+    price = _booking_price(booking_type)
+    results, error, status_code = booking_admission.admit_bulk(
+        user_id=current_user.id,
+        slots=slots,
+        booking_type=booking_type,
+        price=price,
+        description=f"رزرو گروهی سانس ({booking_type}) × {len(slots)}",
+        all_or_nothing=bool(data.get("all_or_nothing")),
+    )
+
+    booked = [r for r in results if r.ok]
+    payload = {
+        "status": "success" if booked else "error",
+        "message": error or f"{len(booked)} سانس با موفقیت رزرو شد.",
+        "booked_count": len(booked),
+        "total_price": price * len(booked),
+        "new_balance": get_user_by_id(current_user.id).wallet_balance,
+        "results": [
+            {
+                "date": r.date,
+                "time": r.time,
+                "duration": r.duration,
+                "status": "booked" if r.ok else "rejected",
+                "booking_id": r.booking.id if r.booking else None,
+                "lane": r.lane,
+                "message": r.message,
+            }
+            for r in results
+        ],
+    }
+    return jsonify(payload), status_code
+
+
 @main.route("/api/bookings/cancel", methods=["POST"])
 @login_required
 def api_booking_cancel():
@@ -615,28 +857,200 @@ def api_booking_cancel():
 
 @main.route("/api/live-rankings")
 def api_live_rankings():
+    rankings = rankings_cache.snapshot()
+    if not rankings.fetched_at:
+        # Nothing fetched successfully yet
+        return api_error("خطا در دریافت رده‌بندی زنده.", 503)
+
+    # Validator from the snapshot version and flags only; the payload is
+    # built on a 200
+    version = repr((
+        rankings.version, rankings.updated_at,
+        rankings_cache.healthy, rankings_cache.is_stale(rankings),
+    )).encode()
+    etag = "rankings-" + hashlib.blake2b(version, digest_size=8).hexdigest()
+
+    return conditional_json(
+        etag,
+        rankings.fetched_wall,
+        lambda: {"status": "success", **rankings_cache.payload(rankings)},
+    )
+
+
+@main.route("/api/stream")
+def api_stream():
+    """
+    Server-Sent Events: `rankings` (when the snapshot changes),
+    `registered_count` (per event) and `capacity` (days whose pool
+    availability changed). Streams end after SSE_STREAM_SECONDS; the
+    browser reconnects with Last-Event-ID and gets what it missed.
+    """
+    config = current_app.config
+    if not event_hub.try_subscribe(config["SSE_MAX_STREAMS"]):
+        return api_error("تعداد اتصال‌های زنده بیش از حد مجاز است.", 503)
+
     try:
-        items, updated_at = fetch_swimcloud_rankings()
-        return jsonify(
-            {
-                "status": "success",
-                "updated_at": updated_at,
-                "items": items,
-            }
+        last_id = int(request.headers.get("Last-Event-ID", ""))
+    except ValueError:
+        last_id = None
+    keepalive = config["SSE_KEEPALIVE_SECONDS"]
+    lifetime = config["SSE_STREAM_SECONDS"]
+
+    def current_state(resync: bool) -> str:
+        # The rankings as they are now (+ "resync": other state may have
+        # changed in events the client missed)
+        out = "event: resync\ndata: {}\n\n" if resync else ""
+        rankings = rankings_cache.snapshot()
+        if rankings.fetched_at:
+            data = json.dumps(rankings_cache.payload(rankings), ensure_ascii=False)
+            out += f"event: rankings\ndata: {data}\n\n"
+        return out
+
+    def stream():
+        cursor = last_id
+        yield f"retry: {config['SSE_RETRY_MS']}\n\n"
+        if cursor is None or event_hub.events_after(cursor) is None:
+            # New client, or missed more than the backlog: start from now
+            cursor = event_hub.last_id
+            yield current_state(resync=last_id is not None)
+
+        deadline = monotonic() + lifetime
+        while monotonic() < deadline:
+            events = event_hub.wait(cursor, keepalive)
+            if events is None:
+                cursor = event_hub.last_id
+                yield current_state(resync=True)
+            elif events:
+                cursor = events[-1].id
+                yield "".join(e.to_sse() for e in events)
+            else:
+                yield ": keepalive\n\n"
+
+    response = Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # Released when the server closes the response, which also happens for
+    # HEAD requests and clients that leave before the body starts
+    response.call_on_close(event_hub.unsubscribe)
+    return response
+
+
+def _check_export_token():
+    """Error response unless the request carries the EXPORT_TOKEN bearer token."""
+    token = current_app.config.get("EXPORT_TOKEN")
+    if not token:
+        abort(404)
+    given = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(given.encode(), token.encode()):
+        return api_error("دسترسی غیرمجاز است.", 401)
+    return None
+
+
+@main.route("/api/analytics/utilization")
+def api_analytics_utilization():
+    """
+    Weekday × hour occupancy heatmaps, peak hours and per-lane utilization.
+    Query: from / to (YYYY-MM-DD, inclusive); defaults to the last 90 days.
+    Management data: same bearer token as the exports.
+    """
+    denied = _check_export_token()
+    if denied:
+        return denied
+    if not analytics.available():
+        return api_error("ماژول تحلیل در دسترس نیست (numpy نصب نشده است).", 503)
+
+    today = dt.date.today()
+    try:
+        date_to = dt.date.fromisoformat(request.args.get("to") or today.isoformat())
+        date_from = dt.date.fromisoformat(
+            request.args.get("from") or (date_to - dt.timedelta(days=89)).isoformat()
         )
-    except Exception as exc:
-        print("Error fetching Swimcloud rankings (API):", exc)
-        return api_error("خطا در دریافت رده‌بندی زنده.", 500)
+    except ValueError:
+        return api_error("تاریخ نامعتبر است.", 400)
+
+    if date_from > date_to:
+        return api_error("تاریخ شروع باید قبل از تاریخ پایان باشد.", 400)
+    if (date_to - date_from).days >= analytics.MAX_REPORT_DAYS:
+        return api_error(f"بازه گزارش حداکثر {analytics.MAX_REPORT_DAYS} روز است.", 400)
+
+    return jsonify(analytics.utilization_report(date_from, date_to))
+
+
+@main.route("/api/exports/<dataset>.<fmt>")
+def api_export(dataset: str, fmt: str):
+    """
+    Streams all wallet entries, bookings or event registrations
+    (dataset: wallet / bookings / registrations) as CSV or NDJSON.
+    Query: from / to (YYYY-MM-DD, inclusive); default: everything.
+    Auth: "Authorization: Bearer <EXPORT_TOKEN>"; disabled when unset.
+    Gzipped on the fly when the client accepts it.
+    """
+    if dataset not in exports.DATASETS or fmt not in exports.ENCODERS:
+        abort(404)
+    denied = _check_export_token()
+    if denied:
+        return denied
+
+    try:
+        date_from = dt.date.fromisoformat(request.args.get("from") or dt.date.min.isoformat())
+        date_to = dt.date.fromisoformat(request.args.get("to") or dt.date.max.isoformat())
+    except ValueError:
+        return api_error("تاریخ نامعتبر است.", 400)
+    if date_from > date_to:
+        return api_error("تاریخ شروع باید قبل از تاریخ پایان باشد.", 400)
+
+    gzip = request.accept_encodings["gzip"] > 0
+    headers = {
+        "Content-Disposition": f'attachment; filename="{dataset}.{fmt}"',
+        "Cache-Control": "no-store",
+        "X-Accel-Buffering": "no",
+        "Vary": "Accept-Encoding",
+    }
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return Response(
+        exports.export_stream(dataset, fmt, date_from, date_to, gzip=gzip),
+        mimetype=exports.ENCODERS[fmt][1],
+        headers=headers,
+    )
+
+
+@main.route("/api/reports/rollups")
+def api_rollup_report():
+    """
+    Revenue and activity aggregates maintained at write time (rollups.py).
+    Query: from / to (YYYY-MM-DD, inclusive; defaults to the current
+    month), by (day / month). Same bearer token as the exports.
+    """
+    denied = _check_export_token()
+    if denied:
+        return denied
+
+    today = dt.date.today()
+    by = request.args.get("by", "day")
+    if by not in ("day", "month"):
+        return api_error("پارامتر نامعتبر است.", 400)
+    try:
+        date_from = dt.date.fromisoformat(request.args.get("from") or today.replace(day=1).isoformat())
+        date_to = dt.date.fromisoformat(request.args.get("to") or today.isoformat())
+    except ValueError:
+        return api_error("تاریخ نامعتبر است.", 400)
+    if date_from > date_to:
+        return api_error("تاریخ شروع باید قبل از تاریخ پایان باشد.", 400)
+
+    return jsonify(rollups.report(get_repository(), date_from, date_to, by))
 
 
 @main.route("/api/pools")
 def api_pools():
-    return jsonify(load_json("pools.json"))
+    return json_file_response("pools.json")
 
 
 @main.route("/api/programmes")
 def api_programmes():
-    return jsonify(load_json("programmes.json"))
+    return json_file_response("programmes.json")
 
 
 # ---------------------------------------------------------------------------
@@ -670,19 +1084,20 @@ def api_classes_enroll():
         return api_error("قیمت کلاس نامعتبر است.", 400)
 
     desc = f"ثبت‌نام در کلاس: {name}"
-    if not current_user.charge(price_amount, description=desc):
-        return api_error(
-            "موجودی کیف پول برای ثبت‌نام در این کلاس کافی نیست.", 402
-        )
+    with ledger.transaction():  # refund if enrollment fails
+        if not current_user.charge(price_amount, description=desc):
+            return api_error(
+                "موجودی کیف پول برای ثبت‌نام در این کلاس کافی نیست.", 402
+            )
 
-    enrollment = enroll_in_class(
-        current_user,
-        class_slug=class_slug,
-        class_name=name,
-        coach=coach,
-        time=time_str,
-        price=price_amount,
-    )
+        enrollment = enroll_in_class(
+            current_user,
+            class_slug=class_slug,
+            class_name=name,
+            coach=coach,
+            time=time_str,
+            price=price_amount,
+        )
 
     return jsonify(
         {
@@ -784,16 +1199,17 @@ def api_event_register():
     title = event.get("title") or "رویداد"
     amount = _parse_price_to_int(event.get("price"))
 
-    if amount > 0:
-        if not current_user.charge(amount, description=f"ثبت‌نام رویداد: {title}"):
-            return api_error("موجودی کیف پول کافی نیست.", 402)
+    with ledger.transaction():  # refund if registration fails
+        if amount > 0:
+            if not current_user.charge(amount, description=f"ثبت‌نام رویداد: {title}"):
+                return api_error("موجودی کیف پول کافی نیست.", 402)
 
-    reg = create_event_registration(
-        user_id=current_user.id,
-        event_slug=slug,
-        title=title,
-        price=amount,
-    )
+        reg = create_event_registration(
+            user_id=current_user.id,
+            event_slug=slug,
+            title=title,
+            price=amount,
+        )
 
     new_count = count_event_registrations(slug)
 
@@ -0,0 +1,766 @@
+from __future__ import annotations
+
+import datetime as dt
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .model import (
+    MINUTES_PER_DAY,
+    Booking,
+    BookingStatus,
+    ClassEnrollment,
+    EventRegistration,
+    MembershipHistoryItem,
+    Repository,
+    User,
+    WalletTransaction,
+)
+from .rollups import compute_rollups
+from .wallet_history import WalletEntry
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS users (
+    id                    INTEGER PRIMARY KEY,
+    email                 TEXT NOT NULL UNIQUE,
+    password_hash         TEXT NOT NULL,
+    first_name            TEXT NOT NULL DEFAULT '',
+    last_name             TEXT NOT NULL DEFAULT '',
+    wallet_balance        INTEGER NOT NULL DEFAULT 0,
+    wallet_version        INTEGER NOT NULL DEFAULT 0,
+    membership_slug       TEXT,
+    membership_name       TEXT,
+    membership_expires_at TEXT,
+    phone                 TEXT NOT NULL DEFAULT '',
+    birthdate             TEXT NOT NULL DEFAULT '',
+    emergency_contact     TEXT NOT NULL DEFAULT ''
+);
+
+-- balance: the user's wallet balance right after this entry
+CREATE TABLE IF NOT EXISTS wallet_transactions (
+    id          INTEGER PRIMARY KEY,
+    user_id     INTEGER NOT NULL REFERENCES users(id),
+    amount      INTEGER NOT NULL,
+    type        TEXT NOT NULL,
+    timestamp   TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    balance     INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_wallet_transactions_user
+    ON wallet_transactions(user_id, id);
+
+CREATE TABLE IF NOT EXISTS membership_history (
+    id           TEXT PRIMARY KEY,
+    user_id      INTEGER NOT NULL REFERENCES users(id),
+    plan_slug    TEXT NOT NULL,
+    plan_name    TEXT NOT NULL,
+    purchased_at TEXT NOT NULL,
+    expires_at   TEXT NOT NULL,
+    amount       INTEGER NOT NULL,
+    status       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_membership_history_user
+    ON membership_history(user_id, purchased_at);
+CREATE INDEX IF NOT EXISTS ix_membership_history_active_expiry
+    ON membership_history(expires_at) WHERE status = 'active';
+
+CREATE TABLE IF NOT EXISTS class_enrollments (
+    id          TEXT PRIMARY KEY,
+    user_id     INTEGER NOT NULL REFERENCES users(id),
+    class_slug  TEXT NOT NULL,
+    class_name  TEXT NOT NULL,
+    coach       TEXT NOT NULL,
+    time        TEXT NOT NULL,
+    price       INTEGER NOT NULL,
+    enrolled_at TEXT NOT NULL,
+    status      TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_class_enrollments_user
+    ON class_enrollments(user_id, enrolled_at);
+
+-- start/end are epoch minutes, day = start // 1440 (NULL if unparsable)
+CREATE TABLE IF NOT EXISTS bookings (
+    id       INTEGER PRIMARY KEY,
+    user_id  TEXT NOT NULL,
+    date     TEXT NOT NULL,
+    time     TEXT NOT NULL,
+    duration INTEGER NOT NULL,
+    type     TEXT NOT NULL,
+    lane     INTEGER,
+    status   TEXT NOT NULL,
+    day      INTEGER,
+    start    INTEGER,
+    "end"    INTEGER
+);
+CREATE INDEX IF NOT EXISTS ix_bookings_day_start ON bookings(day, start);
+CREATE INDEX IF NOT EXISTS ix_bookings_user_start ON bookings(user_id, start);
+CREATE INDEX IF NOT EXISTS ix_bookings_lane_start
+    ON bookings(lane, start) WHERE lane IS NOT NULL;
+CREATE INDEX IF NOT EXISTS ix_bookings_active_start
+    ON bookings(start) WHERE status = 'active';
+
+CREATE TABLE IF NOT EXISTS event_registrations (
+    id         TEXT PRIMARY KEY,
+    event_slug TEXT NOT NULL,
+    title      TEXT NOT NULL,
+    user_id    TEXT,
+    name       TEXT NOT NULL,
+    email      TEXT NOT NULL,
+    price      INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    status     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_event_registrations_slug
+    ON event_registrations(event_slug, status);
+CREATE INDEX IF NOT EXISTS ix_event_registrations_user
+    ON event_registrations(user_id, event_slug);
+
+-- Daily ("YYYY-MM-DD") and monthly ("YYYY-MM") aggregates, see rollups.py
+CREATE TABLE IF NOT EXISTS rollups (
+    period TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value  INTEGER NOT NULL,
+    PRIMARY KEY (period, metric)
+) WITHOUT ROWID;
+"""
+
+_BOOKING_COLUMNS = 'id, user_id, date, time, duration, type, lane, status'
+
+
+# ---------------------------
+# Wallet history
+# ---------------------------
+
+class SqliteWalletHistory:
+    """
+    User.wallet_transactions for the SQLite backend: the read side of
+    WalletHistory, answered by queries on demand instead of loading every
+    entry with the user.
+
+    Entry ids are the table's row ids, so page(before=id) is a keyset
+    query on the (user_id, id) index, and each row carries the balance
+    after it.
+    """
+
+    def __init__(self, repo: SqliteRepository, user_id: str):
+        self._repo = repo
+        self._user_id = user_id
+
+    def _rows(self, sql: str, *params):
+        return self._repo._conn().execute(sql, (self._user_id, *params))
+
+    @staticmethod
+    def _transaction(row) -> WalletTransaction:
+        return WalletTransaction(
+            amount=row["amount"],
+            type=row["type"],
+            timestamp=dt.datetime.fromisoformat(row["timestamp"]),
+            description=row["description"],
+        )
+
+    def __len__(self) -> int:
+        return self._rows("SELECT COUNT(*) FROM wallet_transactions WHERE user_id = ?").fetchone()[0]
+
+    def __iter__(self) -> Iterator[WalletTransaction]:
+        for row in self._rows("SELECT * FROM wallet_transactions WHERE user_id = ? ORDER BY id"):
+            yield self._transaction(row)
+
+    def __getitem__(self, index: int) -> WalletTransaction:
+        order, offset = ("DESC", -index - 1) if index < 0 else ("ASC", index)
+        row = self._rows(
+            f"SELECT * FROM wallet_transactions WHERE user_id = ? ORDER BY id {order} LIMIT 1 OFFSET ?",
+            offset,
+        ).fetchone()
+        if row is None:
+            raise IndexError("wallet history index out of range")
+        return self._transaction(row)
+
+    def balance_as_of(self, when: dt.datetime) -> int:
+        row = self._rows(
+            """
+            SELECT balance FROM wallet_transactions
+             WHERE user_id = ? AND timestamp <= ?
+             ORDER BY id DESC LIMIT 1
+            """,
+            when.isoformat(),
+        ).fetchone()
+        return row[0] if row else 0
+
+    def page(self, before: Optional[int] = None, limit: int = 20) -> Tuple[List[WalletEntry], Optional[int]]:
+        """Same contract as WalletHistory.page(), with row ids as cursors."""
+        rows = self._rows(
+            """
+            SELECT * FROM wallet_transactions
+             WHERE user_id = ? AND id < ?
+             ORDER BY id DESC LIMIT ?
+            """,
+            before if before is not None else 2**63 - 1,
+            limit + 1,
+        ).fetchall()
+        entries = [
+            WalletEntry(
+                id=row["id"],
+                amount=row["amount"],
+                type=row["type"],
+                timestamp=dt.datetime.fromisoformat(row["timestamp"]),
+                description=row["description"],
+                balance=row["balance"],
+            )
+            for row in rows[:limit]
+        ]
+        return entries, (entries[-1].id if len(rows) > limit else None)
+
+
+class SqliteRepository(Repository):
+    """
+    SQLite storage (WAL mode) so state survives restarts and can be shared
+    by several worker processes.
+
+    One connection per thread; every mutation runs in its own transaction
+    unless the caller already opened one with transaction().
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        had_rollups = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'rollups'"
+        ).fetchone()
+        conn.executescript(SCHEMA)
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(users)")}
+        if "wallet_version" not in columns:  # databases created before the ledger
+            conn.execute(
+                "ALTER TABLE users ADD COLUMN wallet_version INTEGER NOT NULL DEFAULT 0"
+            )
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(wallet_transactions)")}
+        if "balance" not in columns:  # running balances: backfill once
+            with self.transaction():
+                conn.execute(
+                    "ALTER TABLE wallet_transactions ADD COLUMN balance INTEGER NOT NULL DEFAULT 0"
+                )
+                conn.execute(
+                    """
+                    WITH running AS (
+                        SELECT id, SUM(amount) OVER (PARTITION BY user_id ORDER BY id) AS balance
+                          FROM wallet_transactions
+                    )
+                    UPDATE wallet_transactions SET balance = running.balance
+                      FROM running WHERE wallet_transactions.id = running.id
+                    """
+                )
+        if not had_rollups:  # databases created before rollups: backfill once
+            self.replace_rollups(compute_rollups(self))
+
+    # ---- Connection / transactions ----
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        BEGIN IMMEDIATE ... COMMIT, or ROLLBACK on error.
+        Nested calls join the outermost transaction.
+        """
+        conn = self._conn()
+        if self._local.depth:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = 1
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+        finally:
+            self._local.depth = 0
+
+    # ---- Row mapping ----
+
+    @staticmethod
+    def _booking(row) -> Booking:
+        return Booking(
+            id=str(row["id"]),
+            user_id=row["user_id"],
+            date=row["date"],
+            time=row["time"],
+            duration=row["duration"],
+            type=row["type"],
+            lane=row["lane"],
+            status=row["status"],
+        )
+
+    @staticmethod
+    def _registration(row) -> EventRegistration:
+        return EventRegistration(
+            id=row["id"],
+            event_slug=row["event_slug"],
+            title=row["title"],
+            user_id=row["user_id"],
+            name=row["name"],
+            email=row["email"],
+            price=row["price"],
+            created_at=dt.datetime.fromisoformat(row["created_at"]),
+            status=row["status"],
+        )
+
+    def _user(self, row) -> Optional[User]:
+        if row is None:
+            return None
+        conn = self._conn()
+        user_id = row["id"]
+        today = dt.date.today()
+
+        history = []
+        for h in conn.execute(
+            "SELECT * FROM membership_history WHERE user_id = ? ORDER BY purchased_at",
+            (user_id,),
+        ):
+            expires_at = dt.date.fromisoformat(h["expires_at"])
+            status = h["status"]
+            if status == "active" and expires_at < today:
+                status = "expired"  # expire_memberships() persists this later
+            history.append(
+                MembershipHistoryItem(
+                    id=h["id"],
+                    plan_slug=h["plan_slug"],
+                    plan_name=h["plan_name"],
+                    purchased_at=dt.datetime.fromisoformat(h["purchased_at"]),
+                    expires_at=expires_at,
+                    amount=h["amount"],
+                    status=status,
+                )
+            )
+
+        return User(
+            id=str(user_id),
+            email=row["email"],
+            password_hash=row["password_hash"],
+            first_name=row["first_name"],
+            last_name=row["last_name"],
+            wallet_balance=row["wallet_balance"],
+            wallet_version=row["wallet_version"],
+            wallet_transactions=SqliteWalletHistory(self, str(user_id)),
+            membership_slug=row["membership_slug"],
+            membership_name=row["membership_name"],
+            membership_expires_at=(
+                dt.date.fromisoformat(row["membership_expires_at"])
+                if row["membership_expires_at"]
+                else None
+            ),
+            membership_history=history,
+            phone=row["phone"],
+            birthdate=row["birthdate"],
+            emergency_contact=row["emergency_contact"],
+            class_enrollments=[
+                ClassEnrollment(
+                    id=c["id"],
+                    class_slug=c["class_slug"],
+                    class_name=c["class_name"],
+                    coach=c["coach"],
+                    time=c["time"],
+                    price=c["price"],
+                    enrolled_at=dt.datetime.fromisoformat(c["enrolled_at"]),
+                    status=c["status"],
+                )
+                for c in conn.execute(
+                    "SELECT * FROM class_enrollments WHERE user_id = ? ORDER BY enrolled_at",
+                    (user_id,),
+                )
+            ],
+        )
+
+    # ---- Users ----
+
+    def add_user(self, user: User) -> User:
+        with self.transaction() as conn:
+            cur = conn.execute(
+                """
+                INSERT INTO users (email, password_hash, first_name, last_name,
+                                   wallet_balance, phone, birthdate, emergency_contact)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    user.email, user.password_hash, user.first_name, user.last_name,
+                    user.wallet_balance, user.phone, user.birthdate, user.emergency_contact,
+                ),
+            )
+            user.id = str(cur.lastrowid)
+        user.wallet_transactions = SqliteWalletHistory(self, user.id)
+        return user
+
+    def get_user(self, user_id: str) -> Optional[User]:
+        row = self._conn().execute("SELECT * FROM users WHERE id = ?", (user_id,)).fetchone()
+        return self._user(row)
+
+    def get_user_by_email(self, email: str) -> Optional[User]:
+        row = self._conn().execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone()
+        return self._user(row)
+
+    def change_user_email(self, user: User, email: str) -> bool:
+        try:
+            with self.transaction() as conn:
+                conn.execute("UPDATE users SET email = ? WHERE id = ?", (email, user.id))
+        except sqlite3.IntegrityError:
+            return False
+        user.email = email
+        return True
+
+    def save_user_profile(self, user: User):
+        with self.transaction() as conn:
+            conn.execute(
+                """
+                UPDATE users
+                   SET first_name = ?, last_name = ?, phone = ?, birthdate = ?,
+                       emergency_contact = ?, password_hash = ?
+                 WHERE id = ?
+                """,
+                (
+                    user.first_name, user.last_name, user.phone, user.birthdate,
+                    user.emergency_contact, user.password_hash, user.id,
+                ),
+            )
+
+    def get_wallet(self, user_id: str) -> Optional[Tuple[int, int]]:
+        row = self._conn().execute(
+            "SELECT wallet_balance, wallet_version FROM users WHERE id = ?", (user_id,)
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def compare_and_set_wallet(self, user: User, expected_version: int, tx: WalletTransaction) -> bool:
+        with self.transaction() as conn:
+            cur = conn.execute(
+                """
+                UPDATE users
+                   SET wallet_balance = wallet_balance + ?, wallet_version = wallet_version + 1
+                 WHERE id = ? AND wallet_version = ?
+                """,
+                (tx.amount, user.id, expected_version),
+            )
+            if cur.rowcount != 1:
+                return False
+            balance = conn.execute(
+                "SELECT wallet_balance FROM users WHERE id = ?", (user.id,)
+            ).fetchone()[0]
+            conn.execute(
+                """
+                INSERT INTO wallet_transactions (user_id, amount, type, timestamp, description, balance)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (user.id, tx.amount, tx.type, tx.timestamp.isoformat(), tx.description, balance),
+            )
+
+        user.wallet_balance = balance
+        user.wallet_version = expected_version + 1
+        return True
+
+    def save_membership(self, user: User, item: MembershipHistoryItem):
+        with self.transaction() as conn:
+            conn.execute(
+                """
+                UPDATE users
+                   SET membership_slug = ?, membership_name = ?, membership_expires_at = ?
+                 WHERE id = ?
+                """,
+                (
+                    user.membership_slug,
+                    user.membership_name,
+                    user.membership_expires_at.isoformat() if user.membership_expires_at else None,
+                    user.id,
+                ),
+            )
+            conn.execute(
+                """
+                INSERT INTO membership_history
+                    (id, user_id, plan_slug, plan_name, purchased_at, expires_at, amount, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET status = excluded.status
+                """,
+                (
+                    item.id, user.id, item.plan_slug, item.plan_name,
+                    item.purchased_at.isoformat(), item.expires_at.isoformat(),
+                    item.amount, item.status,
+                ),
+            )
+
+    def expire_memberships(self, today: dt.date):
+        with self.transaction() as conn:
+            conn.execute(
+                "UPDATE membership_history SET status = 'expired' "
+                "WHERE status = 'active' AND expires_at < ?",
+                (today.isoformat(),),
+            )
+
+    def add_class_enrollment(self, user: User, enrollment: ClassEnrollment):
+        with self.transaction() as conn:
+            conn.execute(
+                """
+                INSERT INTO class_enrollments
+                    (id, user_id, class_slug, class_name, coach, time, price, enrolled_at, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    enrollment.id, user.id, enrollment.class_slug, enrollment.class_name,
+                    enrollment.coach, enrollment.time, enrollment.price,
+                    enrollment.enrolled_at.isoformat(), enrollment.status,
+                ),
+            )
+
+    # ---- Bookings ----
+
+    def add_booking(self, booking: Booking) -> Booking:
+        start = booking.start
+        with self.transaction() as conn:
+            cur = conn.execute(
+                """
+                INSERT INTO bookings
+                    (user_id, date, time, duration, type, lane, status, day, start, "end")
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    booking.user_id, booking.date, booking.time, booking.duration,
+                    str(booking.type), booking.lane, str(booking.status),
+                    start // MINUTES_PER_DAY if start is not None else None,
+                    start, booking.end,
+                ),
+            )
+            # Overlap queries look back this far into previous days
+            conn.execute(
+                """
+                INSERT INTO meta (key, value) VALUES ('max_booking_duration', ?)
+                ON CONFLICT(key) DO UPDATE SET value = max(value, excluded.value)
+                """,
+                (booking.duration,),
+            )
+            booking.id = str(cur.lastrowid)
+        return booking
+
+    def get_booking(self, booking_id: str) -> Optional[Booking]:
+        row = self._conn().execute(
+            f"SELECT {_BOOKING_COLUMNS} FROM bookings WHERE id = ?", (booking_id,)
+        ).fetchone()
+        return self._booking(row) if row else None
+
+    def set_booking_status(self, booking: Booking, status: BookingStatus) -> bool:
+        with self.transaction() as conn:
+            changed = conn.execute(
+                "UPDATE bookings SET status = ? WHERE id = ? AND status != ?",
+                (str(status), booking.id, str(status)),
+            ).rowcount
+        booking.status = status
+        return changed > 0
+
+    def overlapping_bookings(self, start: int, end: int) -> Iterator[Booking]:
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value FROM meta WHERE key = 'max_booking_duration'"
+        ).fetchone()
+        max_duration = row["value"] if row else 0
+        rows = conn.execute(
+            f"""
+            SELECT {_BOOKING_COLUMNS} FROM bookings
+             WHERE day BETWEEN ? AND ?
+               AND start < ? AND "end" > ?
+               AND status = 'active'
+            """,
+            (
+                (start - max_duration) // MINUTES_PER_DAY,
+                (end - 1) // MINUTES_PER_DAY,
+                end,
+                start,
+            ),
+        ).fetchall()
+        return (self._booking(r) for r in rows)
+
+    def user_bookings(self, user_id: str) -> List[Booking]:
+        rows = self._conn().execute(
+            f"""
+            SELECT {_BOOKING_COLUMNS} FROM bookings
+             WHERE user_id = ?
+             ORDER BY start IS NULL, start, id
+            """,
+            (user_id,),
+        )
+        return [self._booking(r) for r in rows]
+
+    def next_user_booking(self, user_id: str, now: float) -> Optional[Booking]:
+        row = self._conn().execute(
+            f"""
+            SELECT {_BOOKING_COLUMNS} FROM bookings
+             WHERE user_id = ? AND status = 'active' AND start > ?
+             ORDER BY start, id
+             LIMIT 1
+            """,
+            (user_id, now),
+        ).fetchone()
+        return self._booking(row) if row else None
+
+    def expire_bookings(self, now: float):
+        with self.transaction() as conn:
+            conn.execute(
+                "UPDATE bookings SET status = 'expired' "
+                "WHERE status = 'active' AND (start < ? OR start IS NULL)",
+                (now,),
+            )
+
+    def booking_rows(self, start: int, end: int) -> List[Tuple[int, int, str, Optional[int]]]:
+        rows = self._conn().execute(
+            """
+            SELECT start, duration, type, lane FROM bookings
+             WHERE day BETWEEN ? AND ? AND start >= ? AND start < ?
+               AND status != 'cancelled'
+            """,
+            (start // MINUTES_PER_DAY, (end - 1) // MINUTES_PER_DAY, start, end),
+        )
+        return [tuple(row) for row in rows]
+
+    # ---- Event registrations ----
+
+    def add_event_registration(self, reg: EventRegistration):
+        with self.transaction() as conn:
+            conn.execute(
+                """
+                INSERT INTO event_registrations
+                    (id, event_slug, title, user_id, name, email, price, created_at, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    reg.id, reg.event_slug, reg.title, reg.user_id, reg.name,
+                    reg.email, reg.price, reg.created_at.isoformat(), reg.status,
+                ),
+            )
+
+    def count_event_registrations(self, event_slug: str) -> int:
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM event_registrations "
+            "WHERE event_slug = ? AND status = 'registered'",
+            (event_slug,),
+        ).fetchone()
+        return row[0]
+
+    def user_is_registered_for_event(self, user_id: str, event_slug: str) -> bool:
+        row = self._conn().execute(
+            "SELECT 1 FROM event_registrations "
+            "WHERE user_id = ? AND event_slug = ? AND status = 'registered' LIMIT 1",
+            (user_id, event_slug),
+        ).fetchone()
+        return row is not None
+
+    def user_event_registrations(self, user_id: str) -> List[EventRegistration]:
+        rows = self._conn().execute(
+            "SELECT * FROM event_registrations WHERE user_id = ? ORDER BY rowid",
+            (user_id,),
+        )
+        return [self._registration(r) for r in rows]
+
+    # ---- Exports ----
+    #   sqlite3 cursors fetch rows as they are iterated.
+
+    def iter_wallet_transactions(
+        self, start: dt.datetime, end: dt.datetime
+    ) -> Iterator[Tuple[str, str, WalletTransaction]]:
+        rows = self._conn().execute(
+            """
+            SELECT t.user_id, u.email, t.amount, t.type, t.timestamp, t.description
+              FROM wallet_transactions t JOIN users u ON u.id = t.user_id
+             WHERE t.timestamp >= ? AND t.timestamp < ?
+             ORDER BY t.user_id, t.id
+            """,
+            (start.isoformat(), end.isoformat()),
+        )
+        for user_id, email, amount, tx_type, timestamp, description in rows:
+            yield str(user_id), email, WalletTransaction(
+                amount=amount,
+                type=tx_type,
+                timestamp=dt.datetime.fromisoformat(timestamp),
+                description=description,
+            )
+
+    def iter_bookings(self, date_from: str, date_to: str) -> Iterator[Booking]:
+        rows = self._conn().execute(
+            f"SELECT {_BOOKING_COLUMNS} FROM bookings WHERE date BETWEEN ? AND ? ORDER BY id",
+            (date_from, date_to),
+        )
+        for row in rows:
+            yield self._booking(row)
+
+    def iter_event_registrations(self, start: dt.datetime, end: dt.datetime) -> Iterator[EventRegistration]:
+        rows = self._conn().execute(
+            """
+            SELECT * FROM event_registrations
+             WHERE created_at >= ? AND created_at < ?
+             ORDER BY rowid
+            """,
+            (start.isoformat(), end.isoformat()),
+        )
+        for row in rows:
+            yield self._registration(row)
+
+    def iter_users(self) -> Iterator[User]:
+        ids = [row[0] for row in self._conn().execute("SELECT id FROM users ORDER BY id")]
+        for user_id in ids:
+            user = self.get_user(user_id)
+            if user is not None:
+                yield user
+
+    # ---- Rollups ----
+
+    def add_rollups(self, increments: Iterable[Tuple[str, str, int]]):
+        with self.transaction() as conn:
+            conn.executemany(
+                """
+                INSERT INTO rollups (period, metric, value) VALUES (?, ?, ?)
+                ON CONFLICT (period, metric) DO UPDATE SET value = value + excluded.value
+                """,
+                increments,
+            )
+
+    def get_rollups(self, first: str, last: str) -> Dict[str, Dict[str, int]]:
+        rollups: Dict[str, Dict[str, int]] = {}
+        rows = self._conn().execute(
+            """
+            SELECT period, metric, value FROM rollups
+             WHERE period BETWEEN ? AND ? AND length(period) = ?
+            """,
+            (first, last, len(first)),
+        )
+        for period, metric, value in rows:
+            rollups.setdefault(period, {})[metric] = value
+        return rollups
+
+    def replace_rollups(self, rollups: Dict[str, Dict[str, int]]):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM rollups")
+            conn.executemany(
+                "INSERT INTO rollups (period, metric, value) VALUES (?, ?, ?)",
+                (
+                    (period, metric, value)
+                    for period, metrics in rollups.items()
+                    for metric, value in metrics.items()
+                ),
+            )
@@ -13,6 +13,74 @@
     initLiveRankings();
     initLandingEventRegistration();
     initDashboardEventWalletRegistration();
+    initRegisteredCounts();
+    startLiveStream();
+  }
+
+  /* =========================
+   *  Live updates (Server-Sent Events)
+   * ========================= */
+  const liveHandlers = {};
+  const liveFallbacks = [];
+
+  // Subscribe to one event type of /api/stream. `fallback` runs instead
+  // when the browser has no EventSource or the server refuses the stream.
+  function onLive(name, handler, fallback) {
+    (liveHandlers[name] = liveHandlers[name] || []).push(handler);
+    if (fallback) liveFallbacks.push(fallback);
+  }
+
+  function startLiveStream() {
+    const names = Object.keys(liveHandlers);
+    if (!names.length) return;
+
+    let fellBack = false;
+    function fallBack() {
+      if (fellBack) return;
+      fellBack = true;
+      liveFallbacks.forEach((fn) => fn());
+    }
+
+    if (!window.EventSource) {
+      fallBack();
+      return;
+    }
+
+    // One connection per tab; the server pushes only when something changes
+    const source = new EventSource("/api/stream");
+    names.forEach((name) => {
+      source.addEventListener(name, (e) => {
+        const data = JSON.parse(e.data);
+        liveHandlers[name].forEach((fn) => fn(data));
+      });
+    });
+    // Missed too many events (the server resends the rankings itself):
+    // capacity may have changed on any date
+    source.addEventListener("resync", () => {
+      (liveHandlers.capacity || []).forEach((fn) => fn({ dates: null }));
+    });
+    source.onerror = () => {
+      // CLOSED means the browser gave up (e.g. 503 when the server is at
+      // its stream limit); otherwise it reconnects by itself.
+      if (source.readyState === EventSource.CLOSED) fallBack();
+    };
+  }
+
+  /* =========================
+   *  Event registration counts
+   * ========================= */
+  function initRegisteredCounts() {
+    if (!document.querySelector("[data-registered-count]")) return;
+
+    onLive("registered_count", (data) => {
+      document
+        .querySelectorAll("[data-registered-count]")
+        .forEach((el) => {
+          if (el.dataset.registeredCount === data.slug) {
+            el.textContent = data.registered_count;
+          }
+        });
+    });
   }
 
   /* =========================
@@ -23,6 +91,7 @@
     const bookingMessage = document.getElementById("bookingMessage");
     const bookingPricePreview = document.getElementById("bookingPricePreview");
     const bookingModal = document.getElementById("bookingModal");
+    const bookingAvailability = document.getElementById("bookingAvailability");
 
     if (!bookingForm) {
       return; // no booking UI on this page
@@ -70,15 +139,98 @@
         : "–";
     }
 
+    // Availability of the chosen date, cached per date + duration
+    const availabilityCache = new Map();
+
+    function fetchAvailability(date, duration) {
+      const key = date + "|" + duration;
+      if (!availabilityCache.has(key)) {
+        const url =
+          "/api/availability?date=" + encodeURIComponent(date) +
+          "&duration=" + encodeURIComponent(duration);
+        availabilityCache.set(
+          key,
+          fetch(url)
+            .then((res) => (res.ok ? res.json() : null))
+            .catch(() => null)
+        );
+      }
+      return availabilityCache.get(key);
+    }
+
+    function updateAvailability() {
+      if (!bookingAvailability) return;
+
+      const date = bookingForm.date ? bookingForm.date.value : "";
+      const time = bookingForm.time ? bookingForm.time.value : "";
+      const duration = bookingForm.duration ? parseInt(bookingForm.duration.value, 10) : 60;
+      const type = bookingForm.type ? bookingForm.type.value.trim() : "";
+
+      if (!date || !time) {
+        bookingAvailability.classList.add("d-none");
+        return;
+      }
+
+      fetchAvailability(date, duration).then((data) => {
+        if (!data || !data.slots) {
+          bookingAvailability.classList.add("d-none");
+          return;
+        }
+
+        // Slot that contains the chosen start time
+        const [h, m] = time.split(":").map((x) => parseInt(x, 10));
+        const index = Math.floor((h * 60 + m) / data.slot_minutes);
+        const slot = data.slots[index];
+        if (!slot) {
+          bookingAvailability.classList.add("d-none");
+          return;
+        }
+
+        let text;
+        if (type === "رزرو لاین تمرین") {
+          text = slot.free_lanes.length
+            ? "لاین‌های آزاد: " + slot.free_lanes.map((l) => l.toLocaleString("fa-IR")).join("، ")
+            : "تمام لاین‌های تمرینی در این بازه پر هستند.";
+        } else {
+          text = slot.free_swim_remaining
+            ? "ظرفیت باقی‌مانده: " + slot.free_swim_remaining.toLocaleString("fa-IR") + " نفر"
+            : "ظرفیت استخر برای این بازه تکمیل است.";
+        }
+        bookingAvailability.textContent = text;
+        bookingAvailability.classList.remove("d-none");
+      });
+    }
+
     // Attach listeners
     if (bookingForm.type) {
       bookingForm.type.addEventListener("change", updatePrice);
+      bookingForm.type.addEventListener("change", updateAvailability);
     }
     if (bookingForm.duration) {
       bookingForm.duration.addEventListener("change", updatePrice);
+      bookingForm.duration.addEventListener("change", updateAvailability);
+    }
+    if (bookingForm.date) {
+      bookingForm.date.addEventListener("change", updateAvailability);
+    }
+    if (bookingForm.time) {
+      bookingForm.time.addEventListener("change", updateAvailability);
     }
     updatePrice();
 
+    // Bookings elsewhere changed capacity: refetch if it concerns the
+    // date being looked at (debounced, a bulk booking sends many events).
+    let capacityTimer = null;
+    onLive("capacity", (data) => {
+      const date = bookingForm.date ? bookingForm.date.value : "";
+      if (data.dates && !data.dates.includes(date)) return;
+      clearTimeout(capacityTimer);
+      capacityTimer = setTimeout(() => {
+        availabilityCache.clear();
+        updateAvailability();
+      }, 300);
+    });
+
     bookingForm.addEventListener("submit", function (e) {
       e.preventDefault();
       clearMessage();
@@ -114,6 +266,8 @@
 
           if (data.status === "error") {
             showMessage("danger", data.message || "خطایی رخ داد.");
+            availabilityCache.clear(); // capacity changed under us
+            updateAvailability();
             return;
           }
 
@@ -349,20 +503,41 @@
       }
     }
 
+    // Validators from the last response; the server answers 304 (no body)
+    // while the rankings are unchanged.
+    let etag = null;
+    let lastModified = null;
+
     function refreshRankings() {
-      fetch("/api/live-rankings")
-        .then((res) => res.json())
+      const headers = {};
+      if (etag) headers["If-None-Match"] = etag;
+      if (lastModified) headers["If-Modified-Since"] = lastModified;
+
+      fetch("/api/live-rankings", { headers, cache: "no-store" })
+        .then((res) => {
+          if (res.status === 304) return null;
+          etag = res.headers.get("ETag") || etag;
+          lastModified = res.headers.get("Last-Modified") || lastModified;
+          return res.json();
+        })
         .then((data) => {
-          if (data.status === "success") {
+          if (data && data.status === "success") {
             renderRankings(data.items, data.updated_at);
           }
         })
         .catch((err) => console.error("live rankings error", err));
     }
 
-    // initial load + periodic refresh
-    refreshRankings();
-    setInterval(refreshRankings, 60000);
+    // Pushed when the snapshot changes (and once on connect); without
+    // SSE, initial load + periodic refresh.
+    onLive(
+      "rankings",
+      (data) => renderRankings(data.items, data.updated_at),
+      () => {
+        refreshRankings();
+        setInterval(refreshRankings, 60000);
+      }
+    );
   }
 
   /* =========================
@@ -1,11 +1,240 @@
+import re
+import threading
+import time
+
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from datetime import datetime, timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 SWIMCLOUD_REGION_URL = "https://www.swimcloud.com/?r=country_USA"
 
+USER_AGENT = "Mozilla/5.0 (compatible; PoolClubBot/1.0; +https://yourdomain.example)"
+REQUEST_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+
+TOP_SWIMS_SECTION_ID = "js-region-top-swims-container"
+
+# Opening tag of the Top Swims section, and any section open/close tag
+_TOP_SWIMS_SECTION_RE = re.compile(
+    r"<section\b[^>]*\bid\s*=\s*[\"']?" + TOP_SWIMS_SECTION_ID + r"\b", re.IGNORECASE
+)
+_SECTION_TAG_RE = re.compile(r"<(/?)section\b[^>]*>", re.IGNORECASE)
+# The strainer sees the raw class attribute ("row js-top-swims-form-content")
+_CONTENT_CLASS_RE = re.compile(r"(?:^|\s)js-top-swims-form-content(?:\s|$)")
+
+
+def _top_swims_slice(html: str):
+    """
+    (start, end) of the Top Swims <section> in the raw HTML, matching
+    nested sections; end is len(html) if the closing tag isn't found.
+    None if the opening tag isn't there.
+    """
+    match = _TOP_SWIMS_SECTION_RE.search(html)
+    if not match:
+        return None
+
+    depth = 0
+    for tag in _SECTION_TAG_RE.finditer(html, match.start()):
+        depth += -1 if tag.group(1) else 1
+        if depth == 0:
+            return match.start(), tag.end()
+    return match.start(), len(html)
+
+
+def parse_top_swims_content(html: str):
+    """
+    Tree of the only part of the page the rankings are read from: the
+    div.js-top-swims-form-content inside the Top Swims section.
+
+    The page is a few hundred KB of which that div is a small part: only
+    the section's own markup is handed to the parser, and a SoupStrainer
+    keeps the rest of it (the region picker form, ...) out of the tree.
+    If that finds nothing, fall back to parsing the whole page.
+    Returns None when there is no Top Swims section.
+    """
+    bounds = _top_swims_slice(html)
+    if bounds:
+        strainer = SoupStrainer("div", class_=_CONTENT_CLASS_RE)
+        soup = BeautifulSoup(html[bounds[0]:bounds[1]], "html.parser", parse_only=strainer)
+        if soup.contents:
+            return soup
+
+    soup = BeautifulSoup(html, "html.parser")
+    return soup.select_one("section#" + TOP_SWIMS_SECTION_ID)
+
+
+# ---------------------------
+# Circuit Breaker
+# ---------------------------
+
+class CircuitOpenError(requests.RequestException):
+    """Upstream has been failing; the call was not attempted."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream that keeps failing.
+
+      - closed: calls go through; `failure_threshold` consecutive
+        failures open the circuit.
+      - open: calls fail fast with CircuitOpenError for `reset_timeout`
+        seconds.
+      - half-open: once that has passed, one trial call goes through.
+        Success closes the circuit; failure re-opens it with the timeout
+        doubled (exponential backoff, capped at `max_reset_timeout`).
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30,
+        max_reset_timeout: float = 900,
+        clock=time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.clock = clock
+
+        self.failures = 0
+        self.opened_at = None
+        self.timeout = reset_timeout
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if self.retry_after() == 0 else "open"
+
+    def retry_after(self) -> float:
+        """Seconds until the next call is allowed (0 if now)."""
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.opened_at + self.timeout - self.clock())
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go upstream now."""
+        with self._lock:
+            if self.opened_at is None:
+                return
+            wait = self.retry_after()
+            if wait > 0 or self._trial_in_flight:
+                raise CircuitOpenError(
+                    f"circuit open after {self.failures} failures; retry in {wait:.0f}s"
+                )
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.timeout = self.reset_timeout
+            self._trial_in_flight = False
 
-def fetch_swimcloud_rankings(max_rows_per_gender: int = 5):
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight:
+                self._trial_in_flight = False
+                self.timeout = min(self.timeout * 2, self.max_reset_timeout)
+                self.opened_at = self.clock()
+            elif self.opened_at is None and self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+
+
+# ---------------------------
+# Swimcloud Client
+# ---------------------------
+
+class SwimcloudClient:
+    """
+    Shared HTTP access to swimcloud.com.
+
+      - one requests.Session, so TCP/TLS connections are pooled and reused.
+      - transient errors (connection errors, 429, 5xx) are retried by
+        urllib3 with exponential backoff, honouring Retry-After. Read
+        timeouts are not retried: a slow upstream costs one timeout.
+      - conditional requests: the ETag / Last-Modified of the last good
+        page is sent back, and on 304 the previously parsed rankings are
+        reused without downloading or parsing anything.
+      - a circuit breaker fails fast while the upstream is down.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 4,
+        retries: int = 2,
+        backoff_factor: float = 0.5,
+        timeout=REQUEST_TIMEOUT,
+        breaker: CircuitBreaker | None = None,
+    ):
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+
+        retry = Retry(
+            total=retries,
+            read=0,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # (url, max_rows) -> (etag, last_modified, (men, women))
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def fetch_rankings(self, url: str, max_rows_per_gender: int = 5):
+        """(men_items, women_items) for `url`; raises requests.RequestException."""
+        self.breaker.before_call()
+
+        key = (url, max_rows_per_gender)
+        with self._lock:
+            cached = self._pages.get(key)
+
+        headers = {}
+        if cached:
+            etag, last_modified, _ = cached
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        try:
+            resp = self.session.get(url, headers=headers, timeout=self.timeout)
+            if cached and resp.status_code == 304:
+                result = cached[2]
+            else:
+                resp.raise_for_status()
+                result = parse_swimcloud_rankings(resp.text, max_rows_per_gender)
+                with self._lock:
+                    self._pages[key] = (
+                        resp.headers.get("ETag"),
+                        resp.headers.get("Last-Modified"),
+                        result,
+                    )
+        except Exception:
+            # Parse errors too: every failure must release a half-open trial
+            self.breaker.record_failure()
+            raise
+
+        self.breaker.record_success()
+        men_items, women_items = result
+        return list(men_items), list(women_items)
+
+
+def fetch_swimcloud_rankings(
+    max_rows_per_gender: int = 5,
+    url: str = SWIMCLOUD_REGION_URL,
+):
     """
     Top Swims صفحه‌ی کشور USA در Swimcloud را می‌خواند و دو لیست جداگانه
     برای مردان و زنان برمی‌گرداند.
@@ -25,22 +254,19 @@ def fetch_swimcloud_rankings(max_rows_per_gender: int = 5):
       last_updated_iso: رشته‌ی زمان (UTC, ISO 8601) برای نمایش در UI
     """
 
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (compatible; PoolClubBot/1.0; "
-            "+https://yourdomain.example)"
-        )
-    }
-
-    resp = requests.get(SWIMCLOUD_REGION_URL, headers=headers, timeout=10)
-    resp.raise_for_status()
+    men_items, women_items = swimcloud_client.fetch_rankings(url, max_rows_per_gender)
+    last_updated_iso = datetime.now(timezone.utc).isoformat()
+    return men_items, women_items, last_updated_iso
 
-    soup = BeautifulSoup(resp.text, "html.parser")
 
-    section = soup.select_one("section#js-region-top-swims-container")
+def parse_swimcloud_rankings(html: str, max_rows_per_gender: int = 5):
+    """
+    Top Swims را از HTML صفحه استخراج می‌کند.
+    خروجی: (men_items, women_items) — همان ساختار fetch_swimcloud_rankings
+    """
+    section = parse_top_swims_content(html)
     if not section:
-        now_iso = datetime.now(timezone.utc).isoformat()
-        return [], [], now_iso
+        return [], []
 
     men_items = []
     women_items = []
@@ -122,5 +348,7 @@ def fetch_swimcloud_rankings(max_rows_per_gender: int = 5):
                 # اگر به هر دلیلی gender ناشناخته بود، می‌توانی آن را نادیده بگیری
                 continue
 
-    last_updated_iso = datetime.now(timezone.utc).isoformat()
-    return men_items, women_items, last_updated_iso
+    return men_items, women_items
+
+
+swimcloud_client = SwimcloudClient()
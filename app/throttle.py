@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Sequence, Tuple
+
+
+# ---------------------------
+# Token Buckets
+# ---------------------------
+
+class TokenBuckets:
+    """
+    One token bucket per key (an email, an IP, ...).
+
+    A bucket holds up to `capacity` tokens and refills at `rate` tokens
+    per second; each attempt takes one. Buckets are created full and
+    kept in an LRU bounded by `max_keys`, so a flood of distinct keys
+    costs bounded memory (an evicted key simply starts full again).
+    """
+
+    def __init__(self, capacity: float, rate: float, max_keys: int = 100_000, clock=time.monotonic):
+        self.capacity = capacity
+        self.rate = rate
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # key -> (tokens, at)
+
+    def tokens(self, key: str, now: float) -> float:
+        entry = self._buckets.get(key)
+        if entry is None:
+            return self.capacity
+        tokens, at = entry
+        return min(self.capacity, tokens + (now - at) * self.rate)
+
+    def store(self, key: str, tokens: float, now: float):
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+    def retry_after(self, key: str, now: float) -> float:
+        """Seconds until `key` has a whole token again."""
+        return max(0.0, (1 - self.tokens(key, now)) / self.rate)
+
+
+class LoginThrottle:
+    """
+    Limits password checks per account and per client address.
+
+    An attempt needs a token from both buckets. A refused attempt takes
+    nothing, so hitting one limit doesn't also drain the other bucket.
+    """
+
+    def __init__(
+        self,
+        per_email: Tuple[float, float] = (5, 1 / 60),   # 5 attempts, then 1 per minute
+        per_ip: Tuple[float, float] = (20, 1 / 6),      # 20 attempts, then 10 per minute
+    ):
+        self.by_email = TokenBuckets(*per_email)
+        self.by_ip = TokenBuckets(*per_ip)
+        self._lock = threading.Lock()
+
+    def attempt(self, email: str, ip: str) -> float:
+        """
+        Take one token for (email, ip). Returns 0 if the attempt may go
+        ahead, otherwise the seconds to wait before trying again.
+        """
+        checks: Sequence[Tuple[TokenBuckets, str]] = (
+            (self.by_email, email.lower().strip()),
+            (self.by_ip, ip or "-"),
+        )
+        with self._lock:
+            now = self.by_email.clock()
+            levels = [(buckets, key, buckets.tokens(key, now)) for buckets, key in checks]
+            if any(tokens < 1 for _, _, tokens in levels):
+                return max(buckets.retry_after(key, now) for buckets, key, _ in levels)
+            for buckets, key, tokens in levels:
+                buckets.store(key, tokens - 1, now)
+            return 0.0
+
+    def reset(self):
+        with self._lock:
+            self.by_email._buckets.clear()
+            self.by_ip._buckets.clear()
+
+
+login_throttle = LoginThrottle()
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import datetime as dt
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+
+# ---------------------------
+# Wallet Transaction Model
+# ---------------------------
+
+@dataclass(slots=True)
+class WalletTransaction:
+    amount: int
+    type: str  # deposit, purchase, refund
+    timestamp: dt.datetime = field(default_factory=dt.datetime.utcnow)
+    description: str = ""
+
+
+class WalletEntry(NamedTuple):
+    """One row of a wallet page: a stored transaction and the balance after it."""
+    id: int  # 1-based position in the user's history; the pagination key
+    amount: int
+    type: str
+    timestamp: dt.datetime
+    description: str
+    balance: int
+
+
+_EPOCH = dt.datetime(1970, 1, 1)
+_MICROSECOND = dt.timedelta(microseconds=1)
+
+
+def _to_micros(when: dt.datetime) -> int:
+    return (when - _EPOCH) // _MICROSECOND
+
+
+def _from_micros(micros: int) -> dt.datetime:
+    return _EPOCH + dt.timedelta(microseconds=micros)
+
+
+# ---------------------------
+# Wallet History
+# ---------------------------
+
+class WalletHistory:
+    """
+    A user's wallet transactions, stored column-wise.
+
+    Instead of one dataclass per entry, the history keeps parallel arrays:
+    amount (int64), type code (uint8), timestamp (int64 microseconds, UTC)
+    and description index (uint32). Types and descriptions are interned
+    per user; most entries share a handful of texts ("شارژ کیف پول", ...).
+
+    Every CHECKPOINT_EVERY entries the running balance is recorded, so
+    balance_at() adds at most that many amounts instead of replaying the
+    whole history.
+
+    Entries are append-only and numbered from 1, so an entry id is a
+    stable keyset cursor: page(before=id) returns the entries older than
+    that id no matter how many were added since.
+
+    append() runs under the repository's lock. Readers don't lock: the
+    entry count is bumped only after every column has been written.
+    """
+
+    CHECKPOINT_EVERY = 128
+
+    def __init__(self, transactions: Iterable[WalletTransaction] = ()):
+        self.amounts = array("q")
+        self.type_codes = array("B")
+        self.timestamps = array("q")
+        self.description_ids = array("I")
+        self.type_names: List[str] = []
+        self.descriptions: List[str] = []
+        self._type_index: Dict[str, int] = {}
+        self._description_index: Dict[str, int] = {}
+        self.checkpoints = array("q", [0])  # balance after i * CHECKPOINT_EVERY entries
+        self.total = 0
+        self._count = 0
+        for tx in transactions:
+            self.append(tx)
+
+    # ---- Writing ----
+
+    @staticmethod
+    def _intern(value: str, names: List[str], index: Dict[str, int]) -> int:
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(names)
+            names.append(value)
+        return code
+
+    def append(self, tx: WalletTransaction):
+        self.amounts.append(tx.amount)
+        self.type_codes.append(self._intern(tx.type, self.type_names, self._type_index))
+        self.timestamps.append(_to_micros(tx.timestamp))
+        self.description_ids.append(
+            self._intern(tx.description, self.descriptions, self._description_index)
+        )
+        self.total += tx.amount
+        if (self._count + 1) % self.CHECKPOINT_EVERY == 0:
+            self.checkpoints.append(self.total)
+        self._count += 1
+
+    # ---- Reading ----
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> WalletTransaction:
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("wallet history index out of range")
+        return WalletTransaction(
+            amount=self.amounts[index],
+            type=self.type_names[self.type_codes[index]],
+            timestamp=_from_micros(self.timestamps[index]),
+            description=self.descriptions[self.description_ids[index]],
+        )
+
+    def __iter__(self) -> Iterator[WalletTransaction]:
+        for i in range(self._count):
+            yield self[i]
+
+    def balance_at(self, count: int) -> int:
+        """Balance after the first `count` entries."""
+        count = max(0, min(count, self._count))
+        k = count // self.CHECKPOINT_EVERY
+        return self.checkpoints[k] + sum(self.amounts[k * self.CHECKPOINT_EVERY:count])
+
+    def balance_as_of(self, when: dt.datetime) -> int:
+        """Balance including every entry made at or before `when` (UTC)."""
+        count = bisect_right(self.timestamps, _to_micros(when), 0, self._count)
+        return self.balance_at(count)
+
+    def between(self, start: dt.datetime, end: dt.datetime) -> range:
+        """Positions of the entries made in [start, end) (UTC)."""
+        return range(
+            bisect_left(self.timestamps, _to_micros(start), 0, self._count),
+            bisect_left(self.timestamps, _to_micros(end), 0, self._count),
+        )
+
+    def page(self, before: Optional[int] = None, limit: int = 20) -> Tuple[List[WalletEntry], Optional[int]]:
+        """
+        Up to `limit` entries older than id `before` (all entries if None),
+        newest first, each with its running balance.
+        Returns (entries, cursor for the next page or None).
+        """
+        end = self._count if before is None else max(0, min(before - 1, self._count))
+        start = max(0, end - limit)
+        balance = self.balance_at(end)
+
+        entries = []
+        for i in range(end - 1, start - 1, -1):
+            amount = self.amounts[i]
+            entries.append(WalletEntry(
+                id=i + 1,
+                amount=amount,
+                type=self.type_names[self.type_codes[i]],
+                timestamp=_from_micros(self.timestamps[i]),
+                description=self.descriptions[self.description_ids[i]],
+                balance=balance,
+            ))
+            balance -= amount
+        return entries, (start + 1 if start > 0 else None)
+
+    # ---- Pickling (journal snapshots) ----
+
+    def __getstate__(self):
+        return (
+            self.amounts[:self._count], self.type_codes[:self._count],
+            self.timestamps[:self._count], self.description_ids[:self._count],
+            self.type_names, self.descriptions, self.checkpoints, self.total,
+        )
+
+    def __setstate__(self, state):
+        (self.amounts, self.type_codes, self.timestamps, self.description_ids,
+         self.type_names, self.descriptions, self.checkpoints, self.total) = state
+        self._count = len(self.amounts)
+        self._type_index = {name: i for i, name in enumerate(self.type_names)}
+        self._description_index = {text: i for i, text in enumerate(self.descriptions)}
@@ -0,0 +1,113 @@
+"""
+Utilization heatmap over 1M synthetic bookings: NumPy vs a Python loop.
+
+    python -m bench.bench_analytics [--count 1000000]
+
+The bookings are generated as booking_rows() tuples (a year of 30-120
+minute sessions, about half of them on a lane) and served by a
+repository that returns them as-is, so the timings cover the analytics
+and not building 1M Booking objects. The Python loop is the per-booking
+way of getting the same numbers: walk each booking hour by hour and add
+its minutes to the weekday/hour cells and to its lane. Both results are
+compared.
+"""
+import argparse
+import datetime as dt
+import time
+
+import numpy as np
+
+from app import analytics
+from app.model import AVAILABLE_LANES, MINUTES_PER_DAY, BookingType, MemoryRepository, epoch_minutes, set_repository
+
+FIRST_DAY = dt.date(2030, 1, 1)
+DAYS = 365
+
+
+class RowsRepository(MemoryRepository):
+    def __init__(self, rows):
+        super().__init__()
+        self.rows = rows
+
+    def booking_rows(self, start, end):
+        return [row for row in self.rows if start <= row[0] < end]
+
+
+def synthetic_rows(count):
+    rnd = np.random.default_rng(15)
+    base = int(epoch_minutes(dt.datetime.combine(FIRST_DAY, dt.time())))
+    start = base + rnd.integers(0, DAYS, count) * MINUTES_PER_DAY + rnd.integers(6 * 4, 22 * 4, count) * 15
+    duration = rnd.choice([30, 60, 90, 120], count)
+    on_lane = rnd.integers(0, 2, count).astype(bool)
+    lane = np.where(on_lane, rnd.choice(AVAILABLE_LANES, count), 0)
+    types = (BookingType.FREE_SWIM.value, BookingType.LANE_TRAINING.value)
+    return [
+        (int(s), int(d), types[int(t)], int(l) or None)
+        for s, d, t, l in zip(start.tolist(), duration.tolist(), on_lane.tolist(), lane.tolist())
+    ]
+
+
+def python_loop(rows, start, end):
+    """Free-swim and busy-lane minutes per (weekday, hour), and per lane."""
+    pool = [[0] * 24 for _ in range(7)]
+    lanes = [[0] * 24 for _ in range(7)]
+    per_lane = dict.fromkeys(AVAILABLE_LANES, 0)
+    for b_start, duration, booking_type, lane in rows:
+        b_end = min(b_start + duration, end)
+        minute = max(b_start, start)
+        if lane:
+            per_lane[lane] += max(0, b_end - minute)
+        while minute < b_end:
+            hour = minute // 60
+            step = min((hour + 1) * 60, b_end) - minute
+            cell = (minute // MINUTES_PER_DAY + analytics._EPOCH_WEEKDAY) % 7, hour % 24
+            if booking_type == BookingType.FREE_SWIM.value:
+                pool[cell[0]][cell[1]] += step
+            if lane:
+                lanes[cell[0]][cell[1]] += step
+            minute += step
+    return pool, lanes, per_lane
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.count)
+    repo = RowsRepository(rows)
+    set_repository(repo)
+    date_to = FIRST_DAY + dt.timedelta(days=DAYS - 1)
+    start = int(epoch_minutes(dt.datetime.combine(FIRST_DAY, dt.time())))
+    end = start + DAYS * MINUTES_PER_DAY
+
+    fetched, fetch_time = timed(repo.booking_rows, start - MINUTES_PER_DAY, end)
+    cols, export_time = timed(analytics.export_bookings, fetched)
+    report, report_time = timed(analytics.utilization_report, FIRST_DAY, date_to)
+    (pool, lanes, per_lane), loop_time = timed(python_loop, rows, start, end)
+    set_repository(MemoryRepository())
+
+    swimmers = analytics.concurrency(cols, start, end, cols.type_code == analytics.TYPE_FREE_SWIM)
+    busy = analytics.concurrency(cols, start, end, cols.lane > 0)
+    assert np.array_equal(analytics.weekday_hour_totals(swimmers, start), pool), 'pool heatmap differs'
+    assert np.array_equal(analytics.weekday_hour_totals(busy, start), lanes), 'lane heatmap differs'
+    assert report['lane_utilization'] == {
+        lane: round(minutes / (end - start), 4) for lane, minutes in per_lane.items()
+    }, 'lane utilization differs'
+
+    print(f'{args.count:,} bookings over {DAYS} days')
+    print(f'  booking_rows() filter         {fetch_time:8.2f} s')
+    print(f'  export_bookings()             {export_time:8.2f} s')
+    print(f'  utilization_report() total    {report_time:8.2f} s   (includes the two above)')
+    print(f'  vectorized part               {report_time - fetch_time - export_time:8.2f} s')
+    print(f'  Python loop, same tables      {loop_time:8.2f} s')
+
+
+if __name__ == '__main__':
+    main()
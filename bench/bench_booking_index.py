@@ -0,0 +1,112 @@
+"""
+Booking create path vs the number of stored bookings.
+
+    python -m bench.bench_booking_index [--sizes 10000,50000,100000,200000]
+
+For each size a fresh MemoryRepository is filled with that many active
+bookings spread over a year, then the create path the booking route runs
+(user_has_overlap, count_pool_swimmers, assign_lane, create_booking) is
+timed on random slots. "linear scan" times the same three checks done the
+way they were before the per-day index: a strptime pass over every
+stored booking, repeated per lane.
+"""
+import argparse
+import datetime as dt
+import random
+import time
+
+from app import model
+from app.model import (
+    AVAILABLE_LANES,
+    Booking,
+    BookingStatus,
+    BookingType,
+    MemoryRepository,
+    assign_lane,
+    count_pool_swimmers,
+    create_booking,
+    parse_datetime,
+    set_repository,
+    user_has_overlap,
+)
+
+FIRST_DAY = dt.date(2030, 1, 1)
+USERS = 5000
+
+
+def random_slot(rnd):
+    day = FIRST_DAY + dt.timedelta(days=rnd.randrange(365))
+    time_ = f'{rnd.randint(6, 21):02d}:{rnd.choice(["00", "15", "30", "45"])}'
+    return day.isoformat(), time_, rnd.choice([30, 60, 90])
+
+
+def fill(repo, count, rnd):
+    for _ in range(count):
+        date, time_, duration = random_slot(rnd)
+        repo.add_booking(Booking(
+            id='', user_id=str(rnd.randrange(USERS)), date=date, time=time_,
+            duration=duration, type=BookingType.FREE_SWIM,
+        ))
+
+
+def create_path(user_id, date, time_, duration, booking_type):
+    if user_has_overlap(user_id, date, time_, duration):
+        return
+    if booking_type == BookingType.FREE_SWIM:
+        count_pool_swimmers(date, time_, duration)
+        lane = None
+    else:
+        lane = assign_lane(date, time_, duration, booking_type)
+    create_booking(user_id, date, time_, duration, booking_type, lane)
+
+
+def linear_scan_checks(bookings, user_id, date, time_, duration):
+    start = parse_datetime(date, time_)
+    end = start + dt.timedelta(minutes=duration)
+
+    def overlaps(b):
+        b_start = parse_datetime(b.date, b.time)
+        return b_start is not None and b_start < end and b_start + dt.timedelta(minutes=b.duration) > start
+
+    active = [b for b in bookings if b.status is BookingStatus.ACTIVE]
+    any(b.user_id == user_id and overlaps(b) for b in active)
+    sum(1 for b in active if b.type is BookingType.FREE_SWIM and overlaps(b))
+    for lane in AVAILABLE_LANES:
+        any(b.lane == lane and overlaps(b) for b in active)
+
+
+def per_op_us(ops, fn):
+    start = time.perf_counter()
+    for args in ops:
+        fn(*args)
+    return (time.perf_counter() - start) / len(ops) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='10000,50000,100000,200000')
+    parser.add_argument('--ops', type=int, default=2000)
+    parser.add_argument('--scan-ops', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f'{"bookings":>9}  {"indexed create path":>20}  {"linear scan checks":>20}')
+    for size in map(int, args.sizes.split(',')):
+        rnd = random.Random(size)
+        repo = MemoryRepository()
+        set_repository(repo)
+        fill(repo, size, rnd)
+
+        ops = [
+            (str(rnd.randrange(USERS)), *random_slot(rnd), rnd.choice(list(BookingType)))
+            for _ in range(args.ops)
+        ]
+        indexed = per_op_us(ops, create_path)
+
+        bookings = list(repo.bookings.values())
+        scan = per_op_us(ops[:args.scan_ops], lambda user_id, d, t, dur, _: linear_scan_checks(bookings, user_id, d, t, dur))
+        print(f'{size:9,}  {indexed:17.1f} us  {scan / 1000:17.1f} ms')
+    set_repository(model.MemoryRepository())
+
+
+if __name__ == '__main__':
+    main()
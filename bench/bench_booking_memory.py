@@ -0,0 +1,112 @@
+"""
+Memory and scan cost of 1M bookings: the old string-only dataclass vs
+Booking (slots, interned strings, enum codes, precomputed start minute).
+
+    python -m bench.bench_booking_memory [--count 1000000]
+
+Bookings are built from freshly formatted strings, as they come out of
+JSON or SQLite rows. Memory is what tracemalloc sees allocated for the
+list of bookings (strings included); "object" is the size of one
+booking instance itself. The scan counts the active bookings overlapping
+a one-hour window, the check behind overlap tests and lane counts.
+"""
+import argparse
+import datetime as dt
+import random
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Optional
+
+from app.model import Booking, BookingStatus, BookingType, booking_interval, parse_datetime
+
+TYPES = [t.value for t in BookingType]
+
+
+@dataclass
+class LegacyBooking:
+    """Booking as it was: plain strings, re-parsed on every check."""
+    id: str
+    user_id: str
+    date: str
+    time: str
+    duration: int
+    type: str
+    lane: Optional[int] = None
+    status: str = "active"
+
+
+def rows(count):
+    rnd = random.Random(6)
+    first = dt.date(2030, 1, 1)
+    for i in range(count):
+        day = first + dt.timedelta(days=rnd.randrange(365))
+        yield (
+            str(i), str(rnd.randrange(5000)), day.strftime('%Y-%m-%d'),
+            f'{rnd.randint(6, 21):02d}:{rnd.choice((0, 15, 30, 45)):02d}',
+            rnd.choice((30, 60, 90)), rnd.choice(TYPES),
+        )
+
+
+def build(cls, count):
+    tracemalloc.start()
+    bookings = [cls(*row) for row in rows(count)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return bookings, size
+
+
+def legacy_scan(bookings, window_start, window_end):
+    hits = 0
+    for b in bookings:
+        if b.status != "active":
+            continue
+        b_start = parse_datetime(b.date, b.time)
+        if b_start is not None and b_start < window_end and b_start + dt.timedelta(minutes=b.duration) > window_start:
+            hits += 1
+    return hits
+
+
+def scan(bookings, window_start, window_end):
+    hits = 0
+    for b in bookings:
+        if b.status is BookingStatus.ACTIVE and b.start is not None and b.start < window_end and b.start + b.duration > window_start:
+            hits += 1
+    return hits
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    window = dt.datetime(2030, 6, 1, 10, 0), dt.datetime(2030, 6, 1, 11, 0)
+    legacy, legacy_size = build(LegacyBooking, args.count)
+    legacy_object = sys.getsizeof(legacy[0]) + sys.getsizeof(legacy[0].__dict__)
+    legacy_hits, legacy_time = timed(legacy_scan, legacy, *window)
+    del legacy
+
+    minutes = [booking_interval(w.strftime('%Y-%m-%d'), w.strftime('%H:%M'), 0)[0] for w in window]
+    current, size = build(Booking, args.count)
+    current_object = sys.getsizeof(current[0])
+    hits, scan_time = timed(scan, current, *minutes)
+    assert hits == legacy_hits, (hits, legacy_hits)
+
+    print(f'{args.count:,} bookings')
+    print(f'{"":10} {"object":>8} {"bytes/booking":>14} {"overlap scan":>13}')
+    for label, shallow, nbytes, scanned in (
+        ('before', legacy_object, legacy_size, legacy_time),
+        ('after', current_object, size, scan_time),
+    ):
+        print(f'{label:10} {shallow:8} {nbytes / args.count:14.0f} {scanned:12.2f}s')
+
+
+if __name__ == '__main__':
+    main()
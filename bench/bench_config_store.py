@@ -0,0 +1,96 @@
+"""
+DATA_DIR JSON on the request path: json.load per request vs config_store.
+
+    python -m bench.bench_config_store [--seconds 3] [--loads 2000]
+
+Two measurements on the files in bench/data:
+
+  - loads: the eight files `/` reads (hours, pools, programmes, classes,
+    events, ratings, prices, site) parsed with json.load, against
+    config_store.get on the same paths.
+  - `/`: requests/s through the Flask test client. "json.load" swaps the
+    routes' config store for one that parses on every call, as load_json
+    did before the store. The fragment cache is bypassed in both runs, so
+    only the config loading differs.
+"""
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+from markupsafe import Markup
+
+from app import create_app, routes
+from app.config_store import config_store
+from app.fragments import fragment_cache
+from app.rankings_cache import rankings_cache
+
+DATA_DIR = Path(__file__).resolve().parent / 'data'
+FILES = ['hours.json', 'pools.json', 'programmes.json', 'classes.json',
+         'events.json', 'ratings.json', 'prices.json', 'site.json']
+
+
+class PerRequestLoad:
+    """load_json before the config store: open and parse on every call."""
+
+    def get(self, path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def version(self, path):
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+
+    def digest(self, path):
+        return None
+
+
+def per_load_us(store, loads):
+    paths = [DATA_DIR / name for name in FILES]
+    start = time.perf_counter()
+    for _ in range(loads):
+        for path in paths:
+            store.get(path)
+    return (time.perf_counter() - start) / loads * 1e6
+
+
+def rate(client, seconds):
+    client.get('/')
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        assert client.get('/').status_code == 200
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--loads', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f'8 files ({sum((DATA_DIR / n).stat().st_size for n in FILES) / 1024:.0f} KiB), per request:')
+    print(f'  json.load           {per_load_us(PerRequestLoad(), args.loads):8.1f} us')
+    print(f'  config_store.get    {per_load_us(config_store, args.loads):8.1f} us')
+
+    app = create_app({'TESTING': True, 'RANKINGS_BACKGROUND_REFRESH': False, 'DATA_DIR': str(DATA_DIR)})
+    rows = [{'rank': i, 'name': f'Swimmer {i}', 'club': 'Club', 'event': '100 Free', 'time': '48.1'}
+            for i in range(1, 51)]
+    rankings_cache.fetcher = lambda url: (rows, rows, '2026-10-16T10:00')
+    rankings_cache.refresh()
+    fragment_cache.render = lambda name, key, caller: Markup(caller())
+    client = app.test_client()
+
+    routes.config_store = PerRequestLoad()
+    before = rate(client, args.seconds)
+    routes.config_store = config_store
+    after = rate(client, args.seconds)
+    print('`/` (fragment cache off):')
+    print(f'  json.load           {before:8.0f} req/s')
+    print(f'  config_store.get    {after:8.0f} req/s')
+
+
+if __name__ == '__main__':
+    main()
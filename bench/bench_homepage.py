@@ -0,0 +1,66 @@
+"""
+Requests/s for `/` with and without the fragment cache.
+
+    python -m bench.bench_homepage [--seconds 3]
+
+The homepage renders the JSON files in bench/data (12 classes, 12
+events, ...) and 50 + 50 rankings rows from a stub fetcher. "uncached"
+replaces fragment_cache.render with a pass-through, which is how `/`
+rendered before the cache: every section on every hit. Both variants
+must produce the same HTML.
+"""
+import argparse
+import time
+from pathlib import Path
+
+from markupsafe import Markup
+
+from app import create_app
+from app.fragments import fragment_cache
+from app.rankings_cache import rankings_cache
+
+DATA_DIR = Path(__file__).resolve().parent / 'data'
+ROWS = [
+    {'rank': i, 'name': f'Swimmer {i}', 'club': 'Club', 'event': '100 Free', 'time': '48.1', 'score': 900 - i}
+    for i in range(1, 51)
+]
+
+
+def rate(client, seconds):
+    body = client.get('/').data
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        response = client.get('/')
+        assert response.status_code == 200 and response.data == body
+        count += 1
+    return count / (time.perf_counter() - start), body
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seconds', type=float, default=3.0)
+    args = parser.parse_args()
+
+    app = create_app({'TESTING': True, 'RANKINGS_BACKGROUND_REFRESH': False, 'DATA_DIR': str(DATA_DIR)})
+    rankings_cache.fetcher = lambda url: (ROWS, ROWS, '2026-10-16T10:00')
+    rankings_cache.refresh()
+
+    anonymous = app.test_client()
+    logged_in = app.test_client()
+    logged_in.post('/auth/login', data={'email': 'test', 'password': '123456'})
+    logged_in.get('/')  # shows and drops the login flash message
+
+    cached_render = fragment_cache.render
+    print(f'{"":12} {"uncached":>10} {"cached":>10}')
+    for label, client in (('anonymous', anonymous), ('logged-in', logged_in)):
+        fragment_cache.render = lambda name, key, caller: Markup(caller())
+        uncached, uncached_body = rate(client, args.seconds)
+        fragment_cache.render = cached_render
+        cached, cached_body = rate(client, args.seconds)
+        assert cached_body == uncached_body, f'{label}: cached page differs'
+        print(f'{label:12} {uncached:8.0f}/s {cached:8.0f}/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Journal recovery: startup time of JournaledRepository with N journaled
+records, replaying the whole journal vs loading a snapshot plus a tail.
+
+    python -m bench.bench_journal_recovery [--records 1000000] [--tail 10000]
+
+Records are a mix of users, wallet deposits and bookings, written with
+fsync off (the write path is not what is measured here).
+"""
+import argparse
+import datetime as dt
+import os
+import shutil
+import tempfile
+import time
+
+from app import model
+from app.journal import JournaledRepository
+from app.model import User, create_booking, set_repository
+from app.rollups import compute_rollups
+
+USERS = 2000
+BOOKING_EVERY = 4  # every 4th record after the users is a booking
+FIRST_DAY = dt.date(2027, 1, 1)
+
+
+def write_records(repo, count, start=0):
+    """Append `count` records; returns the users they were written for."""
+    users = list(repo.users_by_id.values())
+    for i in range(start, start + count):
+        if len(users) < USERS:
+            users.append(repo.add_user(User(
+                id='', email=f'bench{i}@example.com', password_hash='x',
+                first_name='شناگر', last_name=str(i),
+            )))
+            continue
+        user = users[i % USERS]
+        if i % BOOKING_EVERY:
+            user.deposit(1000)
+        else:
+            day = FIRST_DAY + dt.timedelta(days=(i // USERS) % 365)
+            create_booking(user.id, day.isoformat(), f'{6 + i % 14}:00', 60, 'شنای آزاد', None)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--records', type=int, default=1_000_000)
+    parser.add_argument('--tail', type=int, default=10_000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='journal-bench-')
+    try:
+        repo = JournaledRepository(directory, fsync=False)
+        set_repository(repo)
+        seconds, _ = timed(lambda: write_records(repo, args.records))
+        records = repo.journal.last_lsn
+        repo.close()
+        print(f'{records:,} records written in {seconds:.1f} s, '
+              f'journal {directory_size(directory) / 2**20:.0f} MB')
+
+        seconds, repo = timed(lambda: JournaledRepository(directory, fsync=False))
+        print(f'startup, full replay        {seconds:6.2f} s')
+
+        set_repository(repo)
+        seconds, _ = timed(repo.snapshot)
+        snapshot_mb = os.path.getsize(os.path.join(directory, repo.SNAPSHOT_NAME)) / 2**20
+        print(f'snapshot write              {seconds:6.2f} s  ({snapshot_mb:.0f} MB)')
+        write_records(repo, args.tail, start=args.records)
+        repo.close()
+
+        seconds, repo = timed(lambda: JournaledRepository(directory, fsync=False))
+        print(f'startup, snapshot + {args.tail:,} tail {seconds:6.2f} s')
+        seconds, _ = timed(lambda: compute_rollups(repo))
+        print(f'  of which rollup rebuild   {seconds:6.2f} s')
+        repo.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Lane placement: first-fit vs best-fit acceptance, and assign_lane latency.
+
+    python -m bench.bench_lane_allocator [--days 200] [--seeds 3] [--bookings 20000]
+
+Simulation: for each day, requests of 30-120 minutes starting on a
+quarter hour between 06:00 and 22:00 arrive one by one and are placed
+with LaneAllocator.first_fit or .best_fit on a fresh allocator, at
+several loads. Reported: share of requests that got a lane, share of
+lane time booked, and the allocator call latency.
+
+Latency: assign_lane (allocator bitsets, best fit) against the old
+first-fit that scanned every stored booking per lane, with `--bookings`
+lane bookings stored.
+"""
+import argparse
+import datetime as dt
+import random
+import time
+
+from app import model
+from app.lanes import LaneAllocator
+from app.model import AVAILABLE_LANES, BookingStatus, BookingType, MemoryRepository, parse_datetime, set_repository
+
+OPEN, CLOSE = 6 * 60, 22 * 60
+DURATIONS = (30, 45, 60, 90, 120)
+
+
+def simulate(policy, seed, days, per_day):
+    rnd = random.Random(seed)
+    accepted = booked = 0
+    elapsed = 0.0
+    for day in range(days):
+        allocator = LaneAllocator(AVAILABLE_LANES)
+        base = day * model.MINUTES_PER_DAY
+        for _ in range(per_day):
+            duration = rnd.choice(DURATIONS)
+            start = base + OPEN + rnd.randrange((CLOSE - OPEN - duration) // 15 + 1) * 15
+            t0 = time.perf_counter()
+            lane = getattr(allocator, policy)(start, start + duration)
+            elapsed += time.perf_counter() - t0
+            if lane is not None:
+                allocator.occupy(lane, start, start + duration)
+                accepted += 1
+                booked += duration
+    requests = days * per_day
+    capacity = days * len(AVAILABLE_LANES) * (CLOSE - OPEN)
+    return accepted / requests, booked / capacity, elapsed / requests * 1e6
+
+
+def legacy_first_fit(bookings, date, time_, duration):
+    """assign_lane before the allocator: a pass over all bookings per lane."""
+    new_start = parse_datetime(date, time_)
+    new_end = new_start + dt.timedelta(minutes=duration)
+    for lane in AVAILABLE_LANES:
+        for b in bookings:
+            if b.status is not BookingStatus.ACTIVE or b.lane != lane:
+                continue
+            existing_start = parse_datetime(b.date, b.time)
+            if new_start < existing_start + dt.timedelta(minutes=b.duration) and existing_start < new_end:
+                break
+        else:
+            return lane
+    return None
+
+
+def random_request(rnd):
+    day = dt.date(2031, 1, 1) + dt.timedelta(days=rnd.randrange(365))
+    return day.isoformat(), f'{rnd.randint(6, 20):02d}:{rnd.choice(("00", "15", "30", "45"))}', rnd.choice((30, 60, 90))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--days', type=int, default=200)
+    parser.add_argument('--seeds', type=int, default=3)
+    parser.add_argument('--bookings', type=int, default=20_000)
+    args = parser.parse_args()
+
+    print(f'{len(AVAILABLE_LANES)} lanes, {args.days} days x {args.seeds} seeds')
+    print(f'{"requests/day":>12}  {"policy":9} {"accepted":>9} {"lane time":>10} {"latency":>9}')
+    for per_day in (30, 60, 90, 120):
+        for policy in ('first_fit', 'best_fit'):
+            runs = [simulate(policy, seed, args.days, per_day) for seed in range(args.seeds)]
+            accepted, used, latency = (sum(run[i] for run in runs) / len(runs) for i in range(3))
+            print(f'{per_day:12}  {policy:9} {accepted:9.2%} {used:10.2%} {latency:7.1f}us')
+
+    repo = MemoryRepository()
+    set_repository(repo)
+    rnd = random.Random(14)
+    while len(repo.bookings) < args.bookings:
+        date, time_, duration = random_request(rnd)
+        lane = model.assign_lane(date, time_, duration, BookingType.LANE_TRAINING)
+        if lane is not None:
+            model.create_booking('1', date, time_, duration, BookingType.LANE_TRAINING, lane)
+    queries = [random_request(rnd) for _ in range(2000)]
+
+    start = time.perf_counter()
+    for date, time_, duration in queries:
+        model.assign_lane(date, time_, duration, BookingType.LANE_TRAINING)
+    current = (time.perf_counter() - start) / len(queries)
+
+    bookings = list(repo.bookings.values())
+    sample = queries[:20]
+    start = time.perf_counter()
+    for date, time_, duration in sample:
+        legacy_first_fit(bookings, date, time_, duration)
+    legacy = (time.perf_counter() - start) / len(sample)
+    set_repository(MemoryRepository())
+
+    print(f'\nassign_lane with {len(bookings):,} lane bookings stored:')
+    print(f'  allocator best-fit      {current * 1e6:10.1f} us')
+    print(f'  scanning first-fit      {legacy * 1e6:10.1f} us')
+
+
+if __name__ == '__main__':
+    main()
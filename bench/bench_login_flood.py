@@ -0,0 +1,103 @@
+"""
+Latency of `/` while 16 clients flood /auth/login with wrong passwords.
+
+    python -m bench.bench_login_flood [--mode inline|pool|pool+throttle] [--requests 150]
+
+Runs the app on a threaded werkzeug server on localhost and reports the
+p50/p95 of `/` when idle and during the flood, with the status codes the
+flood got back. Without --mode each mode runs in its own process:
+
+  - inline: hashing on the request thread (the app as run by tests)
+  - pool: hashing in the process pool, the throttle out of the way
+  - pool+throttle: the default setup
+"""
+import argparse
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+import requests
+from werkzeug.serving import make_server
+
+MODES = ('inline', 'pool', 'pool+throttle')
+DATA_DIR = Path(__file__).resolve().parent / 'data'
+
+
+def latencies(base, count):
+    session = requests.Session()
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        session.get(base + '/')
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95)]
+
+
+def run(mode, count):
+    from app import create_app
+    from app.hashing import password_hasher
+    from app.throttle import login_throttle
+
+    if mode != 'pool+throttle':
+        login_throttle.__init__(per_email=(1e9, 1e9), per_ip=(1e9, 1e9))
+    app = create_app({
+        'TESTING': mode == 'inline',
+        'RANKINGS_BACKGROUND_REFRESH': False,
+        'DATA_DIR': str(DATA_DIR),
+    })
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # no per-request access log
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    stop = threading.Event()
+    codes = Counter()
+
+    def flood():
+        session = requests.Session()
+        while not stop.is_set():
+            response = session.post(base + '/auth/login', data={'email': 'test', 'password': 'wrong'},
+                                    allow_redirects=False)
+            codes[response.status_code] += 1
+
+    latencies(base, 20)
+    idle = latencies(base, count)
+    flooders = [threading.Thread(target=flood) for _ in range(16)]
+    for thread in flooders:
+        thread.start()
+    time.sleep(1)
+    flooded = latencies(base, count)
+    stop.set()
+    for thread in flooders:
+        thread.join()
+
+    print(f'{mode:14} idle {idle[0]:7.1f} / {idle[1]:7.1f} ms   flood {flooded[0]:7.1f} / {flooded[1]:7.1f} ms'
+          f'   login codes {dict(sorted(codes.items()))}', flush=True)
+    server.shutdown()
+    password_hasher.shutdown()
+    os._exit(0)  # flood sessions and pool workers: don't wait for them
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mode', choices=MODES)
+    parser.add_argument('--requests', type=int, default=150)
+    args = parser.parse_args()
+
+    if args.mode:
+        run(args.mode, args.requests)
+    print('`/` latency p50 / p95')
+    for mode in MODES:
+        subprocess.run([sys.executable, '-m', 'bench.bench_login_flood', '--mode', mode,
+                        '--requests', str(args.requests)], check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Rankings on the request path: fetching Swimcloud per request vs reading
+the background-refreshed cache, with a slow and then a failing upstream.
+
+    python -m bench.bench_rankings_cache [--delay 0.5] [--requests 2000]
+
+Swimcloud is a local http.server serving the saved fixture page after
+`--delay` seconds. The cache refresher runs with a 1 s TTL, so it is
+fetching (or failing) in the background during the measurement.
+"""
+import argparse
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from app import create_app
+from app.rankings_cache import rankings_cache
+from app.swimcloud_scraper import CircuitBreaker, SwimcloudClient, fetch_swimcloud_rankings
+import app.swimcloud_scraper as scraper
+
+PAGE = (Path(__file__).resolve().parent.parent / 'tests' / 'fixtures' / 'swimcloud_home.html').read_bytes()
+
+
+class SlowSwimcloud(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    delay = 0.5
+    down = False
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        status, body = (503, b'') if self.down else (200, PAGE)
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def latencies(fn, count):
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+        assert response is None or response.status_code == 200, response.status_code
+    return samples
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f'{label:38} p50 {statistics.median(samples):8.2f} ms   p99 {p99:8.2f} ms   ({len(samples)} requests)')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--delay', type=float, default=0.5, help='upstream response time (s)')
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    SlowSwimcloud.delay = args.delay
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SlowSwimcloud)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/'
+
+    # Before: every homepage hit fetched and parsed the page itself
+    # (no retries, breaker or conditional requests, like the original bare GET)
+    scraper.swimcloud_client = SwimcloudClient(retries=0, breaker=CircuitBreaker(failure_threshold=10**9))
+
+    def fetch():
+        scraper.swimcloud_client._pages.clear()
+        try:
+            fetch_swimcloud_rankings(url=url)
+        except Exception:
+            pass  # the homepage rendered without rankings
+
+    report('per-request fetch, slow upstream', latencies(fetch, 10))
+    SlowSwimcloud.down = True
+    report('per-request fetch, upstream down', latencies(fetch, 10))
+    SlowSwimcloud.down = False
+
+    # After: requests only read the snapshot the refresher keeps up to date
+    scraper.swimcloud_client = SwimcloudClient()
+
+    rankings_cache.url = url
+    rankings_cache.refresh()
+    app = create_app({'TESTING': True, 'RANKINGS_TTL': 1, 'RANKINGS_RETRY_INTERVAL': 1})
+    client = app.test_client()
+    try:
+        report('cached, slow upstream', latencies(lambda: client.get('/api/live-rankings'), args.requests))
+        SlowSwimcloud.down = True
+        time.sleep(2)
+        report('cached, upstream down', latencies(lambda: client.get('/api/live-rankings'), args.requests))
+        payload = client.get('/api/live-rankings').json
+        print(f"while down: healthy={payload['healthy']} stale={payload['stale']} rows={len(payload['items'])}")
+    finally:
+        rankings_cache.stop()
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
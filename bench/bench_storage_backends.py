@@ -0,0 +1,109 @@
+"""
+MemoryRepository vs SqliteRepository on the booking and dashboard paths.
+
+    python -m bench.bench_storage_backends [--preload 50000] [--ops 2000] [--users 200]
+
+Both backends get the same preloaded bookings (spread over a year), then
+replay the same booking requests for the next month: overlap check,
+swimmer count, lane assignment, create_booking, and a cancellation for
+one request in five. The dashboard path is what the dashboard route
+reads per user: the user, their next reservation and their booking list.
+Results of both backends are compared, so a difference in behaviour
+fails the run.
+"""
+import argparse
+import datetime as dt
+import os
+import random
+import tempfile
+import time
+
+from app import model
+from app.model import Booking, BookingType, MemoryRepository, User, set_repository
+from app.sqlite_repository import SqliteRepository
+
+
+def slot(rnd, today, days=30):
+    day = today + dt.timedelta(days=rnd.randint(0, days))
+    return day.isoformat(), f'{rnd.randint(6, 21):02d}:{rnd.choice((0, 15, 30, 45)):02d}', rnd.choice((60, 90, 120))
+
+
+def booking_path(ops, seed):
+    rnd = random.Random(seed)
+    out = []
+    for user_id, date, time_, duration, booking_type in ops:
+        overlap = model.user_has_overlap(user_id, date, time_, duration)
+        swimmers = model.count_pool_swimmers(date, time_, duration)
+        lane = model.assign_lane(date, time_, duration, booking_type)
+        out.append((overlap, swimmers, lane))
+        if not overlap:
+            booking = model.create_booking(user_id, date, time_, duration, booking_type, lane)
+            if rnd.random() < 0.2:
+                model.cancel_booking(booking.id)
+    return out
+
+
+def dashboard_path(user_ids):
+    out = []
+    for user_id in user_ids:
+        user = model.get_user_by_id(user_id)
+        upcoming = model.get_next_reservation(user_id)
+        bookings = model.get_user_bookings(user_id)
+        out.append((user.email, upcoming.id if upcoming else None, [(b.id, str(b.status)) for b in bookings]))
+    return out
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--preload', type=int, default=50_000)
+    parser.add_argument('--ops', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=200)
+    args = parser.parse_args()
+
+    today = dt.date.today() + dt.timedelta(days=1)
+    rnd = random.Random(8)
+    preload = [
+        (str(rnd.randint(1, args.users)), *slot(rnd, today, 365), BookingType.FREE_SWIM)
+        for _ in range(args.preload)
+    ]
+    ops = [
+        (str(rnd.randint(1, args.users)), *slot(rnd, today), rnd.choice((BookingType.FREE_SWIM, BookingType.LANE_TRAINING)))
+        for _ in range(args.ops)
+    ]
+
+    tmp = tempfile.mkdtemp()
+    backends = (
+        ('memory', MemoryRepository()),
+        ('sqlite', SqliteRepository(os.path.join(tmp, 'bench.sqlite3'))),
+    )
+    results = {}
+    print(f'{args.preload:,} preloaded bookings, {args.users} users')
+    print(f'{"":8} {"booking path":>16} {"dashboard path":>18}')
+    for name, repo in backends:
+        set_repository(repo)
+        users = [
+            repo.add_user(User(id='', email=f'user{i}@example.com', password_hash='x')).id
+            for i in range(1, args.users + 1)
+        ]
+        with repo.transaction():
+            for user_id, date, time_, duration, booking_type in preload:
+                repo.add_booking(Booking(id='', user_id=user_id, date=date, time=time_,
+                                         duration=duration, type=booking_type))
+
+        booked, booking_time = timed(booking_path, ops, 5)
+        shown, dashboard_time = timed(dashboard_path, users)
+        results[name] = booked, shown
+        print(f'{name:8} {booking_time / len(ops) * 1e6:13.0f} us {dashboard_time / len(users) * 1e3:15.2f} ms'
+              f'   (per request / per user)')
+    set_repository(MemoryRepository())
+    assert results['memory'] == results['sqlite'], 'backends disagree'
+
+
+if __name__ == '__main__':
+    main()
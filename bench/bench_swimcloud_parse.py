@@ -0,0 +1,53 @@
+"""
+Swimcloud parse: strained Top Swims parse vs a full html.parser tree.
+
+    python -m bench.bench_swimcloud_parse [--runs 20]
+"""
+import argparse
+import time
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from app import swimcloud_scraper
+from app.swimcloud_scraper import TOP_SWIMS_SECTION_ID, parse_swimcloud_rankings
+
+FIXTURE = Path(__file__).resolve().parent.parent / 'tests' / 'fixtures' / 'swimcloud_home.html'
+
+
+def full_soup(html):
+    return BeautifulSoup(html, 'html.parser').select_one('section#' + TOP_SWIMS_SECTION_ID)
+
+
+def timed(runs, fn):
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    html = FIXTURE.read_text(encoding='utf-8')
+    print(f'page: {len(html) / 1024:.0f} KB, best of {args.runs}')
+
+    strained_s, strained = timed(args.runs, lambda: parse_swimcloud_rankings(html))
+    scoped = swimcloud_scraper.parse_top_swims_content
+    swimcloud_scraper.parse_top_swims_content = full_soup
+    try:
+        full_s, full = timed(args.runs, lambda: parse_swimcloud_rankings(html))
+    finally:
+        swimcloud_scraper.parse_top_swims_content = scoped
+
+    print(f'full tree   {full_s * 1000:8.1f} ms')
+    print(f'strained    {strained_s * 1000:8.1f} ms   ({full_s / strained_s:.0f}x)')
+    print('identical  ', strained == full)
+
+
+if __name__ == '__main__':
+    main()
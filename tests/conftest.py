@@ -0,0 +1,33 @@
+import pytest
+
+from app import create_app
+from app.model import MemoryRepository, get_repository, set_repository
+from app.sqlite_repository import SqliteRepository
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'RANKINGS_BACKGROUND_REFRESH': False,
+        'ASSETS_BUILD_DIR': str(tmp_path / 'assets'),
+    })
+    yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def repo(request, tmp_path):
+    """A fresh repository (with the seeded dev user) for each backend."""
+    previous = get_repository()
+    if request.param == 'sqlite':
+        repo = SqliteRepository(str(tmp_path / 'test.sqlite3'))
+    else:
+        repo = MemoryRepository()
+    set_repository(repo)
+    yield repo
+    set_repository(previous)
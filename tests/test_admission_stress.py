@@ -0,0 +1,96 @@
+import random
+import sys
+import threading
+from collections import Counter
+
+import pytest
+
+from app import model
+from app.admission import booking_admission
+from app.model import POOL_MAX_CAPACITY, BookingStatus, BookingType, User
+
+USERS = 150
+DEPOSIT = 500
+PRICE = 100  # so each user can afford at most 5 bookings
+THREADS = 40
+ATTEMPTS_PER_THREAD = 60
+SLOTS = [('2030-01-01', t) for t in ('09:00', '09:30', '10:00', '10:30')] + [('2030-01-02', '09:00')]
+
+
+@pytest.fixture
+def fast_switching():
+    # Switch threads as often as possible to surface check-then-act races
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+@pytest.fixture
+def members(repo):
+    users = []
+    for i in range(USERS):
+        user = repo.add_user(User(id='', email=f'member{i}@example.com', password_hash='x'))
+        user.deposit(DEPOSIT)
+        users.append(user)
+    return users
+
+
+def book_concurrently(users):
+    codes = Counter()
+    lock = threading.Lock()
+
+    def work(seed):
+        rnd = random.Random(seed)
+        for _ in range(ATTEMPTS_PER_THREAD):
+            user = rnd.choice(users)
+            date, time = rnd.choice(SLOTS)
+            booking_type = rnd.choice([BookingType.FREE_SWIM.value, BookingType.LANE_TRAINING.value])
+            _, _, code = booking_admission.admit(
+                user.id, date, time, rnd.choice([30, 60, 90]), booking_type, PRICE, 'رزرو'
+            )
+            with lock:
+                codes[code] += 1
+
+    threads = [threading.Thread(target=work, args=(seed,)) for seed in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return codes
+
+
+def test_parallel_admissions_keep_invariants(repo, members, fast_switching):
+    codes = book_concurrently(members)
+
+    assert sum(codes.values()) == THREADS * ATTEMPTS_PER_THREAD
+    assert codes[201] > 0 and codes[409] > 0  # the slots actually filled up
+    assert set(codes) <= {201, 402, 409}
+
+    bookings = [
+        b for user in members for b in repo.user_bookings(user.id)
+        if b.status is BookingStatus.ACTIVE
+    ]
+    assert len(bookings) == codes[201]
+
+    for minute in range(min(b.start for b in bookings), max(b.end for b in bookings)):
+        current = [b for b in bookings if b.start <= minute < b.end]
+        # pool capacity never exceeded
+        assert sum(b.type is BookingType.FREE_SWIM for b in current) <= POOL_MAX_CAPACITY
+        # a lane holds one booking at a time, and every lane booking has one
+        lanes = [b.lane for b in current if b.type is BookingType.LANE_TRAINING]
+        assert None not in lanes
+        assert len(lanes) == len(set(lanes))
+        # nobody is in two places at once
+        users = [b.user_id for b in current]
+        assert len(users) == len(set(users))
+
+    # money is conserved: every booking charged exactly once, nothing lost
+    total = 0
+    for user in members:
+        fresh = model.get_user_by_id(user.id)
+        booked = len(repo.user_bookings(user.id))
+        assert fresh.wallet_balance == DEPOSIT - PRICE * booked >= 0
+        assert sum(tx.amount for tx in fresh.wallet_transactions) == fresh.wallet_balance
+        total += fresh.wallet_balance
+    assert total == USERS * DEPOSIT - PRICE * len(bookings)
@@ -0,0 +1,40 @@
+import gzip
+import hashlib
+
+import pytest
+
+from app.assets import AssetManifest
+
+
+@pytest.fixture
+def manifest(app, tmp_path):
+    static = tmp_path / 'static'
+    (static / 'js').mkdir(parents=True)
+    (static / 'js' / 'app.js').write_text('console.log("v1");\n' * 200)
+    manifest = AssetManifest(static, tmp_path / 'build')
+    manifest.build()
+    app.extensions['asset_manifest'] = manifest
+    return manifest
+
+
+def test_hashed_url_serves_the_hashed_bytes(client, manifest):
+    asset = manifest.get('js/app.js')
+    original = asset.path.read_bytes()
+
+    # edited after startup (deploy in place, ...): the immutable URL
+    # keeps serving what its digest names
+    asset.path.write_text('console.log("v2");\n')
+
+    response = client.get(f'/assets/{asset.hashed}')
+    assert response.status_code == 200
+    assert response.data == original
+    assert hashlib.sha256(response.data).hexdigest()[:12] == asset.digest
+    assert 'immutable' in response.headers['Cache-Control']
+
+    response = client.get(f'/assets/{asset.hashed}', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == original
+
+
+def test_unknown_hash(client, manifest):
+    assert client.get('/assets/js/app.000000000000.js').status_code == 404
@@ -0,0 +1,53 @@
+import datetime as dt
+import threading
+
+from app import model
+from app.model import BookingType, create_booking, day_availability, invalidate_availability
+
+DAY = (dt.date.today() + dt.timedelta(days=3)).isoformat()
+
+
+def free_at(result, time):
+    return next(s['free_swim_remaining'] for s in result['slots'] if s['time'] == time)
+
+
+def test_write_during_sweep_is_not_cached_over(repo, monkeypatch):
+    invalidate_availability()
+    query = repo.overlapping_bookings
+    raced = []
+
+    def racing_query(start, end):
+        rows = list(query(start, end))  # the sweep's (soon outdated) view
+        if not raced:
+            raced.append(create_booking('1', DAY, '10:00', 60, BookingType.FREE_SWIM))
+        return rows
+
+    monkeypatch.setattr(repo, 'overlapping_bookings', racing_query)
+    stale = day_availability(DAY)
+    monkeypatch.setattr(repo, 'overlapping_bookings', query)
+
+    fresh = day_availability(DAY)
+    assert free_at(fresh, '10:00') == free_at(stale, '10:00') - 1
+
+
+def test_concurrent_reads_and_writes_end_consistent(repo):
+    invalidate_availability()
+    stop = threading.Event()
+
+    def read():
+        while not stop.is_set():
+            day_availability(DAY)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    for i in range(60):
+        create_booking(str(i), DAY, '10:00', 60, BookingType.FREE_SWIM)
+    stop.set()
+    for thread in readers:
+        thread.join()
+
+    cached = day_availability(DAY)
+    invalidate_availability()
+    assert cached == day_availability(DAY)
+    assert free_at(cached, '10:00') == max(model.POOL_MAX_CAPACITY - 60, 0)
@@ -0,0 +1,80 @@
+import json
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from app.config_store import ConfigStore, config_store, thaw
+
+BENCH_DATA = Path(__file__).resolve().parent.parent / 'bench' / 'data'
+
+
+def write(path, value, mtime_ns):
+    path.write_text(json.dumps(value, ensure_ascii=False), encoding='utf-8')
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_reloads_on_mtime_or_size_change(tmp_path):
+    store = ConfigStore()
+    path = tmp_path / 'pools.json'
+    write(path, {'name': 'a'}, 1_000_000_000)
+
+    first = store.get(path)
+    assert store.get(path) is first  # unchanged: the cached object
+
+    write(path, {'name': 'b'}, 1_000_000_000)  # same size and mtime: not noticed
+    assert store.get(path) is first
+    os.utime(path, ns=(2_000_000_000, 2_000_000_000))
+    assert store.get(path) == {'name': 'b'}
+
+    write(path, {'name': 'cc'}, 2_000_000_000)  # same mtime, new size
+    assert store.get(path) == {'name': 'cc'}
+    assert store.version(path) == (2_000_000_000, path.stat().st_size)
+
+
+def test_values_are_read_only(tmp_path):
+    store = ConfigStore()
+    path = tmp_path / 'events.json'
+    write(path, [{'slug': 'e0', 'tags': ['a'], 'price': {'amount': 1}}], 1_000_000_000)
+
+    events = store.get(path)
+    event = events[0]
+    with pytest.raises(TypeError):
+        event['slug'] = 'x'
+    with pytest.raises(TypeError):
+        event.update(slug='x')
+    with pytest.raises(TypeError):
+        event.pop('slug')
+    with pytest.raises(TypeError):
+        event['price']['amount'] = 2
+    with pytest.raises(AttributeError):
+        event['tags'].append('b')
+    with pytest.raises(TypeError):
+        events[0] = {}
+
+    copy = thaw(events)
+    copy[0]['slug'] = 'x'
+    copy[0]['tags'].append('b')
+    assert store.get(path)[0]['slug'] == 'e0'
+    assert store.get(path)[0]['tags'] == ('a',)
+
+
+def test_etag_follows_file_content(app, client, tmp_path):
+    data_dir = tmp_path / 'data'
+    shutil.copytree(BENCH_DATA, data_dir)
+    app.config['DATA_DIR'] = str(data_dir)
+    config_store.invalidate()
+
+    first = client.get('/api/pools')
+    assert first.status_code == 200 and first.headers['ETag']
+    assert client.get('/api/pools', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    pools = json.loads((data_dir / 'pools.json').read_text(encoding='utf-8'))
+    pools['pools'].append({'slug': 'new', 'name': 'استخر تازه'})
+    write(data_dir / 'pools.json', pools, (data_dir / 'pools.json').stat().st_mtime_ns + 10**9)
+
+    second = client.get('/api/pools', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert second.json['pools'][-1]['name'] == 'استخر تازه'
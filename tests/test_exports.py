@@ -0,0 +1,63 @@
+import csv
+import datetime as dt
+import io
+import tracemalloc
+
+import pytest
+
+from app.exports import csv_chunks
+from app.model import MemoryRepository, WalletTransaction, get_repository, get_user_by_email, set_repository
+
+TOKEN = 'secret-token'
+
+
+def read_csv(chunks):
+    text = ''.join(chunks)
+    assert text.startswith('﻿')
+    return list(csv.reader(io.StringIO(text[1:])))
+
+
+def test_csv_escapes_formula_cells():
+    rows = [('=HYPERLINK("x")', -500), ('+98 912', '@SUM(A1)'), ('-', ''), ('شارژ', '\t=1')]
+    assert read_csv(csv_chunks(('a', 'b'), rows)) == [
+        ['a', 'b'],
+        ['\'=HYPERLINK("x")', '-500'],  # numbers stay numbers
+        ["'+98 912", "'@SUM(A1)"],
+        ["'-", ''],
+        ['شارژ', "'\t=1"],
+    ]
+
+
+@pytest.fixture
+def million_wallet_rows(app):
+    previous = get_repository()
+    set_repository(MemoryRepository())
+    history = get_user_by_email('test').wallet_transactions
+    start = dt.datetime(2025, 1, 1)
+    for i in range(1_000_000):
+        history.append(WalletTransaction(1000, 'deposit', start + dt.timedelta(seconds=30 * i), 'شارژ کیف پول'))
+    app.config['EXPORT_TOKEN'] = TOKEN
+    yield 1_000_000
+    set_repository(previous)
+
+
+def test_million_row_export_streams_in_bounded_memory(client, million_wallet_rows):
+    tracemalloc.start()
+    try:
+        response = client.get(
+            '/api/exports/wallet.csv',
+            headers={'Authorization': f'Bearer {TOKEN}'},
+            buffered=False,
+        )
+        lines = size = 0
+        for chunk in response.response:
+            lines += chunk.count(b'\n')
+            size += len(chunk)
+        response.close()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    assert lines == million_wallet_rows + 1  # + header
+    assert size > 50 * 2**20
+    assert peak < 4 * 2**20  # a few chunks, not the export
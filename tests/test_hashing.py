@@ -0,0 +1,32 @@
+import os
+import signal
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app.hashing import HashingBusy, PasswordHasher
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher()
+    hasher.start(workers=1, timeout=30)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_broken_pool_is_replaced_without_fork(hasher):
+    stored = generate_password_hash('secret')
+    assert hasher.check(stored, 'secret')
+    first = hasher._pool
+    assert first._mp_context.get_start_method() == 'fork'
+
+    for pid in list(first._processes):
+        os.kill(pid, signal.SIGKILL)
+    with pytest.raises(HashingBusy):
+        hasher.check(stored, 'secret')
+
+    assert hasher._pool is not first
+    assert hasher._pool._mp_context.get_start_method() in ('forkserver', 'spawn')
+    assert hasher.check(stored, 'secret')
+    assert not hasher.check(stored, 'wrong')
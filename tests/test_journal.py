@@ -0,0 +1,53 @@
+import datetime as dt
+
+import pytest
+
+from app import model
+from app.journal import JournaledRepository
+from app.model import BookingStatus, create_booking, get_repository, set_repository
+
+
+@pytest.fixture
+def journaled(tmp_path):
+    previous = get_repository()
+    repo = JournaledRepository(str(tmp_path / 'journal'), fsync=False)
+    set_repository(repo)
+    yield repo
+    repo.close()
+    set_repository(previous)
+
+
+def test_expire_bookings_waits_once_outside_the_lock(journaled, monkeypatch):
+    user = model.get_user_by_email('test')
+    yesterday = dt.date.today() - dt.timedelta(days=1)
+    bookings = [
+        create_booking(user.id, yesterday.isoformat(), f'{8 + i}:00', 60, 'شنای آزاد', None)
+        for i in range(5)
+    ]
+
+    waits = []
+    wait = journaled.journal.wait
+
+    def recording_wait(lsn):
+        waits.append((lsn, journaled._lock._is_owned()))
+        wait(lsn)
+
+    monkeypatch.setattr(journaled.journal, 'wait', recording_wait)
+    model.refresh_booking_statuses()
+
+    assert waits == [(journaled.journal.last_lsn, False)]
+    assert all(b.status is BookingStatus.EXPIRED for b in bookings)
+
+
+def test_recovery_replays_expired_status(journaled, tmp_path):
+    user = model.get_user_by_email('test')
+    yesterday = dt.date.today() - dt.timedelta(days=1)
+    booking = create_booking(user.id, yesterday.isoformat(), '10:00', 60, 'شنای آزاد', None)
+    model.refresh_booking_statuses()
+    journaled.close()
+
+    recovered = JournaledRepository(str(tmp_path / 'journal'), fsync=False)
+    try:
+        assert recovered.get_booking(booking.id).status is BookingStatus.EXPIRED
+    finally:
+        recovered.close()
@@ -0,0 +1,92 @@
+import itertools
+import random
+import threading
+
+import pytest
+
+from app import model
+from app.ledger import ledger
+from app.model import User, activate_membership, create_booking
+
+THREADS = 16
+POSTS_PER_THREAD = 150
+
+
+@pytest.fixture
+def accounts(repo):
+    return [repo.add_user(User(id='', email=f'wallet{i}@example.com', password_hash='x')) for i in range(3)]
+
+
+def test_parallel_posts_never_overdraw(accounts):
+    results = []
+    lock = threading.Lock()
+
+    def work(seed):
+        rnd = random.Random(seed)
+        for _ in range(POSTS_PER_THREAD):
+            # each thread works on its own (stale) copy of the user, like
+            # concurrent requests do
+            user = model.get_user_by_id(rnd.choice(accounts).id)
+            if rnd.random() < 0.4:
+                tx = ledger.post(user, rnd.randint(1, 5) * 100, 'deposit', 'شارژ کیف پول')
+            else:
+                tx = ledger.post(user, -rnd.randint(1, 5) * 100, 'purchase', 'خرید')
+            with lock:
+                results.append(tx is not None)
+
+    threads = [threading.Thread(target=work, args=(seed,)) for seed in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == THREADS * POSTS_PER_THREAD
+    assert not all(results)  # some charges were refused for lack of funds
+
+    applied = 0
+    for account in accounts:
+        user = model.get_user_by_id(account.id)
+        amounts = [tx.amount for tx in user.wallet_transactions]
+        applied += len(amounts)
+        assert user.wallet_balance == sum(amounts)
+        # the balance after every entry, in commit order, never went negative
+        assert min(itertools.accumulate(amounts)) >= 0
+        assert model.get_repository().get_wallet(user.id) == (user.wallet_balance, user.wallet_version)
+    assert applied == sum(results)
+
+
+def failing(*args, **kwargs):
+    raise RuntimeError('storage failure')
+
+
+def test_failed_membership_activation_is_refunded(accounts, monkeypatch):
+    user = accounts[0]
+    user.deposit(1000)
+    monkeypatch.setattr(model.get_repository(), 'save_membership', failing)
+
+    with pytest.raises(RuntimeError):
+        with ledger.transaction():
+            assert user.charge(700, description='خرید اشتراک')
+            activate_membership(user, 'gold', 'طلایی', 30, 700)
+
+    user = model.get_user_by_id(user.id)
+    assert user.wallet_balance == 1000
+    assert [(tx.type, tx.amount) for tx in user.wallet_transactions] == [
+        ('deposit', 1000), ('purchase', -700), ('refund', 700),
+    ]
+
+
+def test_failed_booking_insert_is_refunded(accounts, monkeypatch):
+    user = accounts[1]
+    user.deposit(500)
+    monkeypatch.setattr(model.get_repository(), 'add_booking', failing)
+
+    with pytest.raises(RuntimeError):
+        with ledger.transaction():
+            assert user.charge(200, description='رزرو')
+            create_booking(user.id, '2030-01-01', '10:00', 60, 'شنای آزاد')
+
+    user = model.get_user_by_id(user.id)
+    assert user.wallet_balance == 500
+    assert sum(tx.amount for tx in user.wallet_transactions) == 500
+    assert user.wallet_transactions[-1].type == 'refund'
@@ -0,0 +1,36 @@
+import pytest
+
+from app.rankings_cache import rankings_cache
+
+
+@pytest.fixture
+def rankings(monkeypatch):
+    monkeypatch.setattr(rankings_cache, 'fetcher', lambda url: ([{'rank': '1', 'name': 'A'}], [], 'u1'))
+    rankings_cache.refresh()
+    return rankings_cache
+
+
+def test_not_modified_skips_payload(client, rankings, monkeypatch):
+    first = client.get('/api/live-rankings')
+    assert first.status_code == 200
+    assert first.json['men'] == [{'rank': '1', 'name': 'A'}]
+
+    def no_payload(snap):
+        raise AssertionError('payload built for a 304')
+
+    monkeypatch.setattr(rankings, 'payload', no_payload)
+    again = client.get('/api/live-rankings', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+
+
+def test_etag_follows_health(client, rankings, monkeypatch):
+    etag = client.get('/api/live-rankings').headers['ETag']
+
+    def failing(url):
+        raise OSError('upstream down')
+
+    monkeypatch.setattr(rankings, 'fetcher', failing)
+    rankings.refresh()
+    response = client.get('/api/live-rankings', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json['healthy'] is False
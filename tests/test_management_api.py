@@ -0,0 +1,29 @@
+import pytest
+
+TOKEN = 'secret-token'
+
+
+@pytest.fixture
+def management(app, client):
+    app.config['EXPORT_TOKEN'] = TOKEN
+    return client
+
+
+def login(client):
+    client.post('/auth/login', data={'email': 'test', 'password': '123456'})
+
+
+@pytest.mark.parametrize('url', [
+    '/api/analytics/utilization',
+    '/api/reports/rollups',
+    '/api/exports/bookings.csv',
+])
+def test_requires_token(management, url):
+    login(management)  # a member session is not enough
+    assert management.get(url).status_code == 401
+    assert management.get(url, headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert management.get(url, headers={'Authorization': f'Bearer {TOKEN}'}).status_code == 200
+
+
+def test_disabled_without_token(client):
+    assert client.get('/api/analytics/utilization').status_code == 404
@@ -0,0 +1,44 @@
+import threading
+
+from app import model
+from app.model import BookingStatus, cancel_booking, create_booking
+from app.rollups import reconcile
+
+
+def bookings_count(repo, day='2030-01-01'):
+    return repo.get_rollups(day, day).get(day, {}).get('bookings.شنای آزاد', 0)
+
+
+def test_cancel_twice_counts_once(repo):
+    user = model.get_user_by_email('test')
+    booking = create_booking(user.id, '2030-01-01', '10:00', 60, 'شنای آزاد')
+    assert bookings_count(repo) == 1
+
+    assert cancel_booking(booking.id)
+    assert cancel_booking(booking.id)  # already cancelled: still found, no change
+    assert bookings_count(repo) == 0
+    assert reconcile(repo) == []
+
+
+def test_concurrent_cancels_keep_rollups_exact(repo):
+    user = model.get_user_by_email('test')
+    bookings = [
+        create_booking(user.id, '2030-01-01', f'{8 + i % 12:02d}:00', 30, 'شنای آزاد')
+        for i in range(30)
+    ]
+    barrier = threading.Barrier(8)
+
+    def cancel_all():
+        barrier.wait()
+        for booking in bookings:
+            cancel_booking(booking.id)
+
+    threads = [threading.Thread(target=cancel_all) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(repo.get_booking(b.id).status is BookingStatus.CANCELLED for b in bookings)
+    assert bookings_count(repo) == 0
+    assert reconcile(repo) == []
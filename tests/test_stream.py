@@ -0,0 +1,47 @@
+from app import routes
+from app.pubsub import EventHub, event_hub
+
+
+def test_head_request_releases_subscriber(client):
+    before = event_hub.subscribers
+    for _ in range(3):
+        response = client.head('/api/stream')
+        assert response.status_code == 200
+        response.close()
+    assert event_hub.subscribers == before
+
+
+def test_stream_closed_early_releases_subscriber(client):
+    before = event_hub.subscribers
+    response = client.get('/api/stream', buffered=False)
+    assert event_hub.subscribers == before + 1
+    assert next(response.response).startswith(b'retry:')
+    response.close()
+    assert event_hub.subscribers == before
+
+    # never read at all
+    client.get('/api/stream', buffered=False).close()
+    assert event_hub.subscribers == before
+
+
+def test_stream_limit(app, client):
+    app.config['SSE_MAX_STREAMS'] = event_hub.subscribers
+    assert client.get('/api/stream').status_code == 503
+    assert event_hub.subscribers == app.config['SSE_MAX_STREAMS']
+
+
+def test_unknown_last_event_id_resyncs(app, client, monkeypatch):
+    # A cursor from before a restart or from another worker's hub
+    hub = EventHub()
+    monkeypatch.setattr(routes, 'event_hub', hub)
+    app.config['SSE_KEEPALIVE_SECONDS'] = 0.05
+
+    response = client.get('/api/stream', headers={'Last-Event-ID': '1000'}, buffered=False)
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b'retry:')
+    assert next(chunks).startswith(b'event: resync\n')
+
+    hub.publish('capacity', {'date': '2030-01-01'})
+    assert next(chunks) == b'id: 1\nevent: capacity\ndata: {"date":"2030-01-01"}\n\n'
+    response.close()
+    assert hub.subscribers == 0
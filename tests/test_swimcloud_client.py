@@ -0,0 +1,141 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+import requests
+
+from app import swimcloud_scraper
+from app.swimcloud_scraper import CircuitBreaker, CircuitOpenError, SwimcloudClient
+
+PAGE = (Path(__file__).parent / 'fixtures' / 'swimcloud_home.html').read_bytes()
+
+
+class StubSwimcloud(BaseHTTPRequestHandler):
+    """Serves the fixture with an ETag; `statuses` forces error responses first."""
+
+    protocol_version = 'HTTP/1.1'
+    statuses = []
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.requests.append(dict(self.headers))
+        status = self.statuses.pop(0) if self.statuses else 200
+        if status == 200 and self.headers.get('If-None-Match') == '"v1"':
+            status = 304
+        self.send_response(status)
+        self.send_header('ETag', '"v1"')
+        body = PAGE if status == 200 else b''
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def upstream():
+    StubSwimcloud.statuses = []
+    StubSwimcloud.requests = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubSwimcloud)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}/', StubSwimcloud
+    server.shutdown()
+    server.server_close()
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_client(retries=0, clock=None):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, max_reset_timeout=40, clock=clock or Clock())
+    return SwimcloudClient(retries=retries, backoff_factor=0, timeout=(1, 2), breaker=breaker)
+
+
+def test_not_modified_reuses_parsed_rankings(upstream, monkeypatch):
+    url, stub = upstream
+    client = make_client()
+    men, women = client.fetch_rankings(url)
+    assert len(men) == len(women) == 5
+
+    def no_parse(*args):
+        raise AssertionError('304 must not be parsed')
+
+    monkeypatch.setattr(swimcloud_scraper, 'parse_swimcloud_rankings', no_parse)
+    assert client.fetch_rankings(url) == (men, women)
+    assert stub.requests[-1]['If-None-Match'] == '"v1"'
+    assert len(stub.requests) == 2
+
+
+def test_transient_errors_are_retried(upstream):
+    url, stub = upstream
+    stub.statuses = [503, 502]
+    men, _ = make_client(retries=2).fetch_rankings(url)
+    assert men[0]['name'] == 'M Swimmer 1'
+    assert len(stub.requests) == 3
+
+
+def test_circuit_opens_half_opens_and_closes(upstream):
+    url, stub = upstream
+    clock = Clock()
+    client = make_client(clock=clock)
+    breaker = client.breaker
+
+    stub.statuses = [503, 503]
+    for _ in range(2):
+        with pytest.raises(requests.HTTPError):
+            client.fetch_rankings(url)
+    assert breaker.state == 'open'
+
+    # open: fails fast without calling upstream
+    with pytest.raises(CircuitOpenError):
+        client.fetch_rankings(url)
+    assert len(stub.requests) == 2
+
+    # half-open trial fails: open again, timeout doubled
+    clock.now += 10
+    assert breaker.state == 'half-open'
+    stub.statuses = [500]
+    with pytest.raises(requests.HTTPError):
+        client.fetch_rankings(url)
+    assert breaker.state == 'open'
+    assert breaker.retry_after() == 20
+
+    # successful trial closes it
+    clock.now += 20
+    assert client.fetch_rankings(url)[0]
+    assert breaker.state == 'closed'
+    assert breaker.failures == 0
+    assert len(stub.requests) == 4
+
+
+def test_parse_error_releases_half_open_trial(upstream, monkeypatch):
+    url, stub = upstream
+    clock = Clock()
+    client = make_client(clock=clock)
+    stub.statuses = [503, 503]
+    for _ in range(2):
+        with pytest.raises(requests.HTTPError):
+            client.fetch_rankings(url)
+
+    clock.now += 10
+
+    def broken_parse(*args):
+        raise ValueError('unexpected markup')
+
+    with monkeypatch.context() as m:
+        m.setattr(swimcloud_scraper, 'parse_swimcloud_rankings', broken_parse)
+        with pytest.raises(ValueError):
+            client.fetch_rankings(url)
+    assert client.breaker.state == 'open'
+
+    # the failed trial doesn't block the next one forever
+    clock.now += 20
+    assert client.fetch_rankings(url)[0]
+    assert client.breaker.state == 'closed'
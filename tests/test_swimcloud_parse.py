@@ -0,0 +1,53 @@
+from pathlib import Path
+
+import pytest
+from bs4 import BeautifulSoup
+
+from app import swimcloud_scraper
+from app.swimcloud_scraper import TOP_SWIMS_SECTION_ID, parse_swimcloud_rankings
+
+FIXTURE = Path(__file__).parent / 'fixtures' / 'swimcloud_home.html'
+
+
+@pytest.fixture(scope='module')
+def page():
+    return FIXTURE.read_text(encoding='utf-8')
+
+
+def full_soup_rankings(html, max_rows, monkeypatch):
+    """The rankings as read from a full html.parser tree of the page."""
+    def whole_page(html):
+        return BeautifulSoup(html, 'html.parser').select_one('section#' + TOP_SWIMS_SECTION_ID)
+
+    with monkeypatch.context() as m:
+        m.setattr(swimcloud_scraper, 'parse_top_swims_content', whole_page)
+        return parse_swimcloud_rankings(html, max_rows)
+
+
+@pytest.mark.parametrize('max_rows', [5, 0])
+def test_strained_parse_matches_full_parse(page, max_rows, monkeypatch):
+    men, women = parse_swimcloud_rankings(page, max_rows)
+    assert (men, women) == full_soup_rankings(page, max_rows, monkeypatch)
+    assert len(men) == len(women) == (max_rows or 25)
+
+
+def test_fixture_rows(page):
+    men, women = parse_swimcloud_rankings(page, 0)
+    assert men[0] == {
+        'rank': '1', 'name': 'M Swimmer 1', 'club': 'Club M1 & Co',
+        'event': '100 Free', 'time': '1:01.01', 'score': '999',
+    }
+    # club from the team link title / the logo alt when the mobile line is missing
+    assert men[2]['club'] == 'Club M3 & Co'
+    assert women[11]['club'] == 'Club W12 & Co'
+
+
+def test_unexpected_markup_falls_back_to_full_parse(page, monkeypatch):
+    # Content div renamed: the strainer finds nothing, the full parse still
+    # finds the section (and no cards in it)
+    renamed = page.replace('js-top-swims-form-content', 'js-top-swims-body')
+    assert parse_swimcloud_rankings(renamed) == full_soup_rankings(renamed, 5, monkeypatch) == ([], [])
+
+
+def test_missing_section(page):
+    assert parse_swimcloud_rankings(page.replace(TOP_SWIMS_SECTION_ID, 'other')) == ([], [])
@@ -0,0 +1,76 @@
+import datetime as dt
+import sqlite3
+
+import pytest
+
+from app import model
+from app.ledger import ledger
+from app.model import User
+from app.sqlite_repository import SqliteRepository
+
+POSTS = 45
+
+
+@pytest.fixture
+def account(repo):
+    user = repo.add_user(User(id='', email='history@example.com', password_hash='x'))
+    for i in range(POSTS):
+        if i % 3 == 2:
+            ledger.post(user, -100, 'purchase', f'خرید {i}')
+        else:
+            ledger.post(user, 200, 'deposit', 'شارژ کیف پول')
+    return user
+
+
+def walk(history, limit):
+    entries, before = history.page(None, limit)
+    while before is not None:
+        page, before = history.page(before, limit)
+        entries += page
+    return entries
+
+
+def test_pages_cover_the_history_newest_first(account):
+    history = model.get_user_by_id(account.id).wallet_transactions
+    entries = walk(history, 7)
+
+    assert len(entries) == len(history) == POSTS
+    assert [e.id for e in entries] == sorted((e.id for e in entries), reverse=True)
+    balance = 0
+    for entry, tx in zip(reversed(entries), history):
+        balance += tx.amount
+        assert (entry.amount, entry.type, entry.description) == (tx.amount, tx.type, tx.description)
+        assert entry.balance == balance
+    assert entries[0].balance == model.get_user_by_id(account.id).wallet_balance
+    assert history[-1].description == f'خرید {POSTS - 1}'
+    assert history[0].type == 'deposit'
+
+
+def test_balance_as_of(account):
+    history = model.get_user_by_id(account.id).wallet_transactions
+    assert history.balance_as_of(dt.datetime(2000, 1, 1)) == 0
+    assert history.balance_as_of(dt.datetime.utcnow()) == account.wallet_balance
+    third = history[2]
+    assert history.balance_as_of(third.timestamp) == sum(tx.amount for tx in history if tx.timestamp <= third.timestamp)
+
+
+def test_sqlite_backfills_running_balances(tmp_path):
+    path = str(tmp_path / 'old.sqlite3')
+    repo = SqliteRepository(path)
+    user = repo.add_user(User(id='', email='old@example.com', password_hash='x'))
+    previous = model.get_repository()
+    model.set_repository(repo)
+    try:
+        for amount in (500, -200, 300):
+            ledger.post(user, amount, 'deposit' if amount > 0 else 'purchase', '')
+    finally:
+        model.set_repository(previous)
+
+    # a database from before the balance column
+    conn = sqlite3.connect(path)
+    conn.execute('ALTER TABLE wallet_transactions DROP COLUMN balance')
+    conn.commit()
+    conn.close()
+
+    entries, _ = SqliteRepository(path).get_user(user.id).wallet_transactions.page(None, 10)
+    assert [e.balance for e in entries] == [600, 300, 500]